@@ -383,6 +383,7 @@ def network_proxy_client(client):
 
         def post(url, data=None, json=None, **kwargs):
             kwargs.pop("stream", None)
+            kwargs.pop("session", None)
             return c.post(url, data=data, json=json, **kwargs)
 
         orig_post = weave.trace_server.requests.post
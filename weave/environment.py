@@ -96,6 +96,25 @@ def cache_deletion_buffer_days() -> int:
     return int(os.getenv("WEAVE_CACHE_DELETION_BUFFER_DAYS", 1))
 
 
+# represents the number of seconds the compiled form of a graph is reused for identical
+# graphs from the same user. Compiling refines types by executing parts of the graph, so
+# reused compiled graphs may be this stale. 0 disables reuse.
+def compile_cache_seconds() -> float:
+    return float(os.getenv("WEAVE_COMPILE_CACHE_SECONDS", 0))
+
+
+# bounds the memory used for artifact manifests kept in memory by each file manager, in
+# bytes of manifest json. The least recently used manifests are evicted past this size.
+def manifest_cache_max_bytes() -> int:
+    return int(os.getenv("WEAVE_MANIFEST_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+
+# when set, the decoded history of a run is written to the weave filesystem as an Arrow
+# IPC file, and memory mapped back in by later requests for the same history.
+def enable_history_disk_cache() -> bool:
+    return util.parse_boolean_env_var("WEAVE_ENABLE_HISTORY_DISK_CACHE")
+
+
 def wandb_production() -> bool:
     return os.getenv("WEAVE_ENV") == "wandb_production"
 
@@ -151,6 +170,24 @@ def weave_trace_server_url() -> str:
     return os.getenv("WF_TRACE_SERVER_URL", default)
 
 
+def weave_trace_server_batch_workers() -> int:
+    """The number of call batches that may be sent to the trace server concurrently."""
+    return int(os.getenv("WF_TRACE_SERVER_BATCH_WORKERS", "4"))
+
+
+def weave_trace_server_pool_size() -> int:
+    """The number of keep-alive connections to the trace server."""
+    return int(os.getenv("WF_TRACE_SERVER_POOL_SIZE", "32"))
+
+
+def weave_trace_server_request_compression() -> typing.Optional[str]:
+    """The encoding ("gzip" or "zstd") used to compress request bodies, if any."""
+    encoding = os.getenv("WF_TRACE_SERVER_REQUEST_COMPRESSION", "none").lower()
+    if encoding in ("", "none"):
+        return None
+    return encoding
+
+
 def wandb_base_url() -> str:
     settings = Settings()
     return os.environ.get("WANDB_BASE_URL", settings.base_url).rstrip("/")
@@ -1,33 +1,57 @@
 import asyncio
+import contextvars
+import functools
 import inspect
+import itertools
+import json
 import textwrap
 import time
 import traceback
 import typing
-from typing import Any, Callable, Optional, Union
+from types import MethodType
+from typing import Any, Callable, Iterator, Optional, Union
 
+import numpy as np
+from pydantic import BaseModel, PrivateAttr
 from rich import print
 from rich.console import Console
 
 import weave
+from weave.client_context.weave_client import get_weave_client
 from weave.flow import util
 from weave.flow.dataset import Dataset
-from weave.flow.model import Model, get_infer_method
+from weave.flow.model import Model, get_batch_infer_method, get_infer_method
 from weave.flow.obj import Object
 from weave.flow.scorer import (
+    AutoSummarizer,
     Scorer,
     auto_summarize,
+    get_score_batch_fn,
     get_scorer_attributes,
     transpose,
 )
 from weave.trace.env import get_weave_parallelism
 from weave.trace.errors import OpCallError
 from weave.trace.op import Op
-from weave.trace.vals import WeaveObject
-from weave.weave_client import get_ref
+from weave.trace.refs import ObjectRef, TableRef
+from weave.trace.serialize import from_json
+from weave.trace.vals import WeaveObject, WeaveTable
+from weave.trace_server.trace_server_interface import CallsFilter, CallsQueryReq
+from weave.trace_server.trace_server_interface_util import str_digest
+from weave.weave_client import Call, WeaveClient, get_ref
 
 console = Console()
 
+# Number of result rows appended to the results table at a time
+EVALUATION_RESULTS_CHUNK_SIZE = 1000
+
+# Number of result rows summarized at a time
+SUMMARIZE_CHUNK_SIZE = 1000
+
+# Attribute of `predict_and_score` calls holding the key their results are
+# cached by, when `evaluate` is called with `cache_results`
+EVALUATION_CACHE_KEY_ATTRIBUTE = "evaluation_cache_key"
+
 
 INVALID_MODEL_ERROR = (
     "`Evaluation.evaluate` requires a `Model` or `Op` instance as the `model` argument. "
@@ -38,14 +62,82 @@ INVALID_MODEL_ERROR = (
 def async_call(
     func: typing.Union[Callable, Op], *args: Any, **kwargs: Any
 ) -> typing.Coroutine:
-    is_async = False
-    if isinstance(func, Op):
-        is_async = inspect.iscoroutinefunction(func.resolve_fn)
-    else:
-        is_async = inspect.iscoroutinefunction(func)
-    if is_async:
+    """Calls `func`, awaiting it directly on the event loop if it is async and
+    running it on the sync executor otherwise."""
+    if util.is_async_callable(func):
         return func(*args, **kwargs)  # type: ignore
-    return asyncio.to_thread(func, *args, **kwargs)
+    return util.run_sync(func, *args, **kwargs)
+
+
+class _FnPlan:
+    """How to call a model's predict function or a scorer.
+
+    Signatures are inspected once per Evaluation rather than for every example.
+    """
+
+    def __init__(self, fn: Callable, name: str) -> None:
+        self.fn = fn
+        self.name = name
+        if isinstance(fn, Op):
+            self.signature = fn.signature
+        else:
+            self.signature = inspect.signature(fn)
+        self.arg_names = list(self.signature.parameters.keys())
+        self._arg_name_set = set(self.arg_names)
+        self.process_fn: Optional[_ProcessScoreFn] = None
+        # A scorer's `score_batch` or a model's batch infer method, if it has one
+        self.batch_fn: Optional[Callable] = None
+
+    def args_from(self, row: dict) -> dict:
+        """Returns the entries of `row` that `fn` takes as arguments."""
+        return {k: v for k, v in row.items() if k in self._arg_name_set}
+
+    def required_arg_names(self) -> list[str]:
+        return [
+            param.name
+            for param in self.signature.parameters.values()
+            if param.default == inspect.Parameter.empty
+        ]
+
+
+class _ProcessScoreFn:
+    """A picklable stand-in for a scorer's score function, run in worker
+    processes.
+
+    Scorer instances are rebuilt from their fields in the worker, since their
+    attributes may hold traced values that can't be pickled.
+    """
+
+    def __init__(self, score_fn: Callable) -> None:
+        self.scorer_cls: Optional[type] = None
+        self.scorer_fields: Optional[dict] = None
+        if isinstance(score_fn, MethodType) and isinstance(
+            scorer := score_fn.__self__, BaseModel
+        ):
+            self.scorer_cls = type(scorer)
+            self.scorer_fields = util.plain_value(scorer.model_dump())
+            score_fn = score_fn.__func__
+        self.fn = score_fn.resolve_fn if isinstance(score_fn, Op) else score_fn
+        self.op = score_fn
+        self._scorer: Optional[Any] = None
+
+    def __getstate__(self) -> dict:
+        # The op is pickled by reference and its function looked up again in
+        # the worker, since the undecorated function can't be pickled.
+        state = {**self.__dict__, "fn": None, "_scorer": None}
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        op = self.op
+        self.fn = op.resolve_fn if isinstance(op, Op) else op
+
+    def __call__(self, **kwargs: Any) -> Any:
+        if self.scorer_cls is None:
+            return self.fn(**kwargs)
+        if self._scorer is None:
+            self._scorer = self.scorer_cls(**self.scorer_fields)  # type: ignore
+        return self.fn(self._scorer, **kwargs)
 
 
 class EvaluationResults(weave.Object):
@@ -102,6 +194,8 @@ class Evaluation(Object):
     preprocess_model_input: Optional[Callable] = None
     trials: int = 1
 
+    _scorer_plans: Optional[list["_FnPlan"]] = PrivateAttr(None)
+
     def model_post_init(self, __context: Any) -> None:
         scorers: list[Union[Callable, Scorer, Op]] = []
         for scorer in self.scorers or []:
@@ -135,27 +229,13 @@ class Evaluation(Object):
         else:
             model_input = self.preprocess_model_input(example)  # type: ignore
 
-        if callable(model):
-            model_predict = model
-        else:
-            model_predict = get_infer_method(model)
-
-        model_predict_fn_name = (
-            model_predict.name
-            if isinstance(model_predict, Op)
-            else model_predict.__name__
-        )
-
-        if isinstance(model_predict, Op):
-            predict_signature = model_predict.signature
-        else:
-            predict_signature = inspect.signature(model_predict)
-        model_predict_arg_names = list(predict_signature.parameters.keys())
+        predict_plan = self._get_predict_plan(model)
+        model_predict = predict_plan.fn
+        model_predict_fn_name = predict_plan.name
+        model_predict_arg_names = predict_plan.arg_names
 
         if isinstance(model_input, dict):
-            model_predict_args = {
-                k: v for k, v in model_input.items() if k in model_predict_arg_names
-            }
+            model_predict_args = predict_plan.args_from(model_input)
         else:
             if len(model_predict_arg_names) == 1:
                 model_predict_args = {model_predict_arg_names[0]: model_input}
@@ -165,17 +245,18 @@ class Evaluation(Object):
                 )
         try:
             model_start_time = time.time()
-            model_output = await async_call(model_predict, **model_predict_args)
+            if predict_plan.batch_fn is not None:
+                model_output = await self._predict_in_batch(
+                    predict_plan, model_predict_args
+                )
+            else:
+                model_output = await async_call(model_predict, **model_predict_args)
         except OpCallError as e:
             dataset_column_names = list(example.keys())
             dataset_column_names_str = ", ".join(dataset_column_names[:3])
             if len(dataset_column_names) > 3:
                 dataset_column_names_str += ", ..."
-            required_arg_names = [
-                param.name
-                for param in predict_signature.parameters.values()
-                if param.default == inspect.Parameter.empty
-            ]
+            required_arg_names = predict_plan.required_arg_names()
 
             message = textwrap.dedent(
                 f"""
@@ -194,97 +275,345 @@ class Evaluation(Object):
             model_output = None
         model_latency = time.time() - model_start_time
 
-        scores = {}
+        # All of an example's scorers run at once, each limited by its entry in
+        # the run's `scorer_concurrency` across all of the examples in flight.
+        scorer_plans = self._get_scorer_plans()
+        score_tasks = [
+            asyncio.ensure_future(self._score(plan, example, model_output))
+            for plan in scorer_plans
+        ]
+        try:
+            results = await asyncio.gather(*score_tasks)
+        except BaseException:
+            for task in score_tasks:
+                task.cancel()
+            raise
+        scores = {plan.name: result for plan, result in zip(scorer_plans, results)}
+
+        return {
+            "model_output": model_output,
+            "scores": scores,
+            "model_latency": model_latency,
+        }
+
+    async def _predict_in_batch(self, plan: "_FnPlan", predict_args: dict) -> Any:
+        """Predicts one example with the model's batch infer method.
+
+        The example gets a call of its own, holding its inputs and output, and
+        the batched call lists the ids of the example calls it served in its
+        `example_call_ids` attribute.
+        """
+        client = get_weave_client()
+        example_call = None
+        if client is not None:
+            example_inputs = dict(predict_args)
+            if isinstance(plan.fn, MethodType):
+                example_inputs = {"self": plan.fn.__self__, **example_inputs}
+            example_call = client.create_call(f"{plan.name}.example", example_inputs)
+        item = (predict_args, example_call)
+
+        try:
+            if (run := _evaluation_run.get()) is None:
+                # Called outside of `evaluate`, so there is nothing to batch with
+                model_output = (await self._call_predict_batch(plan, [item]))[0]
+            else:
+                model_output = await run.batcher(
+                    f"model/{plan.name}",
+                    functools.partial(self._call_predict_batch, plan),
+                ).submit(item)
+        except Exception as e:
+            if client is not None and example_call is not None:
+                client.finish_call(example_call, None, e)
+            raise
+        if client is not None and example_call is not None:
+            client.finish_call(example_call, model_output)
+        return model_output
+
+    async def _call_predict_batch(
+        self, plan: "_FnPlan", items: list[tuple[dict, Optional[Call]]]
+    ) -> list:
+        arg_names = [
+            name for name in plan.arg_names if any(name in a for a, _ in items)
+        ]
+        batch_args = {name: [args.get(name) for args, _ in items] for name in arg_names}
+        example_call_ids = [call.id for _, call in items if call is not None]
+        batch_fn = typing.cast(Callable, plan.batch_fn)
+        with weave.attributes({"example_call_ids": example_call_ids}):
+            model_outputs = await async_call(batch_fn, **batch_args)
+        if isinstance(model_outputs, np.ndarray):
+            model_outputs = model_outputs.tolist()
+        return list(model_outputs)
+
+    async def _score(self, plan: "_FnPlan", example: dict, model_output: Any) -> Any:
+        scorer_name = plan.name
+        score_fn = plan.fn
+        score_arg_names = plan.arg_names
+
+        if isinstance(example, dict):
+            score_args = plan.args_from(example)
+        else:
+            if len(score_arg_names) == 2:
+                score_args = {score_arg_names[0]: example}
+            else:
+                raise ValueError(
+                    f"{score_fn} expects arguments: {score_arg_names}, provide a preprocess_model_input function that returns a dict with those keys."
+                )
+        score_args["model_output"] = model_output
+
+        try:
+            if plan.batch_fn is not None:
+                return await self._score_in_batch(plan, score_args)
+            if (semaphore := _get_scorer_semaphore(scorer_name)) is None:
+                return await self._call_scorer(plan, score_args)
+            async with semaphore:
+                return await self._call_scorer(plan, score_args)
+        except OpCallError as e:
+            dataset_column_names = list(example.keys())
+            dataset_column_names_str = ", ".join(dataset_column_names[:3])
+            if len(dataset_column_names) > 3:
+                dataset_column_names_str += ", ..."
+            required_arg_names = plan.required_arg_names()
+            required_arg_names.remove("model_output")
+
+            message = textwrap.dedent(
+                f"""
+                Call error: {e}
+
+                Options for resolving:
+                a. change {scorer_name} argument names to match a subset of dataset column names ({dataset_column_names_str})
+                b. change dataset column names to match expected {scorer_name} argument names: {required_arg_names}
+                """
+            )
+            raise OpCallError(message)
+
+    async def _score_in_batch(self, plan: "_FnPlan", score_args: dict) -> Any:
+        target_args = {k: v for k, v in score_args.items() if k != "model_output"}
+        if len(target_args) == 1:
+            target = next(iter(target_args.values()))
+        else:
+            target = target_args or None
+        item = (target, score_args["model_output"])
+
+        if (run := _evaluation_run.get()) is None:
+            # Called outside of `evaluate`, so there is nothing to batch with
+            return (await self._call_score_batch(plan, [item]))[0]
+        return await run.batcher(
+            f"scorer/{plan.name}", functools.partial(self._call_score_batch, plan)
+        ).submit(item)
+
+    async def _call_score_batch(
+        self, plan: "_FnPlan", items: list[tuple[Any, Any]]
+    ) -> list:
+        targets = [target for target, _ in items]
+        model_outputs = [model_output for _, model_output in items]
+        batch_fn = typing.cast(Callable, plan.batch_fn)
+        if (semaphore := _get_scorer_semaphore(plan.name)) is None:
+            scores = await async_call(batch_fn, targets, model_outputs)
+        else:
+            async with semaphore:
+                scores = await async_call(batch_fn, targets, model_outputs)
+        if isinstance(scores, np.ndarray):
+            return scores.tolist()
+        return list(scores)
+
+    def _call_scorer(self, plan: "_FnPlan", score_args: dict) -> typing.Coroutine:
+        run = _evaluation_run.get()
+        if run is not None and plan.name in run.process_scorers:
+            return util.run_sync(
+                self._call_scorer_in_process,
+                plan,
+                score_args,
+                run.process_scorer_timeout,
+            )
+        return async_call(plan.fn, **score_args)
+
+    def _call_scorer_in_process(
+        self, plan: "_FnPlan", score_args: dict, timeout: Optional[float]
+    ) -> Any:
+        """Runs a scorer on the worker process pool, tracing the call here so
+        that it is part of this process's call tree."""
+        if plan.process_fn is None:
+            plan.process_fn = _ProcessScoreFn(plan.fn)
+        pool = util.get_worker_process_pool()
+        process_args = util.plain_value(score_args)
+
+        op = plan.fn
+        op_args: tuple = ()
+        if isinstance(op, MethodType):
+            op_args = (op.__self__,)
+            op = op.__func__
+        client = get_weave_client()
+        if client is None or not isinstance(op, Op) or not op._tracing_enabled:
+            return pool.run(plan.process_fn, process_args, timeout)
+
+        inputs = op.signature.bind(*op_args, **score_args).arguments
+        call = client.create_call(op, inputs)
+        try:
+            result = pool.run(plan.process_fn, process_args, timeout)
+        except Exception as e:
+            client.finish_call(call, None, e)
+            raise
+        client.finish_call(call, result)
+        return result
+
+    def _get_predict_plan(self, model: Union[Callable, Model]) -> "_FnPlan":
+        # Plans are kept for the length of an `evaluate` run. Keyed by id, with
+        # the model kept alive in the value so that the id can't be reused by
+        # another model.
+        run = _evaluation_run.get()
+        if run is not None and (cached := run.predict_plans.get(id(model))):
+            return cached[1]
+        model_predict_batch = None
+        if callable(model):
+            model_predict = model
+        elif (model_predict_batch := get_batch_infer_method(model)) is not None:
+            model_predict = model_predict_batch
+        else:
+            model_predict = get_infer_method(model)
+        model_predict_fn_name = (
+            model_predict.name
+            if isinstance(model_predict, Op)
+            else model_predict.__name__
+        )
+        plan = _FnPlan(model_predict, model_predict_fn_name)
+        plan.batch_fn = model_predict_batch
+        if run is not None:
+            run.predict_plans[id(model)] = (model, plan)
+        return plan
+
+    def _get_scorer_plans(self) -> list["_FnPlan"]:
+        if self._scorer_plans is not None:
+            return self._scorer_plans
+        plans = []
         scorers = typing.cast(list[Union[Op, Scorer]], self.scorers or [])
         for scorer in scorers:
             scorer_name, score_fn, _ = get_scorer_attributes(scorer)
-            if isinstance(score_fn, Op):
-                score_signature = score_fn.signature
-            else:
-                score_signature = inspect.signature(score_fn)
-            score_arg_names = list(score_signature.parameters.keys())
-
-            if "model_output" not in score_arg_names:
+            plan = _FnPlan(score_fn, scorer_name)
+            plan.batch_fn = get_score_batch_fn(scorer)
+            if "model_output" not in plan.arg_names:
                 raise OpCallError(
                     f"Scorer {scorer_name} must have a 'model_output' argument, to receive the output of the model function."
                 )
+            plans.append(plan)
+        self._scorer_plans = plans
+        return plans
 
-            if isinstance(example, dict):
-                score_args = {k: v for k, v in example.items() if k in score_arg_names}
+    @weave.op()
+    async def summarize(self, eval_table: EvaluationResults) -> dict:
+        scorer_attributes = [
+            get_scorer_attributes(scorer) for scorer in self.scorers or []
+        ]
+        # Function scorers and the other columns are summarized online as rows
+        # stream in. Scorers with their own summarize need all of their rows.
+        score_summarizers = {}
+        score_rows: dict[str, list] = {}
+        for scorer_name, _, summarize_fn in scorer_attributes:
+            if summarize_fn is auto_summarize:
+                score_summarizers[scorer_name] = AutoSummarizer()
             else:
-                if len(score_arg_names) == 2:
-                    score_args = {score_arg_names[0]: example}
+                score_rows[scorer_name] = []
+
+        # Columns in the order they are first seen, with None standing in for
+        # the scores column. Rows are folded in a chunk of columns at a time.
+        column_summarizers: dict[str, Optional[AutoSummarizer]] = {}
+        rows_iter = _iter_rows(eval_table.rows)
+        while chunk := list(itertools.islice(rows_iter, SUMMARIZE_CHUNK_SIZE)):
+            for name, vals in transpose(chunk).items():
+                if name == "scores":
+                    column_summarizers[name] = None
+                    score_cols = transpose(vals)
+                    for scorer_name, summarizer in score_summarizers.items():
+                        summarizer.add_batch(score_cols.get(scorer_name, []))
+                    for scorer_name, rows in score_rows.items():
+                        rows.extend(score_cols.get(scorer_name, []))
                 else:
-                    raise ValueError(
-                        f"{score_fn} expects arguments: {score_arg_names}, provide a preprocess_model_input function that returns a dict with those keys."
-                    )
-            score_args["model_output"] = model_output
-
-            try:
-                result = await async_call(score_fn, **score_args)
-            except OpCallError as e:
-                dataset_column_names = list(example.keys())
-                dataset_column_names_str = ", ".join(dataset_column_names[:3])
-                if len(dataset_column_names) > 3:
-                    dataset_column_names_str += ", ..."
-                required_arg_names = [
-                    param.name
-                    for param in score_signature.parameters.values()
-                    if param.default == inspect.Parameter.empty
-                ]
-                required_arg_names.remove("model_output")
-
-                message = textwrap.dedent(
-                    f"""
-                    Call error: {e}
-
-                    Options for resolving:
-                    a. change {scorer_name} argument names to match a subset of dataset column names ({dataset_column_names_str})
-                    b. change dataset column names to match expected {scorer_name} argument names: {required_arg_names}
-                    """
-                )
-                raise OpCallError(message)
-            scores[scorer_name] = result
-
-        return {
-            "model_output": model_output,
-            "scores": scores,
-            "model_latency": model_latency,
-        }
+                    if name not in column_summarizers:
+                        column_summarizers[name] = AutoSummarizer()
+                    column_summarizers[name].add_batch(vals)  # type: ignore
 
-    @weave.op()
-    async def summarize(self, eval_table: EvaluationResults) -> dict:
-        eval_table_rows = list(eval_table.rows)
-        cols = transpose(eval_table_rows)
         summary = {}
-
-        for name, vals in cols.items():
-            if name == "scores":
-                scorers = self.scorers or []
-                for scorer in scorers:
-                    scorer_name, _, summarize_fn = get_scorer_attributes(scorer)
-                    scorer_stats = transpose(vals)
-                    score_table = scorer_stats[scorer_name]
-                    scored = summarize_fn(score_table)
+        for name, column_summarizer in column_summarizers.items():
+            if column_summarizer is None:
+                for scorer_name, _, summarize_fn in scorer_attributes:
+                    if scorer_name in score_summarizers:
+                        scored = score_summarizers[scorer_name].summary()
+                    else:
+                        scored = summarize_fn(score_rows[scorer_name])
                     summary[scorer_name] = scored
             else:
-                model_output_summary = auto_summarize(vals)
+                model_output_summary = column_summarizer.summary()
                 if model_output_summary:
                     summary[name] = model_output_summary
 
         return summary
 
     @weave.op()
-    async def evaluate(self, model: Union[Callable, Model]) -> dict:
+    async def evaluate(
+        self,
+        model: Union[Callable, Model],
+        *,
+        scorer_concurrency: Optional[dict[str, int]] = None,
+        process_scorers: Optional[list[str]] = None,
+        process_scorer_timeout: Optional[float] = None,
+        batch_size: int = 64,
+        batch_max_wait: float = 0.05,
+        cache_results: bool = False,
+    ) -> dict:
+        """Evaluates `model` on the dataset and returns the summary.
+
+        The options below only tune how the evaluation runs, so they are
+        arguments here rather than fields, which would change the digest of
+        the Evaluation.
+
+        Args:
+            scorer_concurrency: Maximum number of concurrent calls to a scorer,
+                by scorer name, across all of the examples being evaluated.
+                Scorers not listed are unlimited.
+            process_scorers: Scorers, by name, to run on a pool of long-lived
+                worker processes rather than on threads, for CPU-bound scoring.
+                Their score functions must be picklable, eg. defined at the top
+                level of a module.
+            process_scorer_timeout: Timeout in seconds for each call to a
+                scorer in `process_scorers`.
+            batch_size: Maximum number of rows in a batch passed to
+                `Scorer.score_batch` or to the model's batch infer method (eg.
+                `predict_batch`). Batches are made of the rows in flight, so
+                they are also limited by `WEAVE_PARALLELISM`.
+            batch_max_wait: How long in seconds to wait for a batch to fill.
+            cache_results: Reuse the results of earlier `predict_and_score`
+                calls with the same model, scorers, preprocess function and
+                dataset row (by ref), rather than predicting and scoring the
+                example again. This includes the calls of an evaluation that
+                failed part way, so rerunning it resumes it.
+        """
         if not is_valid_model(model):
             raise ValueError(INVALID_MODEL_ERROR)
-        eval_rows = []
+        results = _EvaluationResultsWriter(get_weave_client())
 
         start_time = time.time()
 
+        results_cache = None
+        if cache_results:
+            results_cache = await util.run_sync(
+                _EvaluationResultsCache.load, get_weave_client(), self, model
+            )
+            if results_cache is None:
+                print("Not reusing results: the model and scorers must be saved")
+            else:
+                print(f"Found {results_cache.n_results} cached results")
+
         async def eval_example(example: dict) -> dict:
+            cache_key = None
+            if results_cache is not None:
+                cache_key = results_cache.key(example)
+                if (cached := results_cache.pop(cache_key)) is not None:
+                    return cached
             try:
-                eval_row = await self.predict_and_score(model, example)
+                if cache_key is None:
+                    eval_row = await self.predict_and_score(model, example)
+                else:
+                    with weave.attributes({EVALUATION_CACHE_KEY_ATTRIBUTE: cache_key}):
+                        eval_row = await self.predict_and_score(model, example)
             except OpCallError as e:
                 raise e
             except Exception as e:
@@ -297,25 +626,49 @@ class Evaluation(Object):
         # with console.status("Evaluating...") as status:
         dataset = typing.cast(Dataset, self.dataset)
         _rows = dataset.rows
-        trial_rows = list(_rows) * self.trials
-        async for example, eval_row in util.async_foreach(
-            trial_rows, eval_example, get_weave_parallelism()
-        ):
-            n_complete += 1
-            duration = time.time() - start_time
-            print(f"Evaluated {n_complete} of {len(trial_rows)} examples")
-            # status.update(
-            #     f"Evaluating... {duration:.2f}s [{n_complete} / {len(self.dataset.rows)} complete]"  # type:ignore
-            # )
-            if eval_row is None:
-                eval_row = {"model_output": None, "scores": {}}
-            else:
-                eval_row["scores"] = eval_row.get("scores", {})
-            for scorer in self.scorers or []:
-                scorer_name, _, _ = get_scorer_attributes(scorer)
-                if scorer_name not in eval_row["scores"]:
-                    eval_row["scores"][scorer_name] = {}
-            eval_rows.append(eval_row)
+        # Rows are pulled lazily, so the number of examples is only known
+        # up front if the dataset rows are already in memory.
+        n_examples = None
+        if not isinstance(_rows, WeaveTable) or _rows._rows is not None:
+            n_examples = len(_rows.rows) * self.trials
+
+        def trial_rows() -> Iterator[dict]:
+            for _ in range(self.trials):
+                yield from _iter_rows(dataset.rows)
+
+        run_token = _evaluation_run.set(
+            _EvaluationRun(
+                scorer_concurrency=scorer_concurrency or {},
+                process_scorers=set(process_scorers or []),
+                process_scorer_timeout=process_scorer_timeout,
+                batch_size=batch_size,
+                batch_max_wait=batch_max_wait,
+            )
+        )
+        try:
+            async for example, eval_row in util.async_foreach(
+                trial_rows(), eval_example, get_weave_parallelism()
+            ):
+                n_complete += 1
+                duration = time.time() - start_time
+                if n_examples is None:
+                    print(f"Evaluated {n_complete} examples")
+                else:
+                    print(f"Evaluated {n_complete} of {n_examples} examples")
+                # status.update(
+                #     f"Evaluating... {duration:.2f}s [{n_complete} / {len(self.dataset.rows)} complete]"  # type:ignore
+                # )
+                if eval_row is None:
+                    eval_row = {"model_output": None, "scores": {}}
+                else:
+                    eval_row["scores"] = eval_row.get("scores", {})
+                for scorer in self.scorers or []:
+                    scorer_name, _, _ = get_scorer_attributes(scorer)
+                    if scorer_name not in eval_row["scores"]:
+                        eval_row["scores"][scorer_name] = {}
+                await results.append(eval_row)
+        finally:
+            _evaluation_run.reset(run_token)
 
         # The need for this pattern is quite unfortunate and highlights a gap in our
         # data model. As a user, I just want to pass a list of data `eval_rows` to
@@ -327,7 +680,7 @@ class Evaluation(Object):
         # also bad. In the near-term, this will at least solve the problem of
         # breaking summarization with big datasets, but this is not the correct
         # long-term solution.
-        eval_results = EvaluationResults(rows=weave.Table(eval_rows))
+        eval_results = EvaluationResults(rows=await results.table())
         summary = await self.summarize(eval_results)
 
         print("Evaluation summary", summary)
@@ -335,6 +688,177 @@ class Evaluation(Object):
         return summary
 
 
+class _EvaluationRun:
+    """The options of an `evaluate` run, and the state its examples share."""
+
+    def __init__(
+        self,
+        scorer_concurrency: dict[str, int],
+        process_scorers: set[str],
+        process_scorer_timeout: Optional[float],
+        batch_size: int,
+        batch_max_wait: float,
+    ) -> None:
+        self.scorer_concurrency = scorer_concurrency
+        self.process_scorers = process_scorers
+        self.process_scorer_timeout = process_scorer_timeout
+        self.batch_size = batch_size
+        self.batch_max_wait = batch_max_wait
+        # Batchers run their batches in this context, so batched calls are
+        # traced as children of the `evaluate` call and see this run.
+        self.context = contextvars.copy_context()
+        self.context.run(_evaluation_run.set, self)
+        self.batchers: dict[str, util.MicroBatcher] = {}
+        self.scorer_semaphores: dict[str, asyncio.Semaphore] = {}
+        self.predict_plans: dict[int, tuple[Any, _FnPlan]] = {}
+
+    def batcher(self, name: str, process_batch: Callable) -> util.MicroBatcher:
+        """Returns the `MicroBatcher` of a model or scorer, by name."""
+        if (batcher := self.batchers.get(name)) is None:
+            batcher = self.batchers[name] = self.context.run(
+                util.MicroBatcher, process_batch, self.batch_size, self.batch_max_wait
+            )
+        return batcher
+
+    def scorer_semaphore(self, scorer_name: str) -> Optional[asyncio.Semaphore]:
+        max_concurrency = self.scorer_concurrency.get(scorer_name)
+        if max_concurrency is None:
+            return None
+        if (semaphore := self.scorer_semaphores.get(scorer_name)) is None:
+            semaphore = self.scorer_semaphores[scorer_name] = asyncio.Semaphore(
+                max_concurrency
+            )
+        return semaphore
+
+
+class _EvaluationResultsCache:
+    """The results of earlier `predict_and_score` calls of a model, by key.
+
+    An example's key is a digest of the refs of the model, the scorers and the
+    preprocess function, and of the digest of the example's dataset row.
+    `evaluate` records it as an attribute of the `predict_and_score` call, so
+    the results of finished calls can be looked up by it in later runs.
+    """
+
+    def __init__(self, refs: list[str]) -> None:
+        self.refs = refs
+        # Results are reused once each, so that each trial of an example
+        # gets a result of its own.
+        self.results: dict[str, list[dict]] = {}
+
+    @classmethod
+    def load(
+        cls, client: Optional[WeaveClient], evaluation: "Evaluation", model: Any
+    ) -> Optional["_EvaluationResultsCache"]:
+        """Returns the cached results for `model`, or None if the model or any
+        of the functions results depend on are not saved."""
+        if client is None or (model_ref := get_ref(model)) is None:
+            return None
+        fns = list(evaluation.scorers or [])
+        if evaluation.preprocess_model_input is not None:
+            fns.append(evaluation.preprocess_model_input)
+        fn_refs = [get_ref(fn) for fn in fns]
+        if any(ref is None for ref in fn_refs):
+            return None
+        cache = cls([model_ref.uri(), *(ref.uri() for ref in fn_refs)])  # type: ignore
+
+        project_id = client._project_id()
+        op_name = evaluation.predict_and_score.name
+        calls = client.server.calls_query_stream(
+            CallsQueryReq(
+                project_id=project_id,
+                filter=CallsFilter(
+                    op_names=[f"weave:///{project_id}/op/{op_name}:*"],
+                    input_refs=[model_ref.uri()],
+                ),
+                columns=["attributes", "output", "exception", "ended_at"],
+            )
+        )
+        for call in calls:
+            key = call.attributes.get(EVALUATION_CACHE_KEY_ATTRIBUTE)
+            if key is None or call.ended_at is None or call.exception is not None:
+                continue
+            output = util.plain_value(from_json(call.output, project_id, client.server))
+            # Failed predictions are retried rather than reused
+            if output.get("model_output") is None:
+                continue
+            cache.results.setdefault(key, []).append(output)
+        return cache
+
+    @property
+    def n_results(self) -> int:
+        return sum(len(results) for results in self.results.values())
+
+    def key(self, example: dict) -> Optional[str]:
+        """Returns the key of `example`, or None if it isn't a saved row."""
+        ref = get_ref(example)
+        if not isinstance(ref, ObjectRef) or ref.extra[-2:-1] != ("id",):
+            return None
+        return str_digest(json.dumps([*self.refs, ref.extra[-1]]))
+
+    def pop(self, key: Optional[str]) -> Optional[dict]:
+        if key is None or not (results := self.results.get(key)):
+            return None
+        return results.pop(0)
+
+
+_evaluation_run: contextvars.ContextVar[Optional[_EvaluationRun]] = (
+    contextvars.ContextVar("evaluation_run", default=None)
+)
+
+
+def _get_scorer_semaphore(scorer_name: str) -> Optional[asyncio.Semaphore]:
+    if (run := _evaluation_run.get()) is None:
+        return None
+    return run.scorer_semaphore(scorer_name)
+
+
+def _iter_rows(rows: Union[weave.Table, WeaveTable]) -> Iterator[dict]:
+    """Iterates over table rows, streaming them from the server a page at a
+    time if they haven't been loaded.
+    """
+    if isinstance(rows, WeaveTable) and rows._rows is None:
+        return rows._remote_iter()
+    return iter(rows)
+
+
+class _EvaluationResultsWriter:
+    """Collects the result rows of an evaluation.
+
+    With a client, rows are appended to a table on the server every
+    `EVALUATION_RESULTS_CHUNK_SIZE` rows rather than held until the evaluation
+    finishes. Without one they are kept in memory.
+    """
+
+    def __init__(self, client: Optional[WeaveClient]) -> None:
+        self.client = client
+        self.table_ref: Optional[TableRef] = None
+        self.pending_rows: list[dict] = []
+
+    async def append(self, row: dict) -> None:
+        self.pending_rows.append(row)
+        if len(self.pending_rows) >= EVALUATION_RESULTS_CHUNK_SIZE:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if self.client is None or not self.pending_rows:
+            return
+        rows, self.pending_rows = self.pending_rows, []
+        self.table_ref = await util.run_sync(
+            self.client._append_table_rows, self.table_ref, rows
+        )
+
+    async def table(self) -> weave.Table:
+        await self.flush()
+        if self.table_ref is None:
+            return weave.Table(self.pending_rows)
+        # The rows only live on the server. Accessing `rows` on the saved
+        # `EvaluationResults` gives a `WeaveTable` that streams them from there.
+        table = weave.Table([])
+        table.ref = self.table_ref
+        return table
+
+
 def evaluate(
     dataset: Union[Dataset, list],
     model: Union[Callable, Model],
@@ -357,7 +881,9 @@ def is_valid_model(model: Any) -> bool:
         or (
             get_ref(model) is not None
             and isinstance(model, WeaveObject)
-            and hasattr(model, "predict")
-            and isinstance(model.predict, Op)
+            and (
+                isinstance(getattr(model, "predict", None), Op)
+                or isinstance(get_batch_infer_method(model), Op)
+            )
         )
     )
@@ -1,8 +1,9 @@
-from typing import Callable
+from typing import Any, Callable, Optional
 
 from weave.flow.obj import Object
 
 INFER_METHOD_NAMES = {"predict", "infer", "forward", "invoke"}
+BATCH_INFER_METHOD_NAMES = {f"{name}_batch" for name in INFER_METHOD_NAMES}
 
 
 class MissingInferenceMethodError(Exception): ...
@@ -32,6 +33,19 @@ class Model(Object):
             prediction = self.attribute1 + ' ' + input_data
             return {'pred': prediction}
     ```
+
+    Models that are faster on many inputs at once can also define a batch
+    infer method (eg. `predict_batch`). It takes the same arguments as the
+    infer method, but with a list of values for each argument, and returns a
+    list with one output per input. `Evaluation` groups the examples it has in
+    flight into batches for it.
+
+    ```python
+    class YourBatchModel(Model):
+        @weave.op()
+        def predict_batch(self, input_data: list[str]) -> list[dict]:
+            return [{'pred': x} for x in input_data]
+    ```
     """
 
     # TODO: should be infer: Callable
@@ -52,3 +66,11 @@ def get_infer_method(model: Model) -> Callable:
     raise MissingInferenceMethodError(
         f"Missing a method with name in ({INFER_METHOD_NAMES})"
     )
+
+
+def get_batch_infer_method(model: Any) -> Optional[Callable]:
+    """Returns the model's batch infer method, or None if it doesn't have one."""
+    for name in BATCH_INFER_METHOD_NAMES:
+        if (infer_method := getattr(model, name, None)) is not None:
+            return infer_method
+    return None
@@ -15,6 +15,17 @@ class Scorer(Object):
     def score(self, target: Any, model_output: Any) -> Any:
         raise NotImplementedError
 
+    def score_batch(self, targets: list, model_outputs: list) -> Sequence:
+        """Scores many rows at once, eg. with vectorized numpy code or one
+        batched LLM request.
+
+        Optional. When a subclass implements it, `Evaluation` groups rows into
+        batches and calls it instead of `score`. `targets[i]` is what `score`
+        would get for its argument other than `model_output` (a dict of them if
+        it takes several) and the result has one score per row.
+        """
+        raise NotImplementedError
+
     @weave.op()
     def summarize(self, score_rows: list) -> Optional[dict]:
         return auto_summarize(score_rows)
@@ -28,7 +39,7 @@ def stderr(data: Sequence[Union[int, float]]) -> float:
         return 0
 
 
-def auto_summarize(data: list) -> Optional[dict[str, Any]]:
+def auto_summarize(data: Union[list, np.ndarray]) -> Optional[dict[str, Any]]:
     """Automatically summarize a list of (potentially nested) dicts.
 
     Computes:
@@ -38,9 +49,15 @@ def auto_summarize(data: list) -> Optional[dict[str, Any]]:
 
     If col is all None, result is None
 
+    Lists of dicts are transposed into columns, and bool and numeric columns
+    are summarized as numpy arrays. `data` can also be a bool or numeric numpy
+    array.
+
     Returns:
       dict of summary stats, with structure matching input dict structure.
     """
+    if isinstance(data, np.ndarray):
+        return _summarize_array(data) if data.size else {}
     if not data:
         return {}
     data = [x for x in data if x is not None]
@@ -51,21 +68,15 @@ def auto_summarize(data: list) -> Optional[dict[str, Any]]:
     val = data[0]
 
     if isinstance(val, bool):
-        return {
-            "true_count": (true_count := sum(1 for x in data if x)),
-            "true_fraction": true_count / len(data),
-        }
+        return _summarize_array(
+            np.fromiter((bool(x) for x in data), dtype=bool, count=len(data))
+        )
     elif isinstance(val, Number):
-        return {"mean": np.mean(data).item()}
+        return _summarize_array(np.asarray(data))
     elif isinstance(val, dict):
         result = {}
-        all_keys = set().union(*[x.keys() for x in data if isinstance(x, dict)])
-        for k in all_keys:
-            if (
-                summary := auto_summarize(
-                    [x.get(k) for x in data if isinstance(x, dict)]
-                )
-            ) is not None:
+        for k, col in _transpose_dicts(data).items():
+            if (summary := auto_summarize(col)) is not None:
                 if k in summary:
                     result.update(summary)
                 else:
@@ -78,6 +89,141 @@ def auto_summarize(data: list) -> Optional[dict[str, Any]]:
     return None
 
 
+def _summarize_array(arr: np.ndarray) -> Optional[dict[str, Any]]:
+    if arr.dtype == bool:
+        true_count = int(np.count_nonzero(arr))
+        return {"true_count": true_count, "true_fraction": true_count / arr.size}
+    if arr.dtype == object:
+        # eg. ints too large for int64
+        arr = arr.astype(float)
+    if np.issubdtype(arr.dtype, np.number):
+        return {"mean": arr.mean().item()}
+    return None
+
+
+def _transpose_dicts(rows: Sequence[Any]) -> dict[str, list]:
+    """Returns the values of each key of the dicts in `rows`, skipping rows
+    that aren't dicts."""
+    cols: dict[str, list] = {}
+    for row in rows:
+        if isinstance(row, dict):
+            for k, v in row.items():
+                if (col := cols.get(k)) is None:
+                    col = cols[k] = []
+                col.append(v)
+    return cols
+
+
+class AutoSummarizer:
+    """Incrementally computes `auto_summarize` over a stream of values.
+
+    Numeric columns keep a running sum and variance rather than the values
+    themselves, so summarizing a column takes constant memory however many
+    values are added. Values added together with `add_batch` are transposed
+    into columns and folded in as numpy arrays.
+    """
+
+    def __init__(self) -> None:
+        self.n_values = 0
+        self.count = 0
+        self.kind: Optional[str] = None
+        self.true_count = 0
+        self.sum = 0.0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.children: dict[str, "AutoSummarizer"] = {}
+
+    def add(self, val: Any) -> None:
+        self.add_batch([val])
+
+    def add_batch(self, vals: Union[Sequence[Any], np.ndarray]) -> None:
+        self.n_values += len(vals)
+        if not isinstance(vals, np.ndarray):
+            vals = [
+                v.model_dump() if isinstance(v, BaseModel) else v
+                for v in vals
+                if v is not None
+            ]
+        if len(vals) == 0:
+            return
+        if self.kind is None:
+            val = vals[0]
+            if isinstance(vals, np.ndarray):
+                self.kind = "bool" if vals.dtype == bool else "number"
+            elif isinstance(val, bool):
+                self.kind = "bool"
+            elif isinstance(val, Number):
+                self.kind = "number"
+            elif isinstance(val, dict):
+                self.kind = "dict"
+            else:
+                self.kind = "other"
+
+        if self.kind == "bool":
+            if isinstance(vals, np.ndarray):
+                self.true_count += int(np.count_nonzero(vals))
+            else:
+                self.true_count += sum(1 for v in vals if v)
+            self.count += len(vals)
+        elif self.kind == "number":
+            arr = np.asarray(vals, dtype=float)
+            # Chan et al.'s update of the mean and sum of squared deviations
+            # with those of the new values
+            n, n_new = self.count, arr.size
+            mean_new = arr.mean().item()
+            m2_new = ((arr - mean_new) ** 2).sum().item()
+            delta = mean_new - self._mean
+            self.count += n_new
+            self.sum += arr.sum().item()
+            self._mean += delta * n_new / self.count
+            self._m2 += m2_new + delta**2 * n * n_new / self.count
+        elif self.kind == "dict":
+            # An object array of dicts, if a later batch comes as an array
+            rows = vals.tolist() if isinstance(vals, np.ndarray) else vals
+            cols = _transpose_dicts(rows)
+            self.count += len(vals)
+            for k, col in cols.items():
+                if (child := self.children.get(k)) is None:
+                    child = self.children[k] = AutoSummarizer()
+                child.add_batch(col)
+        else:
+            self.count += len(vals)
+
+    @property
+    def stderr(self) -> float:
+        """Standard error of the mean of a numeric column."""
+        if self.count > 1:
+            return float(np.sqrt(self._m2 / (self.count - 1) / self.count))
+        return 0
+
+    def summary(self) -> Optional[dict[str, Any]]:
+        """Returns what `auto_summarize` returns for the values added so far."""
+        if self.n_values == 0:
+            return {}
+        if self.count == 0:
+            return None
+
+        if self.kind == "bool":
+            return {
+                "true_count": self.true_count,
+                "true_fraction": self.true_count / self.count,
+            }
+        elif self.kind == "number":
+            return {"mean": self.sum / self.count}
+        elif self.kind == "dict":
+            result = {}
+            for k, child in self.children.items():
+                if (summary := child.summary()) is not None:
+                    if k in summary:
+                        result.update(summary)
+                    else:
+                        result[k] = summary
+            if not result:
+                return None
+            return result
+        return None
+
+
 def get_scorer_attributes(
     scorer: Union[Callable, Op, Scorer],
 ) -> Tuple[str, Callable, Callable]:
@@ -104,6 +250,15 @@ def get_scorer_attributes(
     return (scorer_name, score_fn, summarize_fn)  # type: ignore
 
 
+def get_score_batch_fn(scorer: Union[Callable, Op, Scorer]) -> Optional[Callable]:
+    """Returns the scorer's `score_batch` method if it implements one."""
+    if not isinstance(scorer, Scorer):
+        return None
+    if getattr(type(scorer), "score_batch", None) is Scorer.score_batch:
+        return None
+    return scorer.score_batch
+
+
 def p_r_f1(tp: int, fp: int, fn: int) -> Tuple[float, float, float]:
     # if any denom is zero, then zero. could use NaN instead...
     precision: float = 0
@@ -1,6 +1,36 @@
 import asyncio
+import atexit
+import contextvars
+import functools
+import hashlib
+import inspect
+import itertools
 import multiprocessing
-from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Tuple, TypeVar
+import multiprocessing.context
+import pickle
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from types import MethodType
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+)
+
+from weave.trace import box
+from weave.trace.env import get_weave_parallelism, get_weave_scorer_processes
 
 T = TypeVar("T")
 U = TypeVar("U")
@@ -11,18 +41,158 @@ async def async_foreach(
     func: Callable[[T], Awaitable[U]],
     max_concurrent_tasks: int,
 ) -> AsyncIterator[Tuple[T, U]]:
-    semaphore = asyncio.Semaphore(max_concurrent_tasks)
+    """Runs `func` on each item of `sequence`, yielding (item, result) pairs as
+    they complete.
+
+    At most `max_concurrent_tasks` items are in flight at once, and items are
+    only pulled from `sequence` as earlier ones finish, so `sequence` can be a
+    lazy iterator over more items than fit in memory.
+    """
+    iterator = iter(sequence)
+    # Tasks in the order they were started, so results that complete together
+    # are yielded in the order of `sequence`
+    active: Dict["asyncio.Task[Tuple[T, U]]", None] = {}
 
     async def process_item(item: T) -> Tuple[T, U]:
-        async with semaphore:
-            result = await func(item)
-            return item, result
+        result = await func(item)
+        return item, result
+
+    def fill() -> None:
+        for item in itertools.islice(iterator, max_concurrent_tasks - len(active)):
+            active[asyncio.create_task(process_item(item))] = None
+
+    try:
+        fill()
+        while active:
+            await asyncio.wait(active, return_when=asyncio.FIRST_COMPLETED)
+            done = [task for task in active if task.done()]
+            for task in done:
+                del active[task]
+            # Start the next items before handing back results, so they run
+            # while the caller processes these.
+            fill()
+            for task in done:
+                yield task.result()
+    finally:
+        for task in active:
+            task.cancel()
+
+
+def is_async_callable(func: Callable) -> bool:
+    """Returns whether calling `func` returns an awaitable, including for Ops,
+    bound methods, partials and objects with an async `__call__`."""
+    while True:
+        if isinstance(func, (MethodType, functools.partial)):
+            func = func.__func__ if isinstance(func, MethodType) else func.func
+        elif (resolve_fn := getattr(func, "resolve_fn", None)) is not None:
+            func = resolve_fn
+        else:
+            break
+    if inspect.iscoroutinefunction(func):
+        return True
+    call = getattr(func, "__call__", None)
+    return not inspect.isfunction(func) and inspect.iscoroutinefunction(call)
 
-    tasks = [asyncio.create_task(process_item(item)) for item in sequence]
 
-    for task in asyncio.as_completed(tasks):
-        item, result = await task
-        yield item, result
+_sync_executor: Optional[ThreadPoolExecutor] = None
+_sync_executor_lock = threading.Lock()
+
+
+def get_sync_executor() -> ThreadPoolExecutor:
+    """Returns the executor sync functions are run on by `run_sync`.
+
+    It has `get_weave_parallelism()` workers, and is replaced if that changes.
+    """
+    global _sync_executor
+    max_workers = get_weave_parallelism()
+    with _sync_executor_lock:
+        if _sync_executor is None or _sync_executor._max_workers != max_workers:
+            if _sync_executor is not None:
+                _sync_executor.shutdown(wait=False)
+            _sync_executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="weave-sync"
+            )
+        return _sync_executor
+
+
+async def run_sync(func: Callable[..., U], *args: Any, **kwargs: Any) -> U:
+    """Runs a sync function on the sync executor without blocking the event
+    loop, like `asyncio.to_thread` but not limited by the size of the loop's
+    default executor.
+    """
+    loop = asyncio.get_running_loop()
+    # Copy the context so that calls made by func are traced under the caller
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_sync_executor(), functools.partial(context.run, func, *args, **kwargs)
+    )
+
+
+class MicroBatcher(Generic[T, U]):
+    """Groups items submitted by concurrent tasks into batches.
+
+    A batch is passed to `fn` once it has `max_size` items, or `max_wait`
+    seconds after its first item was submitted, whichever comes first. `fn`
+    returns one result per item, which is handed back to the task that
+    submitted it; if `fn` raises, every item in the batch gets the exception.
+
+    Batches run in the context the batcher was created in, so calls traced by
+    `fn` are children of the call that created the batcher rather than of
+    whichever task happened to fill the batch.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List[T]], Awaitable[Sequence[U]]],
+        max_size: int,
+        max_wait: float,
+    ) -> None:
+        self.fn = fn
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._context = contextvars.copy_context()
+        self._pending: List[Tuple[T, "asyncio.Future[U]"]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Keep references so running batches aren't garbage collected
+        self._running: Set["asyncio.Task[None]"] = set()
+
+    async def submit(self, item: T) -> U:
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[U]" = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        loop = asyncio.get_running_loop()
+        task = self._context.run(loop.create_task, self._run_batch(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, batch: List[Tuple[T, "asyncio.Future[U]"]]) -> None:
+        try:
+            results = await self.fn([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(
+                    f"Expected {len(batch)} results for a batch, got {len(results)}"
+                )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
 
 
 def _subproc(
@@ -70,3 +240,212 @@ async def run_in_process_with_timeout(
         raise ValueError(
             "Unhandled exception in subprocess. Exitcode: " + str(process.exitcode)
         )
+
+
+class WorkerProcessError(Exception):
+    """Raised when a worker process exits while running a call."""
+
+
+def plain_value(val: Any) -> Any:
+    """Returns `val` with traced dicts, lists and boxed values replaced by
+    plain ones, so that it can be pickled and sent to a worker process."""
+    if isinstance(val, dict):
+        return {k: plain_value(v) for k, v in val.items()}
+    elif isinstance(val, list):
+        return [plain_value(v) for v in val]
+    return box.unbox(val)
+
+
+def _worker_main(conn: Connection) -> None:
+    # Functions are sent once per worker and then referred to by key
+    fns: Dict[str, Callable] = {}
+    while True:
+        try:
+            key, fn_bytes, kwargs = conn.recv()
+        except EOFError:
+            return
+        try:
+            if fn_bytes is not None:
+                fns[key] = pickle.loads(fn_bytes)
+            result = ("ok", fns[key](**kwargs))
+        except Exception as e:
+            result = ("error", e)
+        try:
+            conn.send(result)
+        except Exception as e:
+            # The result or exception couldn't be pickled
+            conn.send(("error", RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+class _WorkerProcess:
+    def __init__(self, ctx: multiprocessing.context.BaseContext) -> None:
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)  # type: ignore
+        self.process.start()
+        child_conn.close()
+        self.known_keys: Set[str] = set()
+
+    def run(
+        self, key: str, fn_bytes: bytes, kwargs: dict, timeout: Optional[float]
+    ) -> Any:
+        send_fn = key not in self.known_keys
+        self.conn.send((key, fn_bytes if send_fn else None, kwargs))
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"Worker process call timed out after {timeout}s")
+        try:
+            status, val = self.conn.recv()
+        except (EOFError, ConnectionResetError):
+            self.process.join()
+            raise WorkerProcessError(
+                f"Worker process exited with code {self.process.exitcode}"
+            )
+        self.known_keys.add(key)
+        if status == "error":
+            raise val
+        return val
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class WorkerProcessPool:
+    """A pool of long-lived worker processes for running CPU-bound functions.
+
+    Unlike `run_in_process_with_timeout`, workers are started once and reused,
+    so calls don't pay for starting a process and importing weave. Each worker
+    runs one call at a time. A worker that times out or dies is replaced
+    without affecting calls running on the others.
+
+    Functions must be picklable, eg. defined at the top level of a module. Each
+    function is pickled once and sent to each worker the first time that worker
+    runs it.
+
+    Workers are started with the "forkserver" method (or "spawn" where it is
+    not available) rather than forked, since forking copies the caller's
+    threads' locks in whatever state they are in.
+    """
+
+    def __init__(self, n_workers: int) -> None:
+        self.n_workers = n_workers
+        start_method = (
+            "forkserver"
+            if "forkserver" in multiprocessing.get_all_start_methods()
+            else "spawn"
+        )
+        self._ctx = multiprocessing.get_context(start_method)
+        self._workers: Set[_WorkerProcess] = set()
+        self._idle: List[_WorkerProcess] = []
+        self._n_started = 0
+        # Incremented by `shutdown`, so that workers started across it are
+        # not added to the pool
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._pickled: "weakref.WeakKeyDictionary[Callable, Tuple[str, bytes]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def run(
+        self, fn: Callable[..., U], kwargs: dict, timeout: Optional[float] = None
+    ) -> U:
+        """Runs `fn(**kwargs)` on a worker, blocking until it returns.
+
+        Raises:
+            TimeoutError: If the call takes longer than `timeout` seconds.
+            WorkerProcessError: If the worker exits during the call.
+        """
+        key, fn_bytes = self._pickle(fn)
+        worker = self._get_worker()
+        try:
+            result = worker.run(key, fn_bytes, kwargs, timeout)
+        except (TimeoutError, WorkerProcessError, OSError):
+            worker.kill()
+            # A replacement is started the next time a worker is needed
+            with self._cond:
+                if worker in self._workers:
+                    self._workers.remove(worker)
+                    self._n_started -= 1
+                self._cond.notify()
+            raise
+        except BaseException:
+            self._release(worker)
+            raise
+        self._release(worker)
+        return result
+
+    def shutdown(self) -> None:
+        """Kills all of the workers, including those running a call, which
+        then raises `WorkerProcessError`. The pool starts new workers if it is
+        used again."""
+        with self._cond:
+            workers, self._workers = self._workers, set()
+            idle, self._idle = self._idle, []
+            self._n_started = 0
+            self._generation += 1
+            self._cond.notify_all()
+        for worker in workers:
+            if worker in idle:
+                worker.kill()
+            else:
+                # The thread running the call cleans up the worker once it
+                # sees the process exit.
+                worker.process.kill()
+
+    def _pickle(self, fn: Callable) -> Tuple[str, bytes]:
+        with self._lock:
+            if (pickled := self._pickled.get(fn)) is None:
+                fn_bytes = pickle.dumps(fn)
+                pickled = (hashlib.sha256(fn_bytes).hexdigest(), fn_bytes)
+                self._pickled[fn] = pickled
+            return pickled
+
+    def _get_worker(self) -> _WorkerProcess:
+        with self._cond:
+            while not self._idle and self._n_started >= self.n_workers:
+                self._cond.wait()
+            if self._idle:
+                return self._idle.pop()
+            # Reserve a slot, and start the worker without holding the lock,
+            # since starting a process is slow
+            self._n_started += 1
+            generation = self._generation
+        try:
+            worker = _WorkerProcess(self._ctx)
+        except BaseException:
+            with self._cond:
+                if self._generation == generation:
+                    self._n_started -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            if self._generation == generation:
+                self._workers.add(worker)
+                return worker
+        # Like calls already running, a call starting a worker while the pool
+        # is shut down fails
+        worker.kill()
+        raise WorkerProcessError("Worker pool was shut down")
+
+    def _release(self, worker: _WorkerProcess) -> None:
+        with self._cond:
+            # Workers killed by `shutdown` are not reused
+            if worker in self._workers:
+                self._idle.append(worker)
+                self._cond.notify()
+
+
+_worker_process_pool: Optional[WorkerProcessPool] = None
+_worker_process_pool_lock = threading.Lock()
+
+
+def get_worker_process_pool() -> WorkerProcessPool:
+    """Returns the process-wide pool with `get_weave_scorer_processes()`
+    workers."""
+    global _worker_process_pool
+    with _worker_process_pool_lock:
+        if _worker_process_pool is None:
+            _worker_process_pool = WorkerProcessPool(get_weave_scorer_processes())
+            atexit.register(_worker_process_pool.shutdown)
+        return _worker_process_pool
@@ -1,8 +1,10 @@
+import collections
 import contextlib
 import datetime
 import logging
 import os
 import shutil
+import threading
 import time
 import typing
 
@@ -117,8 +119,6 @@ def get_user_cache_key() -> typing.Optional[str]:
     return ctx.user_id
 
 
-# TODO: stats, test
-
 CacheKeyType = typing.TypeVar("CacheKeyType")
 CacheValueType = typing.TypeVar("CacheValueType")
 
@@ -126,7 +126,12 @@ CacheValueType = typing.TypeVar("CacheValueType")
 class LruTimeWindowCache(typing.Generic[CacheKeyType, CacheValueType]):
     """A cache that stores values for a fixed amount of time.
 
+    If max_entries or max_bytes are given, the least recently used values are
+    evicted to stay within them. Sizes of values are given to `set`, values
+    set without a size count as 0 bytes.
+
     Respects the user cache key, so that different users don't share the same cache.
+    Safe to share between threads.
     """
 
     class NotFound:
@@ -138,45 +143,91 @@ class LruTimeWindowCache(typing.Generic[CacheKeyType, CacheValueType]):
         self,
         max_age: datetime.timedelta,
         now_fn: typing.Callable[[], datetime.datetime] = datetime.datetime.now,
+        max_entries: typing.Optional[int] = None,
+        max_bytes: typing.Optional[int] = None,
+        name: str = "default",
     ) -> None:
         self.max_age = max_age
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
         self._now_fn = now_fn
+        self._stats_tags = [f"cache:{name}"]
 
-        # Items are time ordered, with oldest at the front.
-        self._cache: dict[
+        # Items are ordered by last use, with least recently used at the front.
+        # Since each use also resets an item's time, they are time ordered too.
+        self._cache: collections.OrderedDict[
             typing.Tuple[typing.Optional[str], CacheKeyType],
             typing.Tuple[datetime.datetime, CacheValueType],
-        ] = {}
+        ] = collections.OrderedDict()
+        self._sizes: dict[typing.Tuple[typing.Optional[str], CacheKeyType], int] = {}
+        self._n_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def n_bytes(self) -> int:
+        return self._n_bytes
 
     def _full_key(
         self, key: CacheKeyType
     ) -> typing.Tuple[typing.Optional[str], CacheKeyType]:
         return (get_user_cache_key(), key)
 
+    def _remove(
+        self, full_key: typing.Tuple[typing.Optional[str], CacheKeyType]
+    ) -> None:
+        del self._cache[full_key]
+        self._n_bytes -= self._sizes.pop(full_key, 0)
+
     def _prune(self, now: datetime.datetime) -> None:
-        for key, val in list(self._cache.items()):
-            if now - val[0] > self.max_age:
-                del self._cache[key]
+        n_evicted = 0
+        while self._cache:
+            full_key, (set_at, _) = next(iter(self._cache.items()))
+            if now - set_at > self.max_age:
+                pass
+            elif self.max_entries is not None and len(self._cache) > self.max_entries:
+                n_evicted += 1
+            elif self.max_bytes is not None and self._n_bytes > self.max_bytes:
+                n_evicted += 1
             else:
                 break
-        statsd.gauge("weave.cache.size", len(self._cache))
+            self._remove(full_key)
+        if n_evicted:
+            statsd.increment("weave.cache.eviction", n_evicted, tags=self._stats_tags)
+        statsd.gauge("weave.cache.size", len(self._cache), tags=self._stats_tags)
+        statsd.gauge("weave.cache.bytes", self._n_bytes, tags=self._stats_tags)
 
     def get(self, key: CacheKeyType) -> typing.Union[NotFound, CacheValueType]:
         full_key = self._full_key(key)
-        val = self._cache.get(full_key)
+        with self._lock:
+            val = self._cache.get(full_key)
+            if val is not None:
+                now = self._now_fn()
+                if now - val[0] > self.max_age:
+                    self._remove(full_key)
+                    val = None
+                else:
+                    # Move to the end of the cache
+                    self._cache[full_key] = (now, val[1])
+                    self._cache.move_to_end(full_key)
         if val is None:
-            statsd.increment("weave.cache.miss")
+            statsd.increment("weave.cache.miss", tags=self._stats_tags)
             return self.NOT_FOUND
-        # Set the value again to move it to the end of the cache
-        self.set(key, val[1])
-        statsd.increment("weave.cache.hit")
+        statsd.increment("weave.cache.hit", tags=self._stats_tags)
         return val[1]
 
-    def set(self, key: CacheKeyType, value: CacheValueType) -> None:
+    def set(self, key: CacheKeyType, value: CacheValueType, n_bytes: int = 0) -> None:
         full_key = self._full_key(key)
-        now = self._now_fn()
-        if full_key in self._cache:
-            # Delete so we move to the end of the cache
-            del self._cache[full_key]
-        self._cache[full_key] = (now, value)
-        self._prune(now)
+        with self._lock:
+            now = self._now_fn()
+            if full_key in self._cache:
+                # Delete so we move to the end of the cache
+                self._remove(full_key)
+            if self.max_bytes is not None and n_bytes > self.max_bytes:
+                # Would only evict everything else.
+                self._prune(now)
+                return
+            self._cache[full_key] = (now, value)
+            if n_bytes:
+                self._sizes[full_key] = n_bytes
+                self._n_bytes += n_bytes
+            self._prune(now)
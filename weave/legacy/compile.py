@@ -1,12 +1,17 @@
 import contextlib
 import contextvars
+import datetime
+import hashlib
+import json
 import logging
 import random
 import re
+import time
 import typing
 
 from weave import (
     engine_trace,
+    environment,
     errors,
     registry_mem,
     stitch,
@@ -15,6 +20,7 @@ from weave import (
 from weave import weave_types as types
 from weave.legacy import (
     box,
+    cache,
     compile_domain,
     compile_table,
     debug_compile,
@@ -1058,10 +1064,24 @@ def _track_errors(fn):
     return final
 
 
+@contextlib.contextmanager
+def _trace_pass(
+    name: str, pass_times: typing.Optional[typing.Dict[str, float]]
+) -> typing.Iterator[None]:
+    tracer = engine_trace.tracer()
+    start_time = time.time()
+    try:
+        with tracer.trace("compile:%s" % name):
+            yield
+    finally:
+        if pass_times is not None:
+            pass_times[name] = time.time() - start_time
+
+
 def _compile(
     nodes: typing.List[graph.Node],
+    pass_times: typing.Optional[typing.Dict[str, float]] = None,
 ) -> value_or_error.ValueOrErrors[graph.Node]:
-    tracer = engine_trace.tracer()
     # logging.info("Starting compilation of graph with %s leaf nodes" % len(nodes))
 
     results = value_or_error.ValueOrErrors.from_values(nodes)
@@ -1069,19 +1089,19 @@ def _compile(
     # If we're being called from WeaveJS, we need to use dispatch to determine
     # which ops to use. Critically, this first phase does not actually refine
     # op output types, so after this, the types in the graph are not yet correct.
-    with tracer.trace("compile:fix_calls"):
+    with _trace_pass("fix_calls", pass_times):
         results = results.batch_map(_track_errors(compile_fix_calls))
 
     # Auto-transforms, where we insert operations to convert between types
     # as needed.
     # TODO: is it ok to have this before final refine?
-    with tracer.trace("compile:await"):
+    with _trace_pass("await", pass_times):
         results = results.batch_map(_track_errors(compile_await))
-    with tracer.trace("compile:execute"):
+    with _trace_pass("execute", pass_times):
         results = results.batch_map(_track_errors(compile_execute))
-    with tracer.trace("compile:function_calls"):
+    with _trace_pass("function_calls", pass_times):
         results = results.batch_map(_track_errors(compile_function_calls))
-    with tracer.trace("compile:quote"):
+    with _trace_pass("quote", pass_times):
         # Mission critical to call `compile:quote` before and node re-writing
         # compilers such as compile:node_ops and compile:gql. Why?:
         #
@@ -1105,26 +1125,26 @@ def _compile(
         # reason we should always call compile:quote before any node re-writing.
         results = results.batch_map(_track_errors(compile_quote))
 
-    with tracer.trace("compile:static_function_types"):
+    with _trace_pass("static_function_types", pass_times):
         results = results.batch_map(_track_errors(compile_static_function_types))
 
     # Some ops require const input nodes. This pass executes any branches necessary
     # to ensure that requirement holds.
     # Only gql ops require this for now.
-    with tracer.trace("compile:resolve_required_consts"):
+    with _trace_pass("resolve_required_consts", pass_times):
         results = results.batch_map(_track_errors(compile_resolve_required_consts))
 
-    with tracer.trace("compile:node_ops"):
+    with _trace_pass("node_ops", pass_times):
         results = results.batch_map(_track_errors(compile_node_ops))
 
-    with tracer.trace("compile:simple_optimizations"):
+    with _trace_pass("simple_optimizations", pass_times):
         # Simple Optimizations should happen after `node_ops` to ensure we operate on
         # the expanded nodes.
         results = results.batch_map(_track_errors(compile_simple_optimizations))
 
     # The node ops phase above can expand nodes, leading to new nodes in the graph
     # that are potentially duplicates of others. dedupe will merge these nodes.
-    with tracer.trace("compile:dedupe"):
+    with _trace_pass("dedupe", pass_times):
         results = results.batch_map(_track_errors(compile_dedupe))
 
     # Stitch is used in stages following this one. Stitch requires that lambdas
@@ -1132,21 +1152,21 @@ def _compile(
     # graphs that violate this requirement, and dedupe will happily merge lambdas
     # even if they are used in different ops. lambda_uniqueness pulls them back
     # apart.
-    with tracer.trace("compile:lambda_uniqueness"):
+    with _trace_pass("lambda_uniqueness", pass_times):
         results = results.batch_map(_track_errors(compile_lambda_uniqueness))
 
     # Now that we have the correct calls, we can do our forward-looking pushdown
     # optimizations. These do not depend on having correct types in the graph.
 
-    with tracer.trace("compile:gql_query"):
+    with _trace_pass("gql_query", pass_times):
         results = results.batch_map(
             _track_errors(compile_domain.apply_domain_op_gql_translation)
         )
 
-    with tracer.trace("compile:initialize_gql_types"):
+    with _trace_pass("initialize_gql_types", pass_times):
         results = results.batch_map(_track_errors(compile_initialize_gql_types))
 
-    with tracer.trace("compile:column_pushdown"):
+    with _trace_pass("column_pushdown", pass_times):
         results = results.batch_map(_track_errors(compile_apply_column_pushdown))
 
     # Final refine, to ensure the graph types are exactly what Weave python
@@ -1154,7 +1174,7 @@ def _compile(
     # that this is the final phase, so that when we execute the rest of the
     # graph, we reuse any results produced in this phase, instead of re-executing
     # those nodes.
-    with tracer.trace("compile:refine_and_propagate_gql"):
+    with _trace_pass("refine_and_propagate_gql", pass_times):
         results = results.batch_map(_track_errors(compile_refine_and_propagate_gql))
 
     # This is very expensive!
@@ -1212,5 +1232,81 @@ def compile(
     # graph.
     if _is_compiling():
         return value_or_error.ValueOrErrors.from_values(nodes)
-    with disable_compile():
-        return _compile(nodes)
+    tracer = engine_trace.tracer()
+    with tracer.trace("compile") as span:
+        key = _compile_cache_key(nodes)
+        if key is not None:
+            compiled_nodes = _get_compile_cache().get(key)
+            if compiled_nodes is not None:
+                span.set_tag("compile_cache_hit", True)
+                return value_or_error.ValueOrErrors.from_values(compiled_nodes)
+        span.set_tag("compile_cache_hit", False)
+
+        pass_times: typing.Dict[str, float] = {}
+        with disable_compile():
+            results = _compile(nodes, pass_times)
+        for name, seconds in pass_times.items():
+            span.set_metric("compile.%s.seconds" % name, seconds)
+
+        if key is not None and not any(err != None for _, err in results.iter_items()):
+            _get_compile_cache().set(key, [node for node, _ in results.iter_items()])
+        return results
+
+
+# Most recently compiled graphs kept by the compile cache.
+COMPILE_CACHE_MAX_ENTRIES = 1000
+
+
+class CompileCache:
+    """Compiled graphs by a hash of the graph they were compiled from.
+
+    Graphs are hashed with their consts and types, and are only reused for the
+    same user. Entries expire `max_age` after they were compiled, even if they
+    are in use, since compiling refines types by executing parts of the graph.
+    """
+
+    def __init__(self, max_age: datetime.timedelta) -> None:
+        self.max_age = max_age
+        self._cache: cache.LruTimeWindowCache[
+            str, typing.Tuple[datetime.datetime, typing.List[graph.Node]]
+        ] = cache.LruTimeWindowCache(
+            max_age, max_entries=COMPILE_CACHE_MAX_ENTRIES, name="compile"
+        )
+
+    def get(self, key: str) -> typing.Optional[typing.List[graph.Node]]:
+        val = self._cache.get(key)
+        if isinstance(val, cache.LruTimeWindowCache.NotFound):
+            return None
+        compiled_at, compiled_nodes = val
+        if datetime.datetime.now() - compiled_at > self.max_age:
+            return None
+        return compiled_nodes
+
+    def set(self, key: str, compiled_nodes: typing.List[graph.Node]) -> None:
+        self._cache.set(key, (datetime.datetime.now(), compiled_nodes))
+
+
+_compile_cache: typing.Optional[CompileCache] = None
+
+
+def _get_compile_cache() -> CompileCache:
+    global _compile_cache
+    max_age = datetime.timedelta(seconds=environment.compile_cache_seconds())
+    if _compile_cache is None or _compile_cache.max_age != max_age:
+        _compile_cache = CompileCache(max_age)
+    return _compile_cache
+
+
+def _compile_cache_key(nodes: typing.List[graph.Node]) -> typing.Optional[str]:
+    """Returns the key the compiled form of `nodes` is cached by, or None if
+    it shouldn't be cached."""
+    if environment.compile_cache_seconds() <= 0:
+        return None
+    try:
+        serialized = serialize.serialize(nodes)
+    except Exception:
+        # Graphs with consts that can't be serialized are not cached
+        return None
+    hash = hashlib.md5()
+    hash.update(json.dumps(serialized, sort_keys=True).encode())
+    return hash.hexdigest()
@@ -1,6 +1,8 @@
+import collections
+import concurrent.futures
 import contextlib
 import contextvars
-import itertools
+import functools
 import logging
 import pprint
 import threading
@@ -73,6 +75,8 @@ class ExecuteStats:
 
     def __init__(self):
         self.op_stats = {}
+        # execute_forward's threads record into the same top level stats
+        self._lock = threading.Lock()
 
     def add_node(
         self,
@@ -82,36 +86,43 @@ class ExecuteStats:
         already_executed: bool,
         bytes_read_to_arrow: int,
     ):
-        op_stats = self.op_stats.setdefault(
-            node.from_op.name,
-            {
-                "count": 0,
-                "total_time": 0,
-                "cache_used": 0,
-                "already_executed": 0,
-                "bytes_read_to_arrow": 0,
-            },
-        )
-        op_stats["cache_used"] += int(cache_used)
-        op_stats["already_executed"] += int(already_executed)
-        op_stats["count"] += 1
-        op_stats["total_time"] += execution_time
-        op_stats["bytes_read_to_arrow"] += bytes_read_to_arrow
+        with self._lock:
+            op_stats = self.op_stats.setdefault(
+                node.from_op.name,
+                {
+                    "count": 0,
+                    "total_time": 0,
+                    "cache_used": 0,
+                    "already_executed": 0,
+                    "bytes_read_to_arrow": 0,
+                },
+            )
+            op_stats["cache_used"] += int(cache_used)
+            op_stats["already_executed"] += int(already_executed)
+            op_stats["count"] += 1
+            op_stats["total_time"] += execution_time
+            op_stats["bytes_read_to_arrow"] += bytes_read_to_arrow
 
     def merge(self, other: "ExecuteStats"):
-        for op_name, op_stats in other.op_stats.items():
-            if op_name not in self.op_stats:
-                self.op_stats[op_name] = op_stats
-            else:
-                self.op_stats[op_name]["count"] += op_stats["count"]
-                self.op_stats[op_name]["total_time"] += op_stats["total_time"]
-                self.op_stats[op_name]["cache_used"] += op_stats["cache_used"]
-                self.op_stats[op_name]["already_executed"] += op_stats[
-                    "already_executed"
-                ]
-                self.op_stats[op_name]["bytes_read_to_arrow"] += op_stats[
-                    "bytes_read_to_arrow"
-                ]
+        with other._lock:
+            other_op_stats = {
+                op_name: OpExecuteStats(**op_stats)
+                for op_name, op_stats in other.op_stats.items()
+            }
+        with self._lock:
+            for op_name, op_stats in other_op_stats.items():
+                if op_name not in self.op_stats:
+                    self.op_stats[op_name] = op_stats
+                else:
+                    self.op_stats[op_name]["count"] += op_stats["count"]
+                    self.op_stats[op_name]["total_time"] += op_stats["total_time"]
+                    self.op_stats[op_name]["cache_used"] += op_stats["cache_used"]
+                    self.op_stats[op_name]["already_executed"] += op_stats[
+                        "already_executed"
+                    ]
+                    self.op_stats[op_name]["bytes_read_to_arrow"] += op_stats[
+                        "bytes_read_to_arrow"
+                    ]
 
     def op_summary(self) -> dict[str, OpExecuteSummaryStats]:
         summary_op_stats: dict[str, OpExecuteSummaryStats] = {}
@@ -256,155 +267,208 @@ def execute_nodes(nodes, no_cache=False) -> value_or_error.ValueOrErrors[typing.
 
 
 def execute_forward(fg: forward_graph.ForwardGraph, no_cache=False) -> ExecuteStats:
-    to_run = fg.roots
-
+    """Executes the nodes of `fg`, each as soon as all of its inputs have results.
+
+    Nodes of ops that `op_policy` allows to run in parallel are run on up to
+    the parallel budget of threads at once, and up to `op_policy.max_concurrency`
+    per op, whenever there is other work to overlap them with. Other nodes run
+    on this thread while those are in flight, so a slow node only holds up the
+    nodes that depend on it.
+
+    Threaded nodes run in the contexts `parallelism.in_thread_context` copies
+    into them. `object_context` and the tag store are not copied, so threaded
+    nodes never see the ones this thread's nodes run in. The node result store
+    and the top level stats are shared with this thread: results are merged
+    into the store as each threaded node finishes, and `ExecuteStats` is
+    locked.
+    """
     stats = ExecuteStats()
-    tracer = engine_trace.tracer()
-    while len(to_run):
-        running_now = list(to_run)
-        to_run = {}
-
-        def _key(n):
-            return n.node.from_op.name
-
-        groups = itertools.groupby(sorted(running_now, key=_key), key=_key)
-
-        parallel_budget = parallelism.get_parallel_budget()
-
-        for op_name, group_iter in groups:
-            group = list(group_iter)
-            op_def = registry_mem.memory_registry.get_op(op_name)
-            if (
-                parallel_budget != 1
-                and len(group) > 1
-                and op_policy.should_run_in_parallel(op_name)
+    parallel_budget = parallelism.get_parallel_budget()
+
+    # Nodes that are ready to run on this thread, and in threads
+    ready: collections.deque[forward_graph.ForwardNode] = collections.deque()
+    ready_parallel: collections.deque[forward_graph.ForwardNode] = collections.deque()
+    scheduled: set[forward_graph.ForwardNode] = set()
+    running: dict[concurrent.futures.Future, forward_graph.ForwardNode] = {}
+    running_op_counts: collections.Counter[str] = collections.Counter()
+    executor: typing.Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+    def schedule(forward_node: forward_graph.ForwardNode) -> None:
+        scheduled.add(forward_node)
+        op_name = forward_node.node.from_op.name
+        if parallel_budget != 1 and op_policy.should_run_in_parallel(op_name):
+            ready_parallel.append(forward_node)
+        else:
+            ready.append(forward_node)
+
+    def finish(
+        forward_node: forward_graph.ForwardNode,
+        report: NodeExecutionReport,
+        duration: float,
+    ) -> None:
+        stats.add_node(
+            forward_node.node,
+            duration,
+            report["cache_used"],
+            report.get("already_executed") or False,
+            report.get("bytes_read_to_arrow") or 0,
+        )
+        for downstream_forward_node in forward_node.input_to:
+            if downstream_forward_node in scheduled:
+                continue
+            if all(
+                fg.has_result(param_node)
+                for param_node in downstream_forward_node.node.from_op.inputs.values()
             ):
-                # Parallel threaded case
-                num_threads = min(len(group), parallel_budget)
-                remaining_budget_per_thread = (
-                    parallelism.get_remaining_budget_per_thread(len(group))
+                schedule(downstream_forward_node)
+
+    def finish_running(futures: typing.Iterable[concurrent.futures.Future]) -> None:
+        for future in futures:
+            forward_node = running.pop(future)
+            running_op_counts[forward_node.node.from_op.name] -= 1
+            finish(*future.result())
+
+    def can_start(forward_node: forward_graph.ForwardNode) -> bool:
+        if len(running) >= parallel_budget:
+            return False
+        op_name = forward_node.node.from_op.name
+        max_concurrency = op_policy.max_concurrency(op_name)
+        return max_concurrency is None or running_op_counts[op_name] < max_concurrency
+
+    def start_parallel() -> None:
+        nonlocal executor
+        # Threads only pay off if there is other work to overlap them with
+        if len(ready_parallel) + len(ready) + len(running) <= 1:
+            return
+        remaining_budget_per_thread = parallelism.get_remaining_budget_per_thread(
+            min(len(ready_parallel) + len(running), parallel_budget)
+        )
+        for _ in range(len(ready_parallel)):
+            forward_node = ready_parallel.popleft()
+            if not can_start(forward_node):
+                ready_parallel.append(forward_node)
+                continue
+            if executor is None:
+                executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=parallel_budget
                 )
+            op_name = forward_node.node.from_op.name
+            logging.info(
+                "Running %s in a thread with %s remaining parallel budget"
+                % (op_name, remaining_budget_per_thread)
+            )
+            do_one = parallelism.in_thread_context(
+                functools.partial(
+                    _execute_forward_node_in_thread, fg, no_cache=no_cache
+                ),
+                remaining_budget_per_thread,
+            )
+            running[executor.submit(do_one, forward_node)] = forward_node
+            running_op_counts[op_name] += 1
 
-                def do_one(
-                    x,
-                ) -> typing.Tuple[
-                    forward_graph.ForwardNode,
-                    NodeExecutionReport,
-                    float,
-                ]:
-                    # TODO: I don't think this handles tags correctly.
-                    start_time = time.time()
-                    try:
-                        result_report = execute_forward_node(fg, x, no_cache)
-                    except Exception as e:
-                        x.set_result(forward_graph.ErrorResult(e))
-                        result_report = {
-                            "cache_used": False,
-                            "already_executed": False,
-                            "bytes_read_to_arrow": 0,
-                        }
-                    return (
-                        x,
-                        result_report,
-                        time.time() - start_time,
-                    )
-
-                logging.info(
-                    "Running %s on %s threads with %s remaining parallel budget each"
-                    % (op_name, num_threads, remaining_budget_per_thread)
+    for forward_node in fg.roots:
+        schedule(forward_node)
+    try:
+        while ready or ready_parallel or running:
+            start_parallel()
+            if ready:
+                forward_node = ready.popleft()
+            elif running:
+                done, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED
                 )
+                finish_running(done)
+                continue
+            else:
+                # A parallel node with nothing to overlap it with
+                forward_node = ready_parallel.popleft()
+            finish(*_execute_forward_node_in_process(fg, forward_node, no_cache))
+            finish_running([future for future in running if future.done()])
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+    return stats
 
-                for (
-                    fn,
-                    report,
-                    duration,
-                ) in parallelism.do_in_parallel(do_one, group):
-                    stats.add_node(
-                        fn.node,
-                        duration,
-                        report["cache_used"],
-                        report.get("already_executed") or False,
-                        report["bytes_read_to_arrow"],
-                    )
 
+def _execute_forward_node_in_thread(
+    fg: forward_graph.ForwardGraph,
+    forward_node: forward_graph.ForwardNode,
+    no_cache: bool = False,
+) -> tuple[forward_graph.ForwardNode, "NodeExecutionReport", float]:
+    # TODO: I don't think this handles tags correctly.
+    start_time = time.time()
+    try:
+        result_report = execute_forward_node(fg, forward_node, no_cache)
+    except Exception as e:
+        forward_node.set_result(forward_graph.ErrorResult(e))
+        result_report = {
+            "cache_used": False,
+            "already_executed": False,
+            "bytes_read_to_arrow": 0,
+        }
+    return forward_node, result_report, time.time() - start_time
+
+
+def _execute_forward_node_in_process(
+    fg: forward_graph.ForwardGraph,
+    forward_node: forward_graph.ForwardNode,
+    no_cache: bool = False,
+) -> tuple[forward_graph.ForwardNode, "NodeExecutionReport", float]:
+    tracer = engine_trace.tracer()
+    op_def = registry_mem.memory_registry.get_op(forward_node.node.from_op.name)
+    start_time = time.time()
+    span = None
+    if isinstance(forward_node.node, graph.OutputNode):
+        span = tracer.trace("op.%s" % graph.op_full_name(forward_node.node.from_op))
+    try:
+        with tag_store.set_curr_node(
+            id(forward_node.node),
+            [
+                id(input_node)
+                for input_node in forward_node.node.from_op.inputs.values()
+            ],
+        ):
+            # Lambdas and async functions do not use object_context (object caching
+            # and mutational transactions).
+            if op_def.is_async or (
+                any(
+                    isinstance(input_node.type, types.Function)
+                    for input_node in forward_node.node.from_op.inputs.values()
+                )
+                and not op_def.mutation
+            ):
+                report = execute_forward_node(fg, forward_node, no_cache=no_cache)
             else:
-                # Sequential in process case
-                for forward_node in group:
-                    start_time = time.time()
-                    span = None
-                    if isinstance(forward_node.node, graph.OutputNode):
-                        span = tracer.trace(
-                            "op.%s" % graph.op_full_name(forward_node.node.from_op)
-                        )
-                    try:
-                        with tag_store.set_curr_node(
-                            id(forward_node.node),
-                            [
-                                id(input_node)
-                                for input_node in forward_node.node.from_op.inputs.values()
-                            ],
-                        ):
-                            # Lambdas and async functions do not use object_context (object caching
-                            # and mutational transactions).
-                            if op_def.is_async or (
-                                any(
-                                    isinstance(input_node.type, types.Function)
-                                    for input_node in forward_node.node.from_op.inputs.values()
-                                )
-                                and not op_def.mutation
-                            ):
-                                report = execute_forward_node(
-                                    fg, forward_node, no_cache=no_cache
-                                )
-                            else:
-                                with object_context.object_context():
-                                    report = execute_forward_node(
-                                        fg, forward_node, no_cache=no_cache
-                                    )
-
-                    except Exception as e:
-                        logging.info(
-                            "Exception during execution of: %s\n%s"
-                            % (
-                                graph_debug.node_expr_str_full(forward_node.node),
-                                traceback.format_exc(),
-                            )
-                        )
-                        if value_or_error.DEBUG:
-                            raise
-                        forward_node.set_result(forward_graph.ErrorResult(e))
-                        report = {
-                            "cache_used": False,
-                            "already_executed": False,
-                            "bytes_read_to_arrow": 0,
-                        }
-                    finally:
-                        if span is not None:
-                            span.finish()
-
-                    if span is not None:
-                        span.set_metric(
-                            "bytes_read_to_arrow",
-                            report["bytes_read_to_arrow"],
-                            True,
-                        )
+                with object_context.object_context():
+                    report = execute_forward_node(fg, forward_node, no_cache=no_cache)
 
-                    stats.add_node(
-                        forward_node.node,
-                        time.time() - start_time,
-                        report["cache_used"],
-                        report.get("already_executed") or False,
-                        report.get("bytes_read_to_arrow") or 0,
-                    )
-        for forward_node in running_now:
-            for downstream_forward_node in forward_node.input_to:
-                ready_to_run = True
-                for param_node in downstream_forward_node.node.from_op.inputs.values():
-                    if not fg.has_result(param_node):
-                        ready_to_run = False
-                if ready_to_run:
-                    to_run[downstream_forward_node] = True
-    return stats
+    except Exception as e:
+        logging.info(
+            "Exception during execution of: %s\n%s"
+            % (
+                graph_debug.node_expr_str_full(forward_node.node),
+                traceback.format_exc(),
+            )
+        )
+        if value_or_error.DEBUG:
+            raise
+        forward_node.set_result(forward_graph.ErrorResult(e))
+        report = {
+            "cache_used": False,
+            "already_executed": False,
+            "bytes_read_to_arrow": 0,
+        }
+    finally:
+        if span is not None:
+            span.finish()
+
+    if span is not None:
+        span.set_metric(
+            "bytes_read_to_arrow",
+            report["bytes_read_to_arrow"],
+            True,
+        )
+    return forward_node, report, time.time() - start_time
 
 
 def async_op_body(run_key: trace_local.RunKey, run_body, inputs, wandb_api_ctx):
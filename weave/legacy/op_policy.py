@@ -1,3 +1,5 @@
+import typing
+
 # Cache policy for when cache mode is minimal.
 # We don't declare these directly on op defs for now. I want op definitions
 # to be more declarative than that. Ie they should be cached if they are
@@ -75,6 +77,18 @@ def should_run_in_parallel(op_name: str) -> bool:
     return op_name in PARALLEL_OP_NAMES
 
 
+# Maximum number of nodes of an op that execute runs at once, for parallel ops
+# that call rate limited or memory hungry services. Other parallel ops are
+# only limited by the parallel budget.
+PARALLEL_OP_CONCURRENCY: dict[str, int] = {}
+
+
+def max_concurrency(op_name: str) -> typing.Optional[int]:
+    if op_name.startswith("mapped_"):
+        op_name = op_name[len("mapped_") :]
+    return PARALLEL_OP_CONCURRENCY.get(op_name)
+
+
 def should_cache(op_name: str) -> bool:
     if op_name.startswith("mapped_"):
         return False
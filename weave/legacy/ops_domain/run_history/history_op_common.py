@@ -1,12 +1,14 @@
 import json
 import typing
 
+import numpy as np
 import pyarrow as pa
 from pyarrow import parquet as pq
 
 from weave import (
     engine_trace,
     errors,
+    parallelism,
     registry_mem,
     util,
 )
@@ -366,14 +368,17 @@ def awl_from_local_parquet_path(
     columns: list[str] = [],
     artifact: typing.Optional[artifact_base.Artifact] = None,
 ) -> ArrowWeaveList:
+    # Memory map the file so that only the pages of the requested columns are
+    # paged in, instead of reading the whole file into memory first.
     with tracer.trace("pq.read_metadata") as span:
         span.set_tag("path", path)
-        meta = pq.read_metadata(path)
-    file_schema = meta.schema
-    columns_to_read = [c for c in columns if c in file_schema.to_arrow_schema().names]
-    with tracer.trace("pq.read_table") as span:
-        span.set_tag("path", path)
-        table = pq.read_table(path, columns=columns_to_read)
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+    with parquet_file:
+        file_schema = parquet_file.schema_arrow
+        columns_to_read = [c for c in columns if c in file_schema.names]
+        with tracer.trace("pq.read_table") as span:
+            span.set_tag("path", path)
+            table = parquet_file.read(columns=columns_to_read)
 
     # convert table to ArrowWeaveList
     with tracer.trace("make_awl") as span:
@@ -383,6 +388,53 @@ def awl_from_local_parquet_path(
     return awl
 
 
+def _parquet_min_step(path: str) -> typing.Optional[float]:
+    meta = pq.read_metadata(path, memory_map=True)
+    paths = [meta.schema.column(i).path for i in range(meta.num_columns)]
+    if "_step" not in paths:
+        return None
+    step_ndx = paths.index("_step")
+    min_step = None
+    for i in range(meta.num_row_groups):
+        stats = meta.row_group(i).column(step_ndx).statistics
+        if stats is None or not stats.has_min_max:
+            return None
+        if min_step is None or stats.min < min_step:
+            min_step = stats.min
+    return min_step
+
+
+def download_history_parquet_files(run: wdt.Run) -> list[str]:
+    """Downloads the run's parquet history files in parallel.
+
+    Returns the local paths of the files, ordered by their first `_step` when
+    the files have row group statistics for it, so that concatenating files
+    that each cover a range of steps is already sorted.
+    """
+
+    def download_one(url: str) -> typing.Optional[str]:
+        # Clients can't be shared between threads, each one waits on a single
+        # response queue.
+        io = io_service.get_sync_client()
+        local_path = io.ensure_file_downloaded(url)
+        if local_path is None:
+            return None
+        return io.fs.path(local_path)
+
+    urls = run["sampledParquetHistory"]["parquetUrls"]
+    with tracer.trace("download_history_parquet_files") as span:
+        span.set_tag("n_files", len(urls))
+        paths = [
+            p for p in parallelism.do_in_parallel(download_one, urls) if p is not None
+        ]
+
+    if len(paths) > 1:
+        min_steps = [_parquet_min_step(path) for path in paths]
+        if all(s is not None for s in min_steps):
+            paths = [p for _, p in sorted(zip(min_steps, paths), key=lambda x: x[0])]
+    return paths
+
+
 def process_history_awl_tables(tables: list[ArrowWeaveList]):
     concatted = concat_awls(tables)
     if isinstance(concatted, ArrowWeaveList):
@@ -406,25 +458,37 @@ def awl_to_pa_table(awl: ArrowWeaveList):
 
 
 def sort_history_pa_table(table: pa.Table):
-    with tracer.trace("pq.sort"):
-        table_sorted_indices = pa.compute.bottom_k_unstable(
-            table, sort_keys=["_step"], k=len(table)
-        )
+    steps = table["_step"]
+    if steps.null_count > 0:
+        with tracer.trace("pq.sort"):
+            table_sorted_indices = pa.compute.bottom_k_unstable(
+                table, sort_keys=["_step"], k=len(table)
+            )
+        with tracer.trace("pq.take"):
+            return table.take(table_sorted_indices)
+
+    with tracer.trace("pq.sort") as span:
+        steps_np = steps.to_numpy()
+        # History is made of files (and the live set) that are each sorted by
+        # step, and usually cover consecutive step ranges. In that case the
+        # concatenation is already sorted and we can skip the copy.
+        if np.all(steps_np[1:] >= steps_np[:-1]):
+            span.set_tag("already_sorted", True)
+            return table
+        # Timsort finds the sorted runs and merges them, rather than sorting
+        # every row from scratch.
+        table_sorted_indices = np.argsort(steps_np, kind="stable")
 
     with tracer.trace("pq.take"):
         return table.take(table_sorted_indices)
 
 
 def read_history_parquet(run: wdt.Run, columns=None):
-    io = io_service.get_sync_client()
     object_type = refine_history_type(run, columns=columns)
     tables = []
-    for url in run["sampledParquetHistory"]["parquetUrls"]:
-        local_path = io.ensure_file_downloaded(url)
-        if local_path is not None:
-            path = io.fs.path(local_path)
-            awl = awl_from_local_parquet_path(path, object_type, columns=columns)
-            tables.append(awl)
+    for path in download_history_parquet_files(run):
+        awl = awl_from_local_parquet_path(path, object_type, columns=columns)
+        tables.append(awl)
     if len(tables) == 0:
         return None
     return process_history_awl_tables(tables)
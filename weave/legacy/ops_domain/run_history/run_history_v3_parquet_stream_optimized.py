@@ -1,19 +1,21 @@
 import dataclasses
+import hashlib
 import json
 import logging
 import typing
+import urllib.parse
 
 import pyarrow as pa
 
-from weave import engine_trace, errors
+from weave import engine_trace, environment, errors, filesystem
 from weave import weave_types as types
 from weave.query_api import op
 from weave.legacy import (
     artifact_base,
     artifact_fs,
     artifact_mem,
+    cache,
     gql_json_cache,
-    io_service,
 )
 from weave.legacy.arrow import convert
 from weave.legacy.arrow.list_ import (
@@ -328,6 +330,15 @@ def _get_history3(run: wdt.Run, columns=None):
     flattened_object_type = history_op_common.refine_history_type(run, columns=columns)
     final_type = _unflatten_history_object_type(flattened_object_type)
 
+    # Only the fast path is cached, its result is plain arrow data that doesn't
+    # refer to anything stored in the artifact.
+    use_fast_path = _use_fast_path(flattened_object_type)
+    cache_path = _history3_cache_path(run, columns) if use_fast_path else None
+    if cache_path is not None:
+        cached_awl = _read_cached_history3(cache_path, artifact)
+        if cached_awl is not None:
+            return cached_awl
+
     # 2. Read in the live set
     raw_live_data = _get_live_data_from_run(run, columns=columns)
 
@@ -347,7 +358,6 @@ def _get_history3(run: wdt.Run, columns=None):
     ]
 
     # 5 Now we concat the converted liveset and parquet files
-    use_fast_path = _use_fast_path(flattened_object_type)
     if use_fast_path:
         concatted_awl = _fast_history3_concat(raw_history_pa_tables, raw_live_data)
         if len(concatted_awl) == 0:
@@ -402,15 +412,17 @@ def _get_history3(run: wdt.Run, columns=None):
             artifact,
         )
 
+        # Keep the parquet files in step order, followed by the live set, so
+        # that the concatenation is usually already sorted.
         concatted_awl = history_op_common.concat_awls(
             [
-                live_data_awl,
-                *{
+                *[
                     ArrowWeaveList(
                         table, object_type=flattened_object_type, artifact=artifact
                     )
                     for table in processed_history_pa_tables
-                },
+                ],
+                live_data_awl,
             ]
         )
 
@@ -431,6 +443,8 @@ def _get_history3(run: wdt.Run, columns=None):
         raise errors.WeaveWBHistoryTranslationError(
             f"Failed to effectively convert column of Gorilla Parquet History to expected history type: {reason}"
         )
+    if cache_path is not None and not _history3_run_is_live(run):
+        _write_cached_history3(cache_path, final_array, final_type)
     return ArrowWeaveList(
         final_array,
         final_type,
@@ -438,6 +452,92 @@ def _get_history3(run: wdt.Run, columns=None):
     )
 
 
+# Bump when the cached representation of history changes.
+HISTORY3_CACHE_VERSION = 1
+
+
+def _history3_cache_path(
+    run: wdt.Run, columns: typing.Optional[list[str]]
+) -> typing.Optional[str]:
+    """Returns the filesystem path the history of `run` is cached at, or None
+    if it shouldn't be cached.
+
+    The path is a digest of everything the result is computed from. Parquet
+    urls are presigned, so only their paths are used. The filesystem puts it
+    under the time bucketed cache prefix, so it is removed with the rest of
+    the bucket. Without a cache prefix nothing would remove it, so history is
+    not cached.
+    """
+    if not environment.enable_history_disk_cache():
+        return None
+    if cache.get_cache_prefix_context() is None:
+        return None
+    history = run["sampledParquetHistory"]
+    key = [
+        HISTORY3_CACHE_VERSION,
+        run["project"]["entity"]["name"],
+        run["project"]["name"],
+        run["name"],
+        [urllib.parse.urlsplit(url).path for url in history["parquetUrls"]],
+        sorted(columns) if columns is not None else None,
+        history["liveData"],
+        run["historyKeys"],
+    ]
+    try:
+        key_json = json.dumps(key, sort_keys=True)
+    except TypeError:
+        return None
+    digest = hashlib.md5(key_json.encode()).hexdigest()
+    return f"history3/{digest}.arrow"
+
+
+def _history3_run_is_live(run: wdt.Run) -> bool:
+    # A run's history is only fully exported to parquet once it stops logging,
+    # until then its latest steps come back as live data.
+    live_data = gql_json_cache.use_json(run["sampledParquetHistory"]["liveData"])
+    return len(live_data) > 0
+
+
+def _read_cached_history3(
+    path: str, artifact: artifact_base.Artifact
+) -> typing.Optional[ArrowWeaveList]:
+    fs = filesystem.get_filesystem()
+    if not fs.exists(path):
+        return None
+    with tracer.trace("history3_cache_read") as span:
+        span.set_tag("path", path)
+        try:
+            # The memory mapped table is not copied, its buffers point into
+            # the file.
+            source = pa.memory_map(fs.path(path))
+            table = pa.ipc.open_file(source).read_all()
+            object_type = types.TypeRegistry.type_from_dict(
+                json.loads(table.schema.metadata[b"weave_type"])
+            )
+        except Exception:
+            logging.warning("Failed to read cached history %s", path, exc_info=True)
+            return None
+    column = table["arr"]
+    arr = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+    return ArrowWeaveList(arr, object_type, artifact=artifact)
+
+
+def _write_cached_history3(
+    path: str, final_array: pa.Array, final_type: types.Type
+) -> None:
+    table = pa.table({"arr": final_array}).replace_schema_metadata(
+        {"weave_type": json.dumps(final_type.to_dict())}
+    )
+    with tracer.trace("history3_cache_write") as span:
+        span.set_tag("path", path)
+        try:
+            with filesystem.get_filesystem().open_write(path) as f:
+                with pa.ipc.new_file(f, table.schema) as writer:
+                    writer.write_table(table)
+        except Exception:
+            logging.warning("Failed to cache history %s", path, exc_info=True)
+
+
 def _construct_live_data_awl(
     live_columns: dict[str, list],
     live_columns_already_mapped: dict[str, list],
@@ -846,17 +946,13 @@ def _read_raw_history_awl_tables(
     columns=None,
     artifact: typing.Optional[artifact_base.Artifact] = None,
 ) -> list[ArrowWeaveList]:
-    io = io_service.get_sync_client()
     tables = []
-    for url in run["sampledParquetHistory"]["parquetUrls"]:
-        local_path = io.ensure_file_downloaded(url)
-        if local_path is not None:
-            path = io.fs.path(local_path)
-            awl = history_op_common.awl_from_local_parquet_path(
-                path, None, columns=columns, artifact=artifact
-            )
-            awl = awl.map_column(_parse_bytes_mapper)
-            tables.append(awl)
+    for path in history_op_common.download_history_parquet_files(run):
+        awl = history_op_common.awl_from_local_parquet_path(
+            path, None, columns=columns, artifact=artifact
+        )
+        awl = awl.map_column(_parse_bytes_mapper)
+        tables.append(awl)
     return tables
 
     # return history_op_common.process_history_awl_tables(tables)
@@ -92,7 +92,11 @@ class WandbFileManagerAsync:
         self.wandb_api = wandb_api
         self._manifests: cache.LruTimeWindowCache[
             str, typing.Optional[artifact_wandb.WandbArtifactManifest]
-        ] = cache.LruTimeWindowCache(datetime.timedelta(minutes=5))
+        ] = cache.LruTimeWindowCache(
+            datetime.timedelta(minutes=5),
+            max_bytes=weave_env.manifest_cache_max_bytes(),
+            name="manifest",
+        )
 
     def manifest_path(
         self,
@@ -157,7 +161,10 @@ class WandbFileManagerAsync:
             if not isinstance(manifest, cache.LruTimeWindowCache.NotFound):
                 return manifest
             manifest = await self._manifest(art_uri, manifest_path)
-            self._manifests.set(manifest_path, manifest)
+            n_bytes = 0
+            if manifest is not None:
+                n_bytes = await self.fs.getsize(manifest_path)
+            self._manifests.set(manifest_path, manifest, n_bytes)
             return manifest
 
     async def local_path_and_download_url(
@@ -285,7 +292,11 @@ class WandbFileManager:
         self.wandb_api = wandb_api
         self._manifests: cache.LruTimeWindowCache[
             str, typing.Optional[artifact_wandb.WandbArtifactManifest]
-        ] = cache.LruTimeWindowCache(datetime.timedelta(minutes=5))
+        ] = cache.LruTimeWindowCache(
+            datetime.timedelta(minutes=5),
+            max_bytes=weave_env.manifest_cache_max_bytes(),
+            name="manifest",
+        )
 
     def manifest_path(
         self,
@@ -350,7 +361,10 @@ class WandbFileManager:
             if not isinstance(manifest, cache.LruTimeWindowCache.NotFound):
                 return manifest
             manifest = self._manifest(art_uri, manifest_path)
-            self._manifests.set(manifest_path, manifest)
+            n_bytes = 0
+            if manifest is not None:
+                n_bytes = self.fs.getsize(manifest_path)
+            self._manifests.set(manifest_path, manifest, n_bytes)
             return manifest
 
     def local_path_and_download_url(
@@ -51,9 +51,19 @@ def do_in_parallel(
     if parallel_budget <= 1:
         return map(do_one, items)
 
+    remaining_budget_per_thread = get_remaining_budget_per_thread(len(items))
+    return ThreadPoolExecutor(max_workers=parallel_budget).map(
+        in_thread_context(do_one, remaining_budget_per_thread), items
+    )
+
+
+def in_thread_context(
+    do_one: Callable[[ItemType], ResultType], remaining_budget_per_thread: int
+) -> Callable[[ItemType], ResultType]:
+    """Returns `do_one` wrapped to run in another thread with the current
+    thread's execution contexts, and the given parallel budget."""
     # Contexts aren't automatically propagated to threads, so we have to do so manually for every context
     memo_ctx = memo._memo_storage.get()
-    remaining_budget_per_thread = get_remaining_budget_per_thread(len(items))
     wandb_api_ctx = wandb_api.get_wandb_api_context()
     result_store = forward_graph.get_node_result_store()
     top_level_stats = execute.get_top_level_stats()
@@ -86,9 +96,7 @@ def do_in_parallel(
             if top_level_stats is not None and thread_top_level_stats is not None:
                 top_level_stats.merge(thread_top_level_stats)
 
-    return ThreadPoolExecutor(max_workers=parallel_budget).map(
-        do_one_with_memo_and_parallel_budget, items
-    )
+    return do_one_with_memo_and_parallel_budget
 
 
 def get_remaining_budget_per_thread(item_count: int) -> int:
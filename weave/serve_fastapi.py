@@ -20,7 +20,9 @@ from weave.trace.refs import ObjectRef
 from . import errors, pyfunc_type_util, weave_pydantic
 
 key_cache: cache.LruTimeWindowCache[str, typing.Optional[bool]] = (
-    cache.LruTimeWindowCache(datetime.timedelta(minutes=5))
+    cache.LruTimeWindowCache(
+        datetime.timedelta(minutes=5), max_entries=10000, name="api_key"
+    )
 )
 
 api: Optional[WandbApiAsync] = None
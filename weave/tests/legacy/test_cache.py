@@ -41,6 +41,40 @@ def test_lru_time_window_cache():
     ]
 
 
+def test_lru_time_window_cache_expired_get():
+    curtime = {"t": datetime.datetime(2020, 1, 1)}
+    c = cache.LruTimeWindowCache(
+        datetime.timedelta(seconds=5), now_fn=lambda: curtime["t"]
+    )
+    c.set("foo", "a")
+    curtime["t"] += datetime.timedelta(seconds=6)
+    assert c.get("foo") == cache.LruTimeWindowCache.NOT_FOUND
+    assert len(c._cache) == 0
+
+
+def test_lru_time_window_cache_size_limits():
+    c = cache.LruTimeWindowCache(
+        datetime.timedelta(minutes=5), max_entries=3, max_bytes=100
+    )
+    c.set("a", 1, 10)
+    c.set("b", 2, 10)
+    c.set("c", 3, 10)
+    assert c.get("a") == 1
+    c.set("d", 4, 10)
+    # b was least recently used
+    assert [k for _, k in c._cache] == ["c", "a", "d"]
+    assert c.n_bytes == 30
+
+    c.set("e", 5, 85)
+    assert [k for _, k in c._cache] == ["d", "e"]
+    assert c.n_bytes == 95
+
+    # Values larger than the whole cache are not kept
+    c.set("d", 6, 101)
+    assert [k for _, k in c._cache] == ["e"]
+    assert c.n_bytes == 85
+
+
 def test_bucket_timestamp():
     day_in_seconds = 60 * 60 * 24
     cacheTimestamps = []
@@ -20,6 +20,31 @@ def test_automatic_await_compile():
     assert str(result[0]) == "2.slowmult(slowmult(3, 4, 0.01).await(), 0.01)"
 
 
+def test_compile_cache(monkeypatch):
+    monkeypatch.setenv("WEAVE_COMPILE_CACHE_SECONDS", "60")
+    compile_calls = []
+    orig_compile = compile._compile
+
+    def counting_compile(nodes, pass_times=None):
+        compile_calls.append(nodes)
+        return orig_compile(nodes, pass_times)
+
+    monkeypatch.setattr(compile, "_compile", counting_compile)
+
+    def make_node(rhs):
+        return async_demo.slowmult(3, rhs, 0.01)
+
+    result = compile.compile([make_node(4)])
+    cached_result = compile.compile([make_node(4)])
+    assert len(compile_calls) == 1
+    assert cached_result[0] is result[0]
+
+    # Graphs with different consts are compiled separately
+    other_result = compile.compile([make_node(5)])
+    assert len(compile_calls) == 2
+    assert str(other_result[0]) == "slowmult(3, 5, 0.01)"
+
+
 @pytest.mark.parametrize(
     "nodes_with_expected_values",
     [
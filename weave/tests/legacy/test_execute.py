@@ -1,10 +1,12 @@
 import os
+import threading
+import time
 import typing
 
 import pytest
 
 import weave
-from weave.legacy import execute, ops
+from weave.legacy import execute, object_context, op_policy, ops
 
 from ... import api, environment, weave_internal
 from ... import weave_types as types
@@ -39,6 +41,49 @@ def _test_execute_refining_op(x: int) -> typing.Any:
     return x + 1
 
 
+_test_execute_event = threading.Event()
+_test_execute_running_counts: list[int] = []
+_test_execute_running_lock = threading.Lock()
+
+
+@api.op(input_type={"x": types.Int()}, output_type=types.Boolean(), hidden=True)
+def _test_execute_wait_op(x):
+    return _test_execute_event.wait(timeout=5)
+
+
+@api.op(input_type={"x": types.Int()}, output_type=types.Int(), hidden=True)
+def _test_execute_set_op(x):
+    _test_execute_event.set()
+    return x
+
+
+@api.op(input_type={"x": types.Int()}, output_type=types.Int(), hidden=True)
+def _test_execute_count_op(x):
+    with _test_execute_running_lock:
+        _test_execute_running_counts.append(1)
+    time.sleep(0.05)
+    with _test_execute_running_lock:
+        running = len(_test_execute_running_counts)
+        _test_execute_running_counts.pop()
+    return running
+
+
+_test_execute_object_contexts: dict[str, typing.Any] = {}
+
+
+@api.op(input_type={"x": types.Int()}, output_type=types.Boolean(), hidden=True)
+def _test_execute_context_wait_op(x):
+    _test_execute_object_contexts["wait"] = object_context.get_object_context()
+    return _test_execute_event.wait(timeout=5)
+
+
+@api.op(input_type={"x": types.Int()}, output_type=types.Int(), hidden=True)
+def _test_execute_context_set_op(x):
+    _test_execute_object_contexts["set"] = object_context.get_object_context()
+    _test_execute_event.set()
+    return x
+
+
 _context_state.clear_loading_built_ins(_loading_builtins_token)
 
 
@@ -166,6 +211,69 @@ def expensive_op(x: int) -> int:
     return x + 10000
 
 
+def test_execute_forward_does_not_wait_for_slow_nodes(monkeypatch):
+    monkeypatch.setattr(op_policy, "PARALLEL_OP_NAMES", ["op-_test_execute_wait_op"])
+    _test_execute_event.clear()
+    # The wait op only returns True if the independent set op runs while it
+    # is in flight, rather than after every node that can run alongside it.
+    res = weave.use(
+        [_test_execute_wait_op(1), _test_execute_set_op(execute_test_count_op([1, 2]))]
+    )
+    assert res == [True, 2]
+
+
+def test_execute_forward_op_concurrency(monkeypatch):
+    monkeypatch.setattr(op_policy, "PARALLEL_OP_NAMES", ["op-_test_execute_count_op"])
+    monkeypatch.setattr(
+        op_policy, "PARALLEL_OP_CONCURRENCY", {"op-_test_execute_count_op": 2}
+    )
+    res = weave.use([_test_execute_count_op(i) for i in range(6)])
+    assert max(res) == 2
+
+
+def test_execute_forward_threads_do_not_share_object_context(monkeypatch):
+    monkeypatch.setattr(
+        op_policy, "PARALLEL_OP_NAMES", ["op-_test_execute_context_wait_op"]
+    )
+    _test_execute_event.clear()
+    _test_execute_object_contexts.clear()
+    # The set op runs on this thread while the wait op runs in a thread
+    res = weave.use(
+        [
+            _test_execute_context_wait_op(1),
+            _test_execute_context_set_op(execute_test_count_op([1, 2])),
+        ]
+    )
+    assert res == [True, 2]
+    assert _test_execute_object_contexts["set"] is not None
+    assert _test_execute_object_contexts["wait"] is None
+
+
+def test_execute_stats_merge_from_threads():
+    node = _test_execute_set_op(1)
+    stats = execute.ExecuteStats()
+
+    def add_nodes():
+        thread_stats = execute.ExecuteStats()
+        for _ in range(1000):
+            stats.add_node(node, 1.0, False, False, 1)
+            thread_stats.add_node(node, 1.0, True, False, 1)
+        stats.merge(thread_stats)
+
+    threads = [threading.Thread(target=add_nodes) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stats.summary() == {
+        "count": 16000,
+        "total_time": 16000.0,
+        "cache_used": 8000,
+        "already_executed": 0,
+        "bytes_read_to_arrow": 16000,
+    }
+
+
 @pytest.mark.skip(reason="Disabled in favor of parallelism for the moment.")
 def test_cache_column():
     os.environ["WEAVE_CACHE_MODE"] = "minimal"
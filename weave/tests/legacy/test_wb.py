@@ -1,21 +1,37 @@
 import cProfile
 import json
+import os
 import re
 
 import numpy as np
+import pyarrow as pa
 import pytest
 import wandb
+from pyarrow import parquet as pq
 
+from weave import environment, filesystem, stitch
 from weave import query_api as weave
-from weave import stitch
 from weave import weave_types as types
-from weave.legacy import artifact_fs, artifact_wandb, compile, graph, ops, uris
+from weave.legacy import (
+    artifact_fs,
+    artifact_wandb,
+    cache,
+    compile,
+    graph,
+    ops,
+    uris,
+)
 from weave.legacy import ops_arrow as arrow
+from weave.legacy.arrow import convert
 from weave.legacy.language_features.tagging.tagged_value_type import TaggedValueType
 from weave.legacy.ops_arrow import ArrowWeaveListType
 from weave.legacy.ops_domain import artifact_membership_ops as amo
 from weave.legacy.ops_domain import table, wb_util, wbmedia
 from weave.legacy.ops_domain import wb_domain_types as wdt
+from weave.legacy.ops_domain.run_history import history_op_common
+from weave.legacy.ops_domain.run_history import (
+    run_history_v3_parquet_stream_optimized as run_history_v3,
+)
 from weave.legacy.ops_primitives import dict_, list_
 from weave.legacy.ops_primitives.file import _as_w0_dict_
 from weave.tests.legacy.test_wb_domain_ops import assert_gql_str_equal
@@ -1538,6 +1554,103 @@ def test_run_history_as_of(fake_wandb):
     ]
 
 
+def test_sort_history_pa_table():
+    sorted_table = pa.table({"_step": [0, 1, 2, 2, 3], "x": ["a", "b", "c", "d", "e"]})
+    assert history_op_common.sort_history_pa_table(sorted_table) is sorted_table
+
+    # Concatenated runs of steps that overlap are merged
+    table = pa.table({"_step": [3, 4, 7, 0, 5, 6, 1], "x": list("abcdefg")})
+    result = history_op_common.sort_history_pa_table(table)
+    assert result["_step"].to_pylist() == [0, 1, 3, 4, 5, 6, 7]
+    assert result["x"].to_pylist() == list("dgabefc")
+
+
+def test_download_history_parquet_files_orders_by_step(tmp_path, monkeypatch):
+    paths = {}
+    for name, steps in [("b", [10, 11]), ("a", [0, 1]), ("c", [20, 21])]:
+        paths[name] = str(tmp_path / f"{name}.parquet")
+        pq.write_table(pa.table({"_step": steps}), paths[name])
+
+    class FakeFs:
+        def path(self, path):
+            return path
+
+    class FakeClient:
+        fs = FakeFs()
+
+        def ensure_file_downloaded(self, url):
+            return paths[url]
+
+    monkeypatch.setattr(
+        history_op_common.io_service, "get_sync_client", lambda: FakeClient()
+    )
+    run = {"sampledParquetHistory": {"parquetUrls": ["b", "a", "c"]}}
+    assert history_op_common.download_history_parquet_files(run) == [
+        paths["a"],
+        paths["b"],
+        paths["c"],
+    ]
+
+
+def test_history3_disk_cache(monkeypatch):
+    monkeypatch.setenv("WEAVE_ENABLE_HISTORY_DISK_CACHE", "true")
+    number_type_counts = {"typeCounts": [{"type": "number", "count": 2}]}
+    parquet_rows = [{"_step": 0, "loss": 1.0}, {"_step": 1, "loss": 0.5}]
+
+    def make_run(live_data):
+        history_keys = {"_step": number_type_counts, "loss": number_type_counts}
+        return wdt.Run(
+            {
+                "name": "run1",
+                "project": {"name": "project", "entity": {"name": "entity"}},
+                "historyKeys": json.dumps({"keys": history_keys}),
+                "sampledParquetHistory": {
+                    "parquetUrls": ["https://example.com/run1.parquet?sig=1"],
+                    "liveData": json.dumps(live_data),
+                },
+            }
+        )
+
+    monkeypatch.setattr(
+        run_history_v3,
+        "_read_raw_history_awl_tables",
+        lambda run, columns, artifact: [convert.to_arrow(parquet_rows)],
+    )
+    columns = ["_step", "loss"]
+    finished_run = make_run([])
+
+    # Without a time bucketed cache prefix, nothing would clean the file up
+    assert run_history_v3._history3_cache_path(finished_run, columns) is None
+
+    with cache.time_interval_cache_prefix(cache.bucket_timestamp(1)):
+        cache_path = run_history_v3._history3_cache_path(finished_run, columns)
+        assert cache_path is not None
+        fs = filesystem.get_filesystem()
+        assert fs.path(cache_path).startswith(
+            os.path.join(
+                environment.weave_filesystem_dir(), cache.get_cache_prefix_context()
+            )
+        )
+
+        result = run_history_v3._get_history3(finished_run, columns)
+        assert result.to_pylist_raw() == parquet_rows
+        assert fs.exists(cache_path)
+
+        def fail_concat(*args):
+            raise AssertionError("history should be read from the cache")
+
+        with monkeypatch.context() as m:
+            m.setattr(run_history_v3, "_fast_history3_concat", fail_concat)
+            cached = run_history_v3._get_history3(finished_run, columns)
+        assert cached.to_pylist_raw() == parquet_rows
+        assert cached.object_type == result.object_type
+
+        # The history of a run that is still logging is not written
+        live_run = make_run([{"_step": 2, "loss": 0.25}])
+        assert len(run_history_v3._get_history3(live_run, columns)) == 3
+        assert not fs.exists(run_history_v3._history3_cache_path(live_run, columns))
+
+
 def test_artifact_membership_link(fake_wandb):
     fake_wandb.fake_api.add_mock(lambda q, ndx: artifact_browser_response)
     node = amo.artifact_membership_link(
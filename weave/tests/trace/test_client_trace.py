@@ -16,6 +16,7 @@ import weave
 from weave import Thread, ThreadPoolExecutor, weave_client
 from weave.trace.vals import MissingSelfInstanceError
 from weave.trace_server import trace_server_interface as tsi
+from weave.trace_server.errors import InvalidRequest
 from weave.trace_server.ids import generate_id
 from weave.trace_server.sqlite_trace_server import SqliteTraceServer
 from weave.trace_server.trace_server_interface_util import (
@@ -2470,3 +2471,58 @@ def test_model_save(client):
     assert isinstance(expected_predict_op, str) and expected_predict_op.startswith(
         "weave:///"
     )
+
+
+def test_calls_query_cursor_pagination(client):
+    @weave.op()
+    def ident(x):
+        return x
+
+    for i in range(7):
+        ident(i)
+
+    for sort_by in [None, [tsi.SortBy(field="started_at", direction="desc")]]:
+        all_calls = client.server.calls_query(
+            tsi.CallsQueryReq(project_id=client._project_id(), sort_by=sort_by)
+        ).calls
+        paged_ids = []
+        cursor = None
+        while True:
+            res = client.server.calls_query(
+                tsi.CallsQueryReq(
+                    project_id=client._project_id(),
+                    sort_by=sort_by,
+                    limit=3,
+                    cursor=cursor,
+                )
+            )
+            paged_ids.extend(call.id for call in res.calls)
+            cursor = res.next_cursor
+            if cursor is None:
+                break
+        assert paged_ids == [call.id for call in all_calls]
+        assert len(paged_ids) == 7
+
+        # The offset is ignored when a cursor is given
+        first_page = client.server.calls_query(
+            tsi.CallsQueryReq(project_id=client._project_id(), sort_by=sort_by, limit=3)
+        )
+        res = client.server.calls_query(
+            tsi.CallsQueryReq(
+                project_id=client._project_id(),
+                sort_by=sort_by,
+                limit=3,
+                offset=3,
+                cursor=first_page.next_cursor,
+            )
+        )
+        assert [call.id for call in res.calls] == paged_ids[3:6]
+
+    with pytest.raises(InvalidRequest):
+        client.server.calls_query(
+            tsi.CallsQueryReq(
+                project_id=client._project_id(),
+                sort_by=[tsi.SortBy(field="inputs.x", direction="asc")],
+                cursor="abc",
+            )
+        )
@@ -1,10 +1,29 @@
 import asyncio
+import functools
+import os
+import threading
+import time
 
+import numpy as np
 import pytest
 
 import weave
 from weave import Dataset, Evaluation, Model, ref_base
-from weave.flow.scorer import MultiTaskBinaryClassificationF1
+from weave.flow import eval as eval_module
+from weave.flow import util as util_module
+from weave.flow.scorer import (
+    AutoSummarizer,
+    MultiTaskBinaryClassificationF1,
+    auto_summarize,
+    stderr,
+)
+from weave.flow.util import (
+    WorkerProcessError,
+    WorkerProcessPool,
+    async_foreach,
+    get_sync_executor,
+    is_async_callable,
+)
 
 pytestmark = pytest.mark.webtest
 
@@ -36,6 +55,23 @@ def example_to_model_input(example):
     return {"input": example["input"]}
 
 
+@weave.op()
+def score_in_process(target, model_output):
+    return {"correct": target == model_output, "pid": os.getpid()}
+
+
+def sleep_in_process(seconds):
+    time.sleep(seconds)
+
+
+def exit_in_process(code):
+    os._exit(code)
+
+
+def getpid_in_process():
+    return os.getpid()
+
+
 def test_evaluate_callable_as_model(client):
     @weave.op()
     async def model_predict(input) -> str:
@@ -96,6 +132,67 @@ def test_evaluate_rows_only(client):
     assert result == expected_eval_result
 
 
+def test_evaluate_streams_results_in_chunks(client, monkeypatch):
+    monkeypatch.setattr(eval_module, "EVALUATION_RESULTS_CHUNK_SIZE", 4)
+    evaluation = Evaluation(dataset=dataset_rows, scorers=[score], trials=3)
+    result = asyncio.run(evaluation.evaluate(EvalModel()))
+    assert result == {
+        **expected_eval_result,
+        "score": {"true_count": 3, "true_fraction": 0.5},
+    }
+
+    summarize_call = next(
+        call for call in client.calls() if "Evaluation.summarize" in call.op_name
+    )
+    result_rows = list(summarize_call.inputs["eval_table"].rows)
+    assert len(result_rows) == 6
+    assert sorted(row["model_output"] for row in result_rows) == [3, 3, 3, 16, 16, 16]
+
+
+def test_scorers_run_concurrently_with_limits(client):
+    active = {"limited": 0, "unlimited": 0}
+    max_active = {"limited": 0, "unlimited": 0}
+    overlapped = False
+
+    async def track(name):
+        nonlocal overlapped
+        active[name] += 1
+        max_active[name] = max(max_active[name], active[name])
+        overlapped = overlapped or all(active.values())
+        await asyncio.sleep(0.01)
+        active[name] -= 1
+
+    @weave.op()
+    async def limited(target, model_output):
+        await track("limited")
+        return target == model_output
+
+    @weave.op()
+    async def unlimited(target, model_output):
+        await track("unlimited")
+        return target == model_output
+
+    evaluation = Evaluation(dataset=dataset_rows * 3, scorers=[limited, unlimited])
+    result = asyncio.run(
+        evaluation.evaluate(EvalModel(), scorer_concurrency={"limited": 1})
+    )
+    assert result["limited"] == {"true_count": 3, "true_fraction": 0.5}
+    assert overlapped
+    assert max_active == {"limited": 1, "unlimited": 6}
+
+
+def test_evaluate_options_do_not_change_digest(client):
+    evaluation = Evaluation(dataset=dataset_rows, scorers=[score])
+    asyncio.run(evaluation.evaluate(EvalModel()))
+    asyncio.run(
+        evaluation.evaluate(EvalModel(), scorer_concurrency={"score": 1}, batch_size=8)
+    )
+
+    evaluate_calls = [c for c in client.calls() if "Evaluation.evaluate" in c.op_name]
+    assert len(evaluate_calls) == 2
+    assert len({c.inputs["self"].ref.digest for c in evaluate_calls}) == 1
+
+
 def test_evaluate_other_model_method_names(eager_mode):
     class EvalModel(Model):
         @weave.op()
@@ -182,3 +279,312 @@ def test_multiclass_f1_score(client):
             "mean": pytest.approx(0, abs=0.05),
         },
     }
+
+
+def test_auto_summarizer_matches_auto_summarize():
+    data = [
+        {"a": 1, "b": True, "c": {"d": 0.5, "e": "x"}},
+        None,
+        {"a": 2, "b": False, "c": {"d": 1.5}},
+        {"a": 4, "c": None},
+    ]
+    summarizer = AutoSummarizer()
+    for val in data:
+        summarizer.add(val)
+    assert summarizer.summary() == auto_summarize(data)
+    assert summarizer.children["a"].stderr == pytest.approx(stderr([1, 2, 4]))
+
+
+def test_async_foreach_bounds_in_flight_items():
+    n_pulled = 0
+    n_finished = 0
+    max_in_flight = 0
+
+    def items():
+        nonlocal n_pulled, max_in_flight
+        for i in range(20):
+            n_pulled += 1
+            max_in_flight = max(max_in_flight, n_pulled - n_finished)
+            yield i
+
+    async def double(i):
+        nonlocal n_finished
+        await asyncio.sleep(0.001)
+        n_finished += 1
+        return i * 2
+
+    async def run():
+        return [res async for res in async_foreach(items(), double, 3)]
+
+    results = asyncio.run(run())
+    assert sorted(results) == [(i, i * 2) for i in range(20)]
+    assert max_in_flight == 3
+
+
+def test_is_async_callable():
+    async def async_fn(x):
+        return x
+
+    def sync_fn(x):
+        return x
+
+    class AsyncCallable:
+        async def __call__(self, x):
+            return x
+
+    assert is_async_callable(async_fn)
+    assert is_async_callable(weave.op()(async_fn))
+    assert is_async_callable(functools.partial(async_fn, 1))
+    assert is_async_callable(AsyncCallable())
+    assert is_async_callable(EvalModel().predict)
+    assert not is_async_callable(sync_fn)
+    assert not is_async_callable(weave.op()(sync_fn))
+
+
+def test_evaluate_runs_sync_ops_on_sync_executor(client, monkeypatch):
+    monkeypatch.setenv("WEAVE_PARALLELISM", "3")
+    thread_names = []
+
+    @weave.op()
+    async def async_predict(input):
+        thread_names.append(("predict", threading.current_thread().name))
+        return eval(input)
+
+    @weave.op()
+    def sync_score(target, model_output):
+        thread_names.append(("score", threading.current_thread().name))
+        return target == model_output
+
+    evaluation = Evaluation(dataset=dataset_rows * 5, scorers=[sync_score])
+    asyncio.run(evaluation.evaluate(async_predict))
+
+    assert {name for kind, name in thread_names if kind == "predict"} == {
+        threading.current_thread().name
+    }
+    score_threads = {name for kind, name in thread_names if kind == "score"}
+    assert all(name.startswith("weave-sync") for name in score_threads)
+    assert get_sync_executor()._max_workers == 3
+
+
+def test_process_scorers_are_traced(client):
+    scorer = MultiTaskBinaryClassificationF1(class_names=["a"])
+    evaluation = Evaluation(
+        dataset=[{"input": "1 + 2", "target": {"a": 3}}],
+        scorers=[scorer, score_in_process],
+        preprocess_model_input=lambda example: {"input": example["input"]},
+    )
+
+    class DictModel(Model):
+        @weave.op()
+        def predict(self, input):
+            return {"a": eval(input)}
+
+    result = asyncio.run(
+        evaluation.evaluate(
+            DictModel(),
+            process_scorers=["MultiTaskBinaryClassificationF1", "score_in_process"],
+            process_scorer_timeout=30,
+        )
+    )
+    assert result["MultiTaskBinaryClassificationF1"] == {
+        "a": {"f1": 1.0, "precision": 1.0, "recall": 1.0}
+    }
+
+    calls = {call.op_name.split("/")[-1].split(":")[0]: call for call in client.calls()}
+    predict_and_score = calls["Evaluation.predict_and_score"]
+    process_call = calls["score_in_process"]
+    assert process_call.parent_id == predict_and_score.id
+    assert process_call.output["correct"] is True
+    assert process_call.output["pid"] != os.getpid()
+    assert calls["MultiTaskBinaryClassificationF1.score"].parent_id == (
+        predict_and_score.id
+    )
+
+
+def test_worker_process_pool_isolates_failures():
+    pool = WorkerProcessPool(1)
+    try:
+        pid = pool.run(getpid_in_process, {})
+        assert pid != os.getpid()
+        assert pool.run(getpid_in_process, {}) == pid
+
+        with pytest.raises(TimeoutError):
+            pool.run(sleep_in_process, {"seconds": 10}, timeout=0.1)
+        with pytest.raises(WorkerProcessError):
+            pool.run(exit_in_process, {"code": 3})
+        with pytest.raises(TypeError):
+            pool.run(getpid_in_process, {"unexpected": 1})
+
+        assert pool.run(getpid_in_process, {}) not in (pid, os.getpid())
+    finally:
+        pool.shutdown()
+
+
+def test_worker_process_pool_shutdown_kills_busy_workers():
+    pool = WorkerProcessPool(1)
+    errors = []
+
+    def run_sleep():
+        try:
+            pool.run(sleep_in_process, {"seconds": 30})
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run_sleep)
+    thread.start()
+    while not pool._workers:
+        time.sleep(0.01)
+    worker = next(iter(pool._workers))
+    pool.shutdown()
+    thread.join(timeout=10)
+
+    assert not thread.is_alive()
+    assert isinstance(errors[0], WorkerProcessError)
+    assert not worker.process.is_alive()
+    assert pool.run(getpid_in_process, {}) != worker.process.pid
+    pool.shutdown()
+
+
+def test_worker_process_pool_reuses_workers_while_one_starts(monkeypatch):
+    pool = WorkerProcessPool(2)
+    starting = threading.Event()
+    started = threading.Event()
+
+    class SlowStartWorkerProcess(util_module._WorkerProcess):
+        def __init__(self, ctx):
+            starting.set()
+            started.wait(timeout=10)
+            super().__init__(ctx)
+
+    try:
+        pid = pool.run(getpid_in_process, {})
+        monkeypatch.setattr(util_module, "_WorkerProcess", SlowStartWorkerProcess)
+
+        busy = threading.Thread(
+            target=pool.run, args=(sleep_in_process, {"seconds": 0.2})
+        )
+        busy.start()
+        while pool._idle:
+            time.sleep(0.01)
+        # Needs a second worker, which starts slowly
+        starting_thread = threading.Thread(
+            target=pool.run, args=(getpid_in_process, {})
+        )
+        starting_thread.start()
+        assert starting.wait(timeout=10)
+
+        # The busy worker is handed back, and reused, while the other starts
+        busy.join(timeout=10)
+        assert not busy.is_alive()
+        assert pool.run(getpid_in_process, {}) == pid
+
+        started.set()
+        starting_thread.join(timeout=10)
+        assert not starting_thread.is_alive()
+        assert len(pool._workers) == 2
+    finally:
+        started.set()
+        pool.shutdown()
+
+
+def test_scorer_score_batch(client):
+    batch_sizes = []
+
+    class BatchExactMatch(weave.Scorer):
+        @weave.op()
+        def score(self, target, model_output):
+            raise AssertionError("score_batch should be used instead")
+
+        @weave.op()
+        def score_batch(self, targets, model_outputs):
+            batch_sizes.append(len(targets))
+            return np.asarray(targets) == np.asarray(model_outputs)
+
+    evaluation = Evaluation(dataset=dataset_rows * 4, scorers=[BatchExactMatch()])
+    result = asyncio.run(
+        evaluation.evaluate(EvalModel(), batch_size=8, batch_max_wait=10)
+    )
+    assert result["BatchExactMatch"] == {"true_count": 4, "true_fraction": 0.5}
+    assert batch_sizes == [8]
+
+    calls = list(client.calls())
+    evaluate_call = next(c for c in calls if "Evaluation.evaluate" in c.op_name)
+    batch_call = next(c for c in calls if "BatchExactMatch.score_batch" in c.op_name)
+    assert batch_call.parent_id == evaluate_call.id
+
+
+def test_model_predict_batch(client):
+    batch_sizes = []
+
+    class BatchEvalModel(Model):
+        @weave.op()
+        def predict_batch(self, input):
+            batch_sizes.append(len(input))
+            return [eval(x) for x in input]
+
+    evaluation = Evaluation(dataset=dataset_rows * 4, scorers=[score])
+    result = asyncio.run(
+        evaluation.evaluate(BatchEvalModel(), batch_size=8, batch_max_wait=10)
+    )
+    assert result["score"] == {"true_count": 4, "true_fraction": 0.5}
+    assert result["model_output"] == {"mean": 9.5}
+    assert batch_sizes == [8]
+
+    calls = list(client.calls())
+    batch_call = next(c for c in calls if "BatchEvalModel.predict_batch:" in c.op_name)
+    example_calls = [
+        c for c in calls if "BatchEvalModel.predict_batch.example:" in c.op_name
+    ]
+    assert len(example_calls) == 8
+    assert sorted(batch_call.attributes["example_call_ids"]) == sorted(
+        c.id for c in example_calls
+    )
+    predict_and_score_ids = {
+        c.id for c in calls if "Evaluation.predict_and_score" in c.op_name
+    }
+    for example_call in example_calls:
+        assert example_call.parent_id in predict_and_score_ids
+        assert example_call.output == eval(example_call.inputs["input"])
+
+
+def test_evaluate_cache_results(client):
+    n_predictions = []
+
+    class CountingModel(Model):
+        @weave.op()
+        def predict(self, input):
+            n_predictions.append(input)
+            return eval(input)
+
+    model = CountingModel()
+    evaluation = Evaluation(dataset=dataset_rows, scorers=[score], trials=2)
+    result = asyncio.run(evaluation.evaluate(model, cache_results=True))
+    assert len(n_predictions) == 4
+
+    rerun_result = asyncio.run(evaluation.evaluate(model, cache_results=True))
+    assert len(n_predictions) == 4
+    assert rerun_result["score"] == result["score"]
+    assert rerun_result["model_output"] == result["model_output"]
+
+    # Changing the scorers changes the key, so nothing is reused
+    @weave.op()
+    def is_large(model_output):
+        return model_output > 5
+
+    evaluation = Evaluation(dataset=dataset_rows, scorers=[score, is_large])
+    asyncio.run(evaluation.evaluate(model, cache_results=True))
+    assert len(n_predictions) == 6
+
+
+def test_auto_summarize_arrays():
+    assert auto_summarize(np.array([True, False, True])) == {
+        "true_count": 2,
+        "true_fraction": 2 / 3,
+    }
+    assert auto_summarize(np.array([1, 2, 6])) == {"mean": 3.0}
+    assert auto_summarize(np.array([])) == {}
+    summarizer = AutoSummarizer()
+    summarizer.add_batch(np.array([1.0, 2.0]))
+    summarizer.add_batch([4, None])
+    assert summarizer.summary() == auto_summarize([1.0, 2.0, 4, None])
+    assert summarizer.stderr == pytest.approx(stderr([1, 2, 4]))
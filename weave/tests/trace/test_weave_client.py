@@ -1,9 +1,13 @@
 import asyncio
 import dataclasses
+import gc
+import hashlib
 import json
 import platform
 import re
 import sys
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 
 import pydantic
 import pytest
@@ -11,6 +15,7 @@ import requests
 
 import weave
 import weave.trace_server.trace_server_interface as tsi
+import weave.trace_server.trace_server_interface_util as tsiu
 from weave import Evaluation, weave_client
 from weave.legacy import op_def
 from weave.trace import refs
@@ -22,12 +27,15 @@ from weave.trace.refs import (
     OBJECT_ATTR_EDGE_NAME,
     TABLE_ROW_ID_EDGE_NAME,
 )
+from weave.trace.serialize import prefetch_files
 from weave.trace.serializer import get_serializer_for_obj, register_serializer
 from weave.trace.tests.testutil import ObjectRefStrMatcher
 from weave.trace_server.sqlite_trace_server import SqliteTraceServer
 from weave.trace_server.trace_server_interface import (
     FileContentReadReq,
     FileCreateReq,
+    FilesCreateItem,
+    FilesCreateReq,
     RefsReadBatchReq,
     TableCreateReq,
     TableQueryReq,
@@ -127,6 +135,112 @@ def test_table_update(client):
     assert check_res.digest == table_create_res.digest
 
 
+def test_table_update_chunked(client, monkeypatch):
+    monkeypatch.setattr(tsiu, "TABLE_CHUNK_TARGET_SIZE", 8)
+    monkeypatch.setattr(tsiu, "TABLE_CHUNK_MAX_SIZE", 32)
+    data = [{"val": i % 150} for i in range(300)]
+    row_digests = [tsiu.str_digest(json.dumps(row)) for row in data]
+    assert len(tsiu.chunk_table_row_digests(row_digests)) > 1
+
+    digest = client.server.table_create(
+        TableCreateReq(
+            table=TableSchemaForInsert(project_id=client._project_id(), rows=[])
+        )
+    ).digest
+    for i in range(0, len(data), 7):
+        digest = client.server.table_update(
+            tsi.TableUpdateReq(
+                project_id=client._project_id(),
+                base_digest=digest,
+                updates=[
+                    tsi.TableAppendSpec(append=tsi.TableAppendSpecPayload(row=row))
+                    for row in data[i : i + 7]
+                ],
+            )
+        ).digest
+
+    # Appending in small batches gives the same table as creating it at once
+    check_res = client.server.table_create(
+        TableCreateReq(
+            table=TableSchemaForInsert(project_id=client._project_id(), rows=data)
+        )
+    )
+    assert check_res.digest == digest == tsiu.table_digest(row_digests)
+    # Chunking does not change the digest, which is that of the flat rows
+    assert digest == hashlib.sha256("".join(row_digests).encode()).hexdigest()
+    table_query_res = client.server.table_query(
+        TableQueryReq(project_id=client._project_id(), digest=digest)
+    )
+    assert [row.val for row in table_query_res.rows] == data
+
+    # Inserting then popping a row in the middle restores the table
+    inserted_digest = client.server.table_update(
+        tsi.TableUpdateReq.model_validate(
+            dict(
+                project_id=client._project_id(),
+                base_digest=digest,
+                updates=[{"insert": {"index": 100, "row": {"val": -1}}}],
+            )
+        )
+    ).digest
+    assert inserted_digest != digest
+    popped_digest = client.server.table_update(
+        tsi.TableUpdateReq.model_validate(
+            dict(
+                project_id=client._project_id(),
+                base_digest=inserted_digest,
+                updates=[{"pop": {"index": 100}}],
+            )
+        )
+    ).digest
+    assert popped_digest == digest
+
+
+def test_table_append_reads_only_last_chunk(client, monkeypatch):
+    server = client.server._internal_trace_server
+    if isinstance(server, SqliteTraceServer):
+        pytest.skip("The sqlite server does not store tables in chunks")
+    monkeypatch.setattr(tsiu, "TABLE_CHUNK_TARGET_SIZE", 8)
+    monkeypatch.setattr(tsiu, "TABLE_CHUNK_MAX_SIZE", 32)
+    data = [{"val": i} for i in range(300)]
+    digest = client.server.table_create(
+        TableCreateReq(
+            table=TableSchemaForInsert(project_id=client._project_id(), rows=data)
+        )
+    ).digest
+    _, chunk_digests = server._read_table(client._project_id(), digest)
+    assert len(chunk_digests) > 1
+
+    read_chunk_digests = []
+    table_chunks = server._table_chunks
+
+    def recording_table_chunks(project_id, chunk_digests):
+        chunk_digests = list(chunk_digests)
+        read_chunk_digests.extend(chunk_digests)
+        return table_chunks(project_id, chunk_digests)
+
+    def failing_table_row_digests(project_id, digest):
+        raise AssertionError("the base table's rows should not be read")
+
+    monkeypatch.setattr(server, "_table_chunks", recording_table_chunks)
+    monkeypatch.setattr(server, "_table_row_digests", failing_table_row_digests)
+    appended = [{"val": -1}, {"val": -2}]
+    digest = client.server.table_update(
+        tsi.TableUpdateReq(
+            project_id=client._project_id(),
+            base_digest=digest,
+            updates=[
+                tsi.TableAppendSpec(append=tsi.TableAppendSpecPayload(row=row))
+                for row in appended
+            ],
+        )
+    ).digest
+    assert read_chunk_digests == [chunk_digests[-1]]
+    assert digest == tsiu.table_digest(
+        tsiu.str_digest(json.dumps(row)) for row in data + appended
+    )
+
+
 @pytest.mark.skip()
 def test_table_append(server):
     table_ref = server.new_table([1, 2, 3])
@@ -270,7 +384,6 @@ def test_call_create(client):
         output="hello",
         exception=None,
         summary={},
-        _children=[],
         attributes={
             "weave": {
                 "client_version": weave.version.VERSION,
@@ -917,6 +1030,42 @@ def test_refs_read_batch_dataset_rows(client):
     assert res.vals[1] == 6
 
 
+def test_refs_read_batch_dataset_rows_grouped_by_table(client):
+    saved1 = client.save(weave.Dataset(rows=[{"a": 1}, {"a": 2}]), "dataset-1")
+    saved2 = client.save(weave.Dataset(rows=[{"a": 2}, {"a": 3}]), "dataset-2")
+    refs = [
+        saved1.rows[0]["a"].ref,
+        saved2.rows[1]["a"].ref,
+        saved1.rows[1]["a"].ref,
+        saved2.rows[0]["a"].ref,
+    ]
+    res = client.server.refs_read_batch(RefsReadBatchReq(refs=[r.uri() for r in refs]))
+    assert res.vals == [1, 3, 2, 2]
+
+
+def test_refs_read_batch_more_than_1000_refs(client):
+    if isinstance(client.server._internal_trace_server, SqliteTraceServer):
+        pytest.skip("The sqlite server reads at most 1000 refs per batch")
+    refs = [client._save_object({"i": i}, f"obj-{i}") for i in range(1200)]
+    res = client.server.refs_read_batch(RefsReadBatchReq(refs=[r.uri() for r in refs]))
+    assert res.vals == [{"i": i} for i in range(1200)]
+
+
+def test_refs_read_batch_checks_object_id(client):
+    ref = client._save_object({"a": 1}, "obj-a")
+    # Read it once so that its value is cached.
+    client.server.refs_read_batch(RefsReadBatchReq(refs=[ref.uri()]))
+
+    # Same digest, but no version of obj-b has it.
+    uri = ref.uri().replace("/object/obj-a:", "/object/obj-b:")
+    if isinstance(client.server._internal_trace_server, SqliteTraceServer):
+        with pytest.raises(Exception):
+            client.server.refs_read_batch(RefsReadBatchReq(refs=[uri]))
+    else:
+        res = client.server.refs_read_batch(RefsReadBatchReq(refs=[uri]))
+        assert res.vals == [None]
+
+
 def test_refs_read_batch_multi_project(client):
     client.project = "test111"
     ref = client._save_object([1, 2, 3], "my-list")
@@ -969,6 +1118,209 @@ def test_server_file(client):
     assert f_bytes == read_res.content
 
 
+def test_server_files_create(client):
+    res = client.server.files_create(
+        FilesCreateReq(
+            project_id="shawn/test-project",
+            files=[
+                FilesCreateItem(name="a", content=b"a" * 10),
+                FilesCreateItem(name="b", content=b"b" * 300005),
+            ],
+        )
+    )
+    assert len(res.digests) == 2
+    for digest, content in zip(res.digests, [b"a" * 10, b"b" * 300005]):
+        read_res = client.server.file_content_read(
+            FileContentReadReq(project_id="shawn/test-project", digest=digest)
+        )
+        assert read_res.content == content
+
+
+def test_custom_obj_files_are_uploaded_once(client, monkeypatch):
+    class Blob:
+        def __init__(self, a):
+            self.a = a
+
+    def save_instance(obj, artifact, name):
+        with artifact.new_file(name) as f:
+            f.write(obj.a)
+
+    def load_instance(artifact, name, extra=None):
+        with artifact.open(name) as f:
+            return Blob(f.read())
+
+    register_serializer(Blob, save_instance, load_instance)
+
+    uploads = []
+    files_create = client.server.files_create
+
+    def counting_files_create(req):
+        uploads.extend(f.content for f in req.files)
+        return files_create(req)
+
+    monkeypatch.setattr(client.server, "files_create", counting_files_create)
+
+    @weave.op()
+    def score(blob: Blob, i: int) -> int:
+        return i
+
+    for i in range(3):
+        score(Blob("same"), i)
+    score(Blob("different"), 3)
+
+    # Op code is uploaded as files too, so only count the blob contents
+    assert uploads.count(b"same") == 1
+    assert uploads.count(b"different") == 1
+    calls = list(client.calls())
+    assert [c.inputs["blob"].a for c in calls] == ["same"] * 3 + ["different"]
+
+
+def test_calls_iter_batches_ref_reads(client, monkeypatch):
+    refs = [weave.publish({"i": i}, name=f"obj{i}") for i in range(5)]
+
+    @weave.op()
+    def read(obj):
+        return obj["i"]
+
+    for ref in refs:
+        read(ref.get())
+
+    obj_reads = []
+    refs_read_batches = []
+    obj_read = client.server.obj_read
+    refs_read_batch = client.server.refs_read_batch
+
+    def counting_obj_read(req):
+        obj_reads.append(req)
+        return obj_read(req)
+
+    def counting_refs_read_batch(req):
+        refs_read_batches.append(req)
+        return refs_read_batch(req)
+
+    monkeypatch.setattr(client.server, "obj_read", counting_obj_read)
+    monkeypatch.setattr(client.server, "refs_read_batch", counting_refs_read_batch)
+
+    calls = list(client.calls())
+    assert [c.inputs["obj"]["i"] for c in calls] == list(range(5))
+    assert len(refs_read_batches) == 1
+    assert len(refs_read_batches[0].refs) == 5
+    assert obj_reads == []
+
+
+def test_calls_iter_prefetch_is_lazy_and_best_effort(client, monkeypatch):
+    ref = weave.publish({"i": 1}, name="obj")
+
+    @weave.op()
+    def read(obj):
+        return obj["i"]
+
+    read(ref.get())
+
+    refs_read_batches = []
+    refs_read_batch = client.server.refs_read_batch
+
+    def counting_refs_read_batch(req):
+        refs_read_batches.append(req)
+        return refs_read_batch(req)
+
+    def failing_file_content_read(req):
+        raise ValueError("missing file")
+
+    monkeypatch.setattr(client.server, "refs_read_batch", counting_refs_read_batch)
+    calls = client.calls()
+    assert calls[0].inputs["obj"]["i"] == 1
+    assert refs_read_batches == []
+
+    monkeypatch.setattr(client.server, "file_content_read", failing_file_content_read)
+    prefetch_files(
+        client._project_id(),
+        client.server,
+        {"_type": "CustomWeaveType", "files": {"obj.py": "digest"}},
+    )
+
+
+def test_calls_iter_pages(client, monkeypatch):
+    @weave.op()
+    def ident(x):
+        return x
+
+    for i in range(10):
+        ident(i)
+
+    reqs = []
+    calls_query_stream = client.server.calls_query_stream
+
+    def recording_calls_query_stream(req):
+        reqs.append(req)
+        return calls_query_stream(req)
+
+    monkeypatch.setattr(
+        client.server, "calls_query_stream", recording_calls_query_stream
+    )
+    calls = weave_client.CallsIter(
+        client.server,
+        client._project_id(),
+        weave_client.CallsFilter(),
+        page_size=3,
+        max_cached_pages=2,
+    )
+    assert len(calls) == 10
+    assert [c.inputs["x"] for c in calls] == list(range(10))
+    assert len(calls._pages) <= 2
+    assert calls._executor is None
+    # Pages after the first are read from a cursor. The offset is sent too,
+    # for servers that don't support cursors.
+    assert [(r.offset, r.cursor is not None) for r in reqs] == [
+        (0, False),
+        (3, True),
+        (6, True),
+        (9, True),
+    ]
+    assert calls[7].inputs["x"] == 7
+    assert [c.inputs["x"] for c in calls[2:8:2]] == [2, 4, 6]
+    with pytest.raises(IndexError):
+        calls[10]
+
+
+def test_calls_iter_pages_server_without_cursors(client, monkeypatch):
+    @weave.op()
+    def ident(x):
+        return x
+
+    for i in range(10):
+        ident(i)
+
+    calls_query_stream = client.server.calls_query_stream
+
+    def cursorless_calls_query_stream(req):
+        # Like a server that predates cursors, which drops the unknown field
+        return calls_query_stream(req.model_copy(update={"cursor": None}))
+
+    monkeypatch.setattr(
+        client.server, "calls_query_stream", cursorless_calls_query_stream
+    )
+    calls = weave_client.CallsIter(
+        client.server, client._project_id(), weave_client.CallsFilter(), page_size=3
+    )
+    assert [c.inputs["x"] for c in calls] == list(range(10))
+
+
+def test_calls_iter_len_of_small_result_skips_stats(client, monkeypatch):
+    @weave.op()
+    def ident(x):
+        return x
+
+    for i in range(3):
+        ident(i)
+
+    def failing_calls_query_stats(req):
+        raise AssertionError("calls_query_stats should not be called")
+
+    monkeypatch.setattr(client.server, "calls_query_stats", failing_calls_query_stats)
+    assert [c.inputs["x"] for c in list(client.calls())] == [0, 1, 2]
+
+
 def test_isinstance_checks(client):
     class PydanticObjA(weave.Object):
         x: dict
@@ -1056,6 +1408,37 @@ def test_summary_tokens(client):
     }
 
 
+def test_summary_children_are_released(client):
+    parent = client.create_call("parent", {})
+    child_refs = []
+    for i in range(3):
+        child = client.create_call("child", {"i": i}, parent)
+        client.finish_call(child, {"model": "model_a", "usage": {"prompt_tokens": i}})
+        child_refs.append(weakref.ref(child))
+        del child
+    gc.collect()
+    assert all(child_ref() is None for child_ref in child_refs)
+
+    client.finish_call(parent, {"model": "model_b", "usage": {"prompt_tokens": 1}})
+    assert parent.summary == {"usage": {"model_a": {"requests": 3, "prompt_tokens": 3}}}
+
+
+def test_summary_children_finish_on_threads(client):
+    parent = client.create_call("parent", {})
+
+    def run_child(i):
+        child = client.create_call("child", {"i": i}, parent, use_stack=False)
+        client.finish_call(child, {"model": "model_a", "usage": {"prompt_tokens": 1}})
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(run_child, range(200)))
+
+    client.finish_call(parent)
+    assert parent.summary == {
+        "usage": {"model_a": {"requests": 200, "prompt_tokens": 200}}
+    }
+
+
 @pytest.mark.skip("descendent error tracking disabled until we fix UI")
 def test_summary_descendents(client):
     @weave.op()
@@ -1334,3 +1717,44 @@ def test_ref_in_dict(client):
 
     obj = weave.ref(ref2.uri()).get()
     assert obj["b"] == {"a": 5}
+
+
+def test_background_logging(client, monkeypatch):
+    monkeypatch.setenv("WEAVE_BACKGROUND_LOGGING", "true")
+    bg_client = weave_client.WeaveClient(
+        client.entity, client.project, client.server, ensure_project_exists=False
+    )
+    assert bg_client._send_pipeline is not None
+
+    parent = bg_client.create_call("x", {"a": 5}, use_stack=False)
+    child = bg_client.create_call("y", {"b": 6}, parent, use_stack=False)
+    bg_client.finish_call(child, {"usage": {"tokens": 1}, "model": "m"})
+    bg_client.finish_call(parent, 7)
+    assert bg_client.flush(timeout=10)
+
+    calls = list(client.calls())
+    assert len(calls) == 2
+    assert calls[0].id == parent.id
+    assert calls[0].output == 7
+    assert calls[0].summary["usage"] == {"m": {"requests": 1, "tokens": 1}}
+    assert calls[1].parent_id == parent.id
+    assert calls[1].inputs == {"b": 6}
+
+
+def test_background_logging_encodes_on_caller_thread(client, monkeypatch):
+    monkeypatch.setenv("WEAVE_BACKGROUND_LOGGING", "true")
+    bg_client = weave_client.WeaveClient(
+        client.entity, client.project, client.server, ensure_project_exists=False
+    )
+
+    messages = [{"role": "user", "content": "hi"}]
+    output = {"messages": messages}
+    call = bg_client.create_call("x", {"messages": messages}, use_stack=False)
+    bg_client.finish_call(call, output)
+    # Changes made after the call returns are not logged
+    messages.append({"role": "assistant", "content": "hello"})
+    assert bg_client.flush(timeout=10)
+
+    logged = list(client.calls())[0]
+    assert logged.inputs["messages"] == [{"role": "user", "content": "hi"}]
+    assert logged.output["messages"] == [{"role": "user", "content": "hi"}]
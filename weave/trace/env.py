@@ -1,7 +1,42 @@
 import os
+from typing import Optional
 
 WEAVE_PARALLELISM = "WEAVE_PARALLELISM"
 
 
 def get_weave_parallelism() -> int:
     return int(os.getenv(WEAVE_PARALLELISM, "20"))
+
+
+WEAVE_SCORER_PROCESSES = "WEAVE_SCORER_PROCESSES"
+
+
+def get_weave_scorer_processes() -> int:
+    return int(os.getenv(WEAVE_SCORER_PROCESSES, str(os.cpu_count() or 1)))
+
+
+WEAVE_SEND_WORKERS = "WEAVE_SEND_WORKERS"
+WEAVE_SEND_QUEUE_SIZE = "WEAVE_SEND_QUEUE_SIZE"
+WEAVE_SEND_BACKPRESSURE = "WEAVE_SEND_BACKPRESSURE"
+WEAVE_SEND_SPILL_DIR = "WEAVE_SEND_SPILL_DIR"
+WEAVE_SEND_EXIT_TIMEOUT = "WEAVE_SEND_EXIT_TIMEOUT"
+
+
+def get_weave_send_workers() -> int:
+    return int(os.getenv(WEAVE_SEND_WORKERS, "4"))
+
+
+def get_weave_send_queue_size() -> int:
+    return int(os.getenv(WEAVE_SEND_QUEUE_SIZE, "10000"))
+
+
+def get_weave_send_backpressure() -> str:
+    return os.getenv(WEAVE_SEND_BACKPRESSURE, "block")
+
+
+def get_weave_send_spill_dir() -> Optional[str]:
+    return os.getenv(WEAVE_SEND_SPILL_DIR)
+
+
+def get_weave_send_exit_timeout() -> float:
+    return float(os.getenv(WEAVE_SEND_EXIT_TIMEOUT, "30"))
@@ -0,0 +1,309 @@
+"""Background pipeline for sending trace data to the server.
+
+`WeaveClient` can hand encoding and sending of requests (eg. `call_start` and
+`call_end`) to a `SendPipeline` so that traced code does not wait on the
+network. Jobs are sharded across a fixed set of worker threads by a key
+(the trace id for calls). Each shard is a bounded FIFO queue drained by a
+single worker, so jobs sharing a key are always sent in submission order:
+a call's start is sent before its end, and a parent's start before its
+children's.
+
+When a shard's queue is full, the backpressure policy decides what happens:
+
+* "block": the caller waits for room in the queue.
+* "drop_newest": the job is discarded and counted in `dropped`.
+* "spill": the job is encoded on the caller's thread and appended to a
+  per-shard spill file on disk, which the worker replays (in order) once it
+  has drained its in-memory queue.
+"""
+
+import atexit
+import contextvars
+import dataclasses
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+import weakref
+from typing import Callable, Literal, Optional, Union
+
+from pydantic import BaseModel
+
+from weave.trace.env import get_weave_send_exit_timeout
+
+logger = logging.getLogger(__name__)
+
+BackpressurePolicy = Literal["block", "drop_newest", "spill"]
+BACKPRESSURE_POLICIES = ("block", "drop_newest", "spill")
+
+# A handler is the request model type (used to decode spilled requests) and
+# the function that sends the request.
+Handler = tuple[type[BaseModel], Callable[[BaseModel], object]]
+
+
+@dataclasses.dataclass
+class _Job:
+    kind: str
+    make_req: Callable[[], BaseModel]
+    context: contextvars.Context
+
+
+# Put on a shard's queue to wake its worker, eg. after a job was spilled to
+# disk or the pipeline was closed.
+_WAKE = object()
+
+
+class _Shard:
+    # Shards don't refer back to their pipeline, so that a pipeline no longer
+    # in use can be collected, which stops its workers.
+
+    def __init__(
+        self,
+        handlers: dict[str, Handler],
+        backpressure: BackpressurePolicy,
+        spill_dir: Optional[str],
+        index: int,
+        maxsize: int,
+    ) -> None:
+        self.handlers = handlers
+        self.backpressure = backpressure
+        self.spill_dir = spill_dir
+        self.index = index
+        self.queue: queue.Queue[Union[_Job, object]] = queue.Queue(maxsize)
+        self.cond = threading.Condition()
+        self.submitted = 0
+        self.completed = 0
+        self.errors = 0
+        self.spilled = 0
+        self.spill_path: Optional[str] = None
+        self.spill_count = 0
+        # Jobs being encoded to be spilled, outside of the lock.
+        self.spilling = 0
+        self.closed = False
+        self.thread = threading.Thread(
+            target=self._run, name=f"WeaveSendPipeline-{index}", daemon=True
+        )
+        self.thread.start()
+
+    def submit(self, job: _Job) -> bool:
+        policy = self.backpressure
+        with self.cond:
+            spill = policy == "spill" and (
+                self.spill_count > 0 or self.spilling > 0 or self.queue.full()
+            )
+            if spill:
+                # Once anything is spilled, later jobs must be spilled too so
+                # they are not sent ahead of the spilled ones.
+                self.spilling += 1
+            elif policy != "block":
+                try:
+                    self.queue.put_nowait(job)
+                except queue.Full:
+                    return False
+            self.submitted += 1
+        if spill:
+            self._spill(job)
+        elif policy == "block":
+            # Block outside of the lock so the worker can make progress.
+            self.queue.put(job)
+        return True
+
+    def wait(self, target: int, timeout: Optional[float]) -> bool:
+        with self.cond:
+            return self.cond.wait_for(lambda: self.completed >= target, timeout)
+
+    def close(self) -> None:
+        with self.cond:
+            self.closed = True
+        try:
+            self.queue.put_nowait(_WAKE)
+        except queue.Full:
+            # The worker checks `closed` once it has drained the queue.
+            pass
+
+    def _spill(self, job: _Job) -> None:
+        # Building the request may upload files, so it is done without
+        # holding the lock.
+        req_json = None
+        try:
+            req_json = job.context.run(job.make_req).model_dump_json()
+        except Exception:
+            logger.exception(f"Weave failed to encode {job.kind} to spill to disk")
+        with self.cond:
+            self.spilling -= 1
+            if req_json is None:
+                self.errors += 1
+                self.completed += 1
+                self.cond.notify_all()
+                return
+            if self.spill_path is None:
+                fd, self.spill_path = tempfile.mkstemp(
+                    prefix=f"weave-send-{self.index}-",
+                    suffix=".jsonl",
+                    dir=self.spill_dir,
+                )
+                os.close(fd)
+            with open(self.spill_path, "a") as f:
+                f.write(json.dumps({"kind": job.kind, "req": req_json}))
+                f.write("\n")
+            self.spill_count += 1
+            self.spilled += 1
+        try:
+            self.queue.put_nowait(_WAKE)
+        except queue.Full:
+            pass
+
+    def _take_spilled(self) -> list[tuple[str, str]]:
+        with self.cond:
+            if self.spill_count == 0 or self.spill_path is None:
+                return []
+            with open(self.spill_path) as f:
+                lines = f.readlines()
+            os.remove(self.spill_path)
+            self.spill_path = None
+            self.spill_count = 0
+        spilled = []
+        for line in lines:
+            record = json.loads(line)
+            spilled.append((record["kind"], record["req"]))
+        return spilled
+
+    def _run(self) -> None:
+        while True:
+            if self.queue.empty():
+                for kind, req_json in self._take_spilled():
+                    req_cls, _ = self.handlers[kind]
+                    self._send(kind, lambda: req_cls.model_validate_json(req_json))
+                with self.cond:
+                    if self.closed and self.spilling == 0 and self.queue.empty():
+                        return
+            item = self.queue.get()
+            if isinstance(item, _Job):
+                self._send(item.kind, lambda: item.context.run(item.make_req))
+
+    def _send(self, kind: str, make_req: Callable[[], BaseModel]) -> None:
+        errored = False
+        try:
+            _, send = self.handlers[kind]
+            send(make_req())
+        except Exception:
+            errored = True
+            logger.exception(f"Weave failed to send {kind} in the background")
+        finally:
+            with self.cond:
+                self.errors += errored
+                self.completed += 1
+                self.cond.notify_all()
+
+
+def _close_shards(shards: list[_Shard]) -> None:
+    for shard in shards:
+        shard.close()
+
+
+class SendPipeline:
+    """Sends requests to the server from a pool of background workers.
+
+    Pipelines still in use are flushed when the interpreter exits, for at
+    most `WEAVE_SEND_EXIT_TIMEOUT` seconds in total.
+
+    Args:
+        handlers: Maps a job kind to its request type and send function.
+        num_workers: Number of worker threads (and shards).
+        max_queue_size: Total number of jobs that may be queued in memory.
+        backpressure: What to do when a shard's queue is full, one of
+            "block", "drop_newest" or "spill".
+        spill_dir: Directory for spill files. Defaults to the system temp dir.
+    """
+
+    def __init__(
+        self,
+        handlers: dict[str, Handler],
+        num_workers: int = 4,
+        max_queue_size: int = 10000,
+        backpressure: BackpressurePolicy = "block",
+        spill_dir: Optional[str] = None,
+    ) -> None:
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(
+                f"Invalid backpressure policy: {backpressure}, expected one of {BACKPRESSURE_POLICIES}"
+            )
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1")
+        self.handlers = handlers
+        self.backpressure = backpressure
+        self.spill_dir = spill_dir
+        self.dropped = 0
+        shard_size = max(1, -(-max_queue_size // num_workers))
+        self._shards = [
+            _Shard(handlers, backpressure, spill_dir, i, shard_size)
+            for i in range(num_workers)
+        ]
+        # Workers finish what is queued and exit once the pipeline is gone.
+        weakref.finalize(self, _close_shards, self._shards)
+        _live_pipelines.add(self)
+
+    @property
+    def spilled(self) -> int:
+        return sum(shard.spilled for shard in self._shards)
+
+    @property
+    def errors(self) -> int:
+        return sum(shard.errors for shard in self._shards)
+
+    def submit(self, kind: str, key: str, make_req: Callable[[], BaseModel]) -> bool:
+        """Queue a request to be built by `make_req` and sent in the background.
+
+        Requests submitted with the same `key` are sent in submission order.
+        `make_req` runs on a worker thread in a copy of the caller's context.
+
+        Returns:
+            False if the request was dropped due to backpressure, else True.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"No handler registered for {kind}")
+        job = _Job(kind, make_req, contextvars.copy_context())
+        shard = self._shards[hash(key) % len(self._shards)]
+        if shard.submit(job):
+            return True
+        self.dropped += 1
+        if self.dropped == 1:
+            logger.warning(
+                "Weave send queue is full, dropping trace data. Increase the queue size or use a different backpressure policy."
+            )
+        return False
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything submitted before this call has been sent.
+
+        Returns:
+            False if `timeout` (in seconds) elapsed first, else True.
+        """
+        targets = []
+        for shard in self._shards:
+            with shard.cond:
+                targets.append(shard.submitted)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for shard, target in zip(self._shards, targets):
+            remaining = None
+            if deadline is not None:
+                remaining = max(0.0, deadline - time.monotonic())
+            if not shard.wait(target, remaining):
+                return False
+        return True
+
+
+# Held weakly, so that exiting doesn't keep pipelines (and their clients) alive.
+_live_pipelines: "weakref.WeakSet[SendPipeline]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    deadline = time.monotonic() + get_weave_send_exit_timeout()
+    for pipeline in list(_live_pipelines):
+        if not pipeline.flush(max(0.0, deadline - time.monotonic())):
+            logger.warning("Timed out sending trace data to Weave at exit")
+            return
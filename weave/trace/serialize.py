@@ -1,17 +1,194 @@
+import dataclasses
+import logging
+import threading
 import typing
-from typing import Any
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Iterable, Optional, TypeVar
 
 from weave.trace import custom_objs
 from weave.trace.object_record import ObjectRecord
 from weave.trace.refs import ObjectRef, TableRef, parse_uri
+from weave.trace.util import ContextAwareThreadPoolExecutor
 from weave.trace_server.trace_server_interface import (
     FileContentReadReq,
-    FileCreateReq,
+    FilesCreateItem,
+    FilesCreateReq,
     TraceServerInterface,
 )
+from weave.trace_server.trace_server_interface_util import bytes_digest
+
+logger = logging.getLogger(__name__)
+
+# Number of uploaded files whose digests are remembered per server.
+FILE_DIGEST_CACHE_SIZE = 10000
+# Total size of downloaded file contents kept per server.
+FILE_CONTENT_CACHE_BYTES = 64 * 1024 * 1024
+# Number of object values, by ref, kept per server.
+REF_VAL_CACHE_SIZE = 10000
+# Maximum number of concurrent file_content_read requests.
+FILE_READ_CONCURRENCY = 8
+# Total size of file contents a single prefetch_files call reads.
+PREFETCH_FILES_MAX_BYTES = FILE_CONTENT_CACHE_BYTES // 4
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """Thread-safe LRU map bounded by entry count and, optionally, by the
+    total size of its values as measured by `size_fn`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_size: Optional[int] = None,
+        size_fn: Optional[Callable[[V], int]] = None,
+    ) -> None:
+        if max_size is not None and size_fn is None:
+            raise ValueError("size_fn is required when max_size is set")
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.size_fn = size_fn
+        self._vals: OrderedDict[K, V] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._vals)
+
+    def get(self, key: K) -> Optional[V]:
+        with self._lock:
+            val = self._vals.get(key)
+            if val is not None:
+                self._vals.move_to_end(key)
+            return val
+
+    def put(self, key: K, val: V) -> None:
+        size = self.size_fn(val) if self.size_fn else 0
+        if self.max_size is not None and size > self.max_size:
+            return
+        with self._lock:
+            if (old := self._vals.pop(key, None)) is not None and self.size_fn:
+                self._size -= self.size_fn(old)
+            self._vals[key] = val
+            self._size += size
+            while len(self._vals) > self.max_entries or (
+                self.max_size is not None and self._size > self.max_size
+            ):
+                _, evicted = self._vals.popitem(last=False)
+                if self.size_fn:
+                    self._size -= self.size_fn(evicted)
+
+
+@dataclasses.dataclass
+class ServerCaches:
+    """Client-side caches of immutable server data.
+
+    Attributes:
+        file_digests: Maps (project_id, content hash) to the digest the server
+            returned when that content was uploaded. Files are
+            content-addressed, so content we have already uploaded never needs
+            to be uploaded again.
+        file_contents: Maps (project_id, file digest) to the file's content.
+        ref_vals: Maps the uri of an object ref with a concrete digest (not an
+            alias like "latest") to the object's JSON value.
+    """
+
+    file_digests: LRUCache[tuple[str, str], str] = dataclasses.field(
+        default_factory=lambda: LRUCache(FILE_DIGEST_CACHE_SIZE)
+    )
+    file_contents: LRUCache[tuple[str, str], bytes] = dataclasses.field(
+        default_factory=lambda: LRUCache(
+            FILE_DIGEST_CACHE_SIZE, FILE_CONTENT_CACHE_BYTES, len
+        )
+    )
+    ref_vals: LRUCache[str, Any] = dataclasses.field(
+        default_factory=lambda: LRUCache(REF_VAL_CACHE_SIZE)
+    )
+
+
+# Keyed by server so that a cache never claims content exists on a server
+# (eg. a fresh local database) it was never uploaded to.
+_server_caches: "weakref.WeakKeyDictionary[TraceServerInterface, ServerCaches]" = (
+    weakref.WeakKeyDictionary()
+)
+_server_caches_lock = threading.Lock()
+
+
+def get_server_caches(server: TraceServerInterface) -> ServerCaches:
+    with _server_caches_lock:
+        caches = _server_caches.get(server)
+        if caches is None:
+            caches = _server_caches[server] = ServerCaches()
+        return caches
+
+
+def _upload_files(
+    project_id: str, server: TraceServerInterface, files: dict[str, bytes]
+) -> dict[str, str]:
+    """Uploads the files not already known to the server in one request and
+    returns the digest of every file, by name.
+    """
+    cache = get_server_caches(server).file_digests
+    file_digests: dict[str, Optional[str]] = {}
+    to_upload: list[tuple[str, bytes, tuple[str, str]]] = []
+    for name, val in files.items():
+        key = (project_id, bytes_digest(val))
+        file_digests[name] = cache.get(key)
+        if file_digests[name] is None:
+            to_upload.append((name, val, key))
+
+    if to_upload:
+        res = server.files_create(
+            FilesCreateReq(
+                project_id=project_id,
+                files=[
+                    FilesCreateItem(name=name, content=val)
+                    for name, val, _ in to_upload
+                ],
+            )
+        )
+        for (name, _, key), digest in zip(to_upload, res.digests):
+            cache.put(key, digest)
+            file_digests[name] = digest
+
+    return typing.cast(dict[str, str], file_digests)
 
 
 def to_json(obj: Any, project_id: str, server: TraceServerInterface) -> Any:
+    return _to_json(obj, lambda files: _upload_files(project_id, server, files))
+
+
+def to_json_deferred_upload(
+    obj: Any, project_id: str, server: TraceServerInterface
+) -> Callable[[], Any]:
+    """Encodes `obj` now, and returns a function that uploads the files of
+    its custom objects and returns the JSON value.
+
+    The JSON value doesn't share anything mutable with `obj`, so `obj` may
+    change before the function is called.
+    """
+    uploads: list[tuple[dict[str, str], dict[str, bytes]]] = []
+
+    def defer_upload(files: dict[str, bytes]) -> dict[str, str]:
+        file_digests: dict[str, str] = {}
+        uploads.append((file_digests, files))
+        return file_digests
+
+    json_val = _to_json(obj, defer_upload)
+
+    def upload() -> Any:
+        for file_digests, files in uploads:
+            file_digests.update(_upload_files(project_id, server, files))
+        uploads.clear()
+        return json_val
+
+    return upload
+
+
+def _to_json(obj: Any, upload_files: Callable[[dict[str, bytes]], Any]) -> Any:
     if isinstance(obj, TableRef):
         return obj.uri()
     elif isinstance(obj, ObjectRef):
@@ -19,14 +196,14 @@ def to_json(obj: Any, project_id: str, server: TraceServerInterface) -> Any:
     elif isinstance(obj, ObjectRecord):
         res = {"_type": obj._class_name}
         for k, v in obj.__dict__.items():
-            res[k] = to_json(v, project_id, server)
+            res[k] = _to_json(v, upload_files)
         return res
     elif isinstance_namedtuple(obj):
-        return {k: to_json(v, project_id, server) for k, v in obj._asdict().items()}
+        return {k: _to_json(v, upload_files) for k, v in obj._asdict().items()}
     elif isinstance(obj, (list, tuple)):
-        return [to_json(v, project_id, server) for v in obj]
+        return [_to_json(v, upload_files) for v in obj]
     elif isinstance(obj, dict):
-        return {k: to_json(v, project_id, server) for k, v in obj.items()}
+        return {k: _to_json(v, upload_files) for k, v in obj.items()}
 
     if isinstance(obj, (int, float, str, bool)) or obj is None:
         return obj
@@ -34,12 +211,7 @@ def to_json(obj: Any, project_id: str, server: TraceServerInterface) -> Any:
     encoded = custom_objs.encode_custom_obj(obj)
     if encoded is None:
         return fallback_encode(obj)
-    file_digests = {}
-    for name, val in encoded["files"].items():
-        file_response = server.file_create(
-            FileCreateReq(project_id=project_id, name=name, content=val)
-        )
-        file_digests[name] = file_response.digest
+    file_digests = upload_files(encoded["files"])
     result = {
         "_type": encoded["_type"],
         "weave_type": encoded["weave_type"],
@@ -75,37 +247,105 @@ def isinstance_namedtuple(obj: Any) -> bool:
     )
 
 
-def _load_custom_obj_files(
-    project_id: str, server: TraceServerInterface, file_digests: dict
-) -> typing.Dict[str, bytes]:
-    loaded_files: typing.Dict[str, bytes] = {}
-    for name, digest in file_digests.items():
-        file_response = server.file_content_read(
+def _collect_file_digests(obj: Any, digests: set[str]) -> set[str]:
+    """Adds the digests of all custom object files in a JSON value to `digests`."""
+    if isinstance(obj, list):
+        for v in obj:
+            _collect_file_digests(v, digests)
+    elif isinstance(obj, dict):
+        if obj.get("_type") == "CustomWeaveType":
+            digests.update(obj["files"].values())
+        else:
+            for v in obj.values():
+                _collect_file_digests(v, digests)
+    return digests
+
+
+def _load_files(
+    project_id: str, server: TraceServerInterface, digests: Iterable[str]
+) -> dict[str, bytes]:
+    """Returns the content of each file, by digest, reading the files that are
+    not cached concurrently.
+    """
+    cache = get_server_caches(server).file_contents
+    contents: dict[str, bytes] = {}
+    missing = []
+    for digest in digests:
+        content = cache.get((project_id, digest))
+        if content is None:
+            missing.append(digest)
+        else:
+            contents[digest] = content
+
+    def read(digest: str) -> bytes:
+        return server.file_content_read(
             FileContentReadReq(project_id=project_id, digest=digest)
-        )
-        loaded_files[name] = file_response.content
-    return loaded_files
+        ).content
+
+    if len(missing) == 1:
+        loaded = [read(missing[0])]
+    elif missing:
+        with ContextAwareThreadPoolExecutor(
+            max_workers=min(FILE_READ_CONCURRENCY, len(missing))
+        ) as executor:
+            loaded = list(executor.map(read, missing))
+    else:
+        loaded = []
+    for digest, content in zip(missing, loaded):
+        cache.put((project_id, digest), content)
+        contents[digest] = content
+    return contents
+
+
+def prefetch_files(project_id: str, server: TraceServerInterface, obj: Any) -> None:
+    """Reads the custom object files in a JSON value into the file cache so
+    that later `from_json` calls on (parts of) it do not hit the server.
+
+    This is best-effort: it stops once `PREFETCH_FILES_MAX_BYTES` have been
+    read, so that prefetched files are not evicted from the cache before they
+    are used, and files that fail to load are read again by `from_json`.
+    """
+    digests = list(_collect_file_digests(obj, set()))
+    loaded_bytes = 0
+    for i in range(0, len(digests), FILE_READ_CONCURRENCY):
+        try:
+            contents = _load_files(
+                project_id, server, digests[i : i + FILE_READ_CONCURRENCY]
+            )
+        except Exception:
+            logger.debug("Failed to prefetch files", exc_info=True)
+            continue
+        loaded_bytes += sum(len(content) for content in contents.values())
+        if loaded_bytes >= PREFETCH_FILES_MAX_BYTES:
+            return
 
 
 def from_json(obj: Any, project_id: str, server: TraceServerInterface) -> Any:
+    files = _load_files(project_id, server, _collect_file_digests(obj, set()))
+    return _from_json(obj, project_id, server, files)
+
+
+def _from_json(
+    obj: Any, project_id: str, server: TraceServerInterface, files: dict[str, bytes]
+) -> Any:
     if isinstance(obj, list):
-        return [from_json(v, project_id, server) for v in obj]
+        return [_from_json(v, project_id, server, files) for v in obj]
     elif isinstance(obj, dict):
-        if (val_type := obj.pop("_type", None)) is None:
-            return {k: from_json(v, project_id, server) for k, v in obj.items()}
-        elif val_type == "ObjectRecord":
-            return ObjectRecord(
-                {k: from_json(v, project_id, server) for k, v in obj.items()}
-            )
-        elif val_type == "CustomWeaveType":
-            files = _load_custom_obj_files(project_id, server, obj["files"])
+        # obj may be shared with a cache, so it must not be modified.
+        val_type = obj.get("_type")
+        if val_type == "CustomWeaveType":
+            obj_files = {name: files[digest] for name, digest in obj["files"].items()}
             return custom_objs.decode_custom_obj(
-                obj["weave_type"], files, obj.get("load_op")
-            )
-        else:
-            return ObjectRecord(
-                {k: from_json(v, project_id, server) for k, v in obj.items()}
+                obj["weave_type"], obj_files, obj.get("load_op")
             )
+        vals = {
+            k: _from_json(v, project_id, server, files)
+            for k, v in obj.items()
+            if k != "_type"
+        }
+        if val_type is None:
+            return vals
+        return ObjectRecord(vals)
     elif isinstance(obj, str) and obj.startswith("weave://"):
         return parse_uri(obj)
 
@@ -32,6 +32,15 @@ class UserSettings(BaseModel):
     If True, prints a link to the Weave UI when calling a weave op.
     Can be overrided with the environment variable `WEAVE_PRINT_CALL_LINK`"""
 
+    background_logging: bool = False
+    """Toggles sending call data to the server from background threads.
+
+    If True, `call_start`/`call_end` requests (and the file uploads needed to
+    encode their inputs and outputs) are queued and sent by worker threads, so
+    traced code does not wait on the network. Use `client.flush()` to wait for
+    queued data to be sent.
+    Can be overrided with the environment variable `WEAVE_BACKGROUND_LOGGING`"""
+
     model_config = ConfigDict(extra="forbid")
     _is_first_apply: bool = PrivateAttr(True)
 
@@ -58,6 +67,10 @@ def should_print_call_link() -> bool:
     return _should("print_call_link")
 
 
+def should_log_in_background() -> bool:
+    return _should("background_logging")
+
+
 def parse_and_apply_settings(
     settings: Optional[Union[UserSettings, dict[str, Any]]] = None,
 ) -> None:
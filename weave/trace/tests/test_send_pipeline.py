@@ -0,0 +1,163 @@
+import gc
+import threading
+
+import pydantic
+import pytest
+
+from weave.trace.send_pipeline import SendPipeline
+
+
+class Req(pydantic.BaseModel):
+    key: str
+    n: int
+
+
+def make_pipeline(sent, **kwargs):
+    return SendPipeline({"req": (Req, sent.append)}, **kwargs)
+
+
+def test_send_pipeline_preserves_order_per_key():
+    sent: list[Req] = []
+    pipeline = make_pipeline(sent, num_workers=4)
+    for n in range(100):
+        for key in ("a", "b", "c"):
+            pipeline.submit("req", key, lambda key=key, n=n: Req(key=key, n=n))
+    assert pipeline.flush(timeout=10)
+
+    assert len(sent) == 300
+    for key in ("a", "b", "c"):
+        assert [r.n for r in sent if r.key == key] == list(range(100))
+
+
+def test_send_pipeline_drop_newest():
+    release = threading.Event()
+    sent: list[Req] = []
+
+    def send(req):
+        release.wait()
+        sent.append(req)
+
+    pipeline = SendPipeline(
+        {"req": (Req, send)},
+        num_workers=1,
+        max_queue_size=2,
+        backpressure="drop_newest",
+    )
+    results = [
+        pipeline.submit("req", "a", lambda n=n: Req(key="a", n=n)) for n in range(10)
+    ]
+    release.set()
+    assert pipeline.flush(timeout=10)
+
+    assert pipeline.dropped == results.count(False)
+    assert pipeline.dropped > 0
+    assert [r.n for r in sent] == [n for n, ok in enumerate(results) if ok]
+
+
+def test_send_pipeline_spill_to_disk(tmp_path):
+    release = threading.Event()
+    sent: list[Req] = []
+
+    def send(req):
+        release.wait()
+        sent.append(req)
+
+    pipeline = SendPipeline(
+        {"req": (Req, send)},
+        num_workers=1,
+        max_queue_size=2,
+        backpressure="spill",
+        spill_dir=str(tmp_path),
+    )
+    for n in range(20):
+        assert pipeline.submit("req", "a", lambda n=n: Req(key="a", n=n))
+    assert pipeline.spilled > 0
+    release.set()
+    assert pipeline.flush(timeout=10)
+
+    assert [r.n for r in sent] == list(range(20))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_send_pipeline_flush_timeout():
+    release = threading.Event()
+    pipeline = SendPipeline({"req": (Req, lambda req: release.wait())})
+    pipeline.submit("req", "a", lambda: Req(key="a", n=0))
+    assert not pipeline.flush(timeout=0.1)
+    release.set()
+    assert pipeline.flush(timeout=10)
+
+
+def test_send_pipeline_survives_send_errors():
+    sent: list[Req] = []
+
+    def send(req):
+        if req.n == 0:
+            raise ValueError("boom")
+        sent.append(req)
+
+    pipeline = SendPipeline({"req": (Req, send)}, num_workers=1)
+    pipeline.submit("req", "a", lambda: Req(key="a", n=0))
+    pipeline.submit("req", "a", lambda: Req(key="a", n=1))
+    assert pipeline.flush(timeout=10)
+
+    assert pipeline.errors == 1
+    assert [r.n for r in sent] == [1]
+
+
+def test_send_pipeline_invalid_policy():
+    with pytest.raises(ValueError):
+        SendPipeline({}, backpressure="sometimes")  # type: ignore
+
+
+def test_send_pipeline_workers_exit_when_collected():
+    sent: list[Req] = []
+    pipeline = make_pipeline(sent, num_workers=2)
+    pipeline.submit("req", "a", lambda: Req(key="a", n=0))
+    threads = [shard.thread for shard in pipeline._shards]
+    del pipeline
+    gc.collect()
+
+    for thread in threads:
+        thread.join(timeout=10)
+        assert not thread.is_alive()
+    # Queued requests are still sent
+    assert [r.n for r in sent] == [0]
+
+
+def test_send_pipeline_spill_encodes_outside_lock(tmp_path):
+    release = threading.Event()
+    encoding = threading.Event()
+    sent: list[Req] = []
+
+    def send(req):
+        release.wait()
+        sent.append(req)
+
+    pipeline = SendPipeline(
+        {"req": (Req, send)},
+        num_workers=1,
+        max_queue_size=1,
+        backpressure="spill",
+        spill_dir=str(tmp_path),
+    )
+    pipeline.submit("req", "a", lambda: Req(key="a", n=0))
+    pipeline.submit("req", "a", lambda: Req(key="a", n=1))
+
+    def slow_req():
+        encoding.set()
+        release.wait()
+        return Req(key="a", n=2)
+
+    submitter = threading.Thread(
+        target=pipeline.submit, args=("req", "a", slow_req), daemon=True
+    )
+    submitter.start()
+    assert encoding.wait(timeout=10)
+    # Flushing doesn't wait on the lock held while encoding the spilled job
+    assert not pipeline.flush(timeout=0.1)
+    release.set()
+    submitter.join(timeout=10)
+    assert pipeline.flush(timeout=10)
+
+    assert [r.n for r in sent] == [0, 1, 2]
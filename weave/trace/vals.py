@@ -1,9 +1,20 @@
 import dataclasses
 import inspect
+import logging
 import operator
+import re
 import typing
 from functools import partial
-from typing import Any, Generator, Iterator, Literal, Optional, SupportsIndex, Union
+from typing import (
+    Any,
+    Generator,
+    Iterable,
+    Iterator,
+    Literal,
+    Optional,
+    SupportsIndex,
+    Union,
+)
 
 from pydantic import BaseModel
 from pydantic import v1 as pydantic_v1
@@ -22,15 +33,25 @@ from weave.trace.refs import (
     ObjectRef,
     RefWithExtra,
     TableRef,
+    parse_uri,
 )
-from weave.trace.serialize import from_json
+from weave.trace.serialize import from_json, get_server_caches, prefetch_files
+from weave.trace.util import ContextAwareThreadPoolExecutor
 from weave.trace_server.trace_server_interface import (
     ObjReadReq,
+    RefsReadBatchReq,
     TableQueryReq,
     TableRowFilter,
     TraceServerInterface,
 )
 
+logger = logging.getLogger(__name__)
+
+# Maximum number of refs sent in one refs_read_batch request.
+REFS_READ_BATCH_SIZE = 1000
+# Maximum number of concurrent refs_read_batch requests.
+REFS_READ_CONCURRENCY = 4
+
 
 @dataclasses.dataclass
 class MutationSetitem:
@@ -290,14 +311,15 @@ class WeaveTable(Traceable):
                 )
             )
 
-            for item in response.rows:
+            # Decode the whole page at once so that the rows' files and refs
+            # are read in batches rather than one row at a time.
+            project_id = f"{self.table_ref.entity}/{self.table_ref.project}"
+            row_vals = [item.val for item in response.rows]
+            prefetch_refs(row_vals, self.server)
+            row_vals = from_json(row_vals, project_id, self.server)
+            for item, val in zip(response.rows, row_vals):
                 new_ref = self.ref.with_item(item.digest) if self.ref else None
-                res = from_json(
-                    item.val,
-                    self.table_ref.entity + "/" + self.table_ref.project,
-                    self.server,
-                )
-                res = make_trace_obj(res, new_ref, self.server, self.root)
+                res = make_trace_obj(val, new_ref, self.server, self.root)
                 yield res
 
             if len(response.rows) < page_size:
@@ -488,14 +510,9 @@ def make_trace_obj(
     if isinstance(val, ObjectRef):
         new_ref = val
         extra = val.extra
-        read_res = server.obj_read(
-            ObjReadReq(
-                project_id=f"{val.entity}/{val.project}",
-                object_id=val.name,
-                digest=val.digest,
-            )
+        val = from_json(
+            _read_ref_val(val, server), val.entity + "/" + val.project, server
         )
-        val = from_json(read_res.obj.val, val.entity + "/" + val.project, server)
 
     if isinstance(val, Table):
         val_ref = val.ref
@@ -601,5 +618,102 @@ def make_trace_obj(
     return box_val
 
 
+_DIGEST_ALIAS_RE = re.compile(r"^(latest|v\d+)$")
+
+
+def _root_ref(ref: ObjectRef) -> Optional[ObjectRef]:
+    """Returns `ref` without its extra, or None if its digest is an alias
+    (eg. "latest") whose target can change and so must not be cached.
+    """
+    if _DIGEST_ALIAS_RE.match(ref.digest):
+        return None
+    return dataclasses.replace(ref, extra=())
+
+
+def _read_ref_val(ref: ObjectRef, server: TraceServerInterface) -> Any:
+    """Returns the JSON value of the object `ref` points to (ignoring its
+    extra), from the ref cache if possible.
+    """
+    cache = get_server_caches(server).ref_vals
+    root_ref = _root_ref(ref)
+    if root_ref is not None and (val := cache.get(root_ref.uri())) is not None:
+        return val
+    read_res = server.obj_read(
+        ObjReadReq(
+            project_id=f"{ref.entity}/{ref.project}",
+            object_id=ref.name,
+            digest=ref.digest,
+        )
+    )
+    if root_ref is not None:
+        cache.put(root_ref.uri(), read_res.obj.val)
+    return read_res.obj.val
+
+
+def _collect_object_refs(val: Any, refs: dict[str, ObjectRef]) -> None:
+    if isinstance(val, str) and val.startswith("weave:///"):
+        try:
+            val = parse_uri(val)
+        except Exception:
+            return
+    if isinstance(val, ObjectRef):
+        if (root_ref := _root_ref(val)) is not None:
+            refs[root_ref.uri()] = root_ref
+    elif isinstance(val, ObjectRecord):
+        _collect_object_refs(val.__dict__, refs)
+    elif isinstance(val, (list, tuple)):
+        for v in val:
+            _collect_object_refs(v, refs)
+    elif isinstance(val, dict):
+        for v in val.values():
+            _collect_object_refs(v, refs)
+
+
+def prefetch_refs(vals: Iterable[Any], server: TraceServerInterface) -> None:
+    """Reads the objects referenced anywhere in `vals` into the ref cache.
+
+    `vals` may hold JSON values (refs as uris) or decoded values (refs as
+    `ObjectRef`). Uncached refs are read with concurrent `refs_read_batch`
+    requests, so that dereferencing them later with `make_trace_obj` does not
+    cost a round-trip per ref. This is best-effort: refs that fail to load
+    here are read individually when dereferenced.
+    """
+    refs: dict[str, ObjectRef] = {}
+    _collect_object_refs(list(vals), refs)
+    caches = get_server_caches(server)
+    uris = [uri for uri in refs if caches.ref_vals.get(uri) is None]
+    # Reading more than the cache holds would evict refs before they are used.
+    uris = uris[: caches.ref_vals.max_entries // 2]
+
+    def read_batch(batch: list[str]) -> list[Any]:
+        try:
+            return server.refs_read_batch(RefsReadBatchReq(refs=batch)).vals
+        except Exception:
+            logger.debug("Failed to prefetch refs", exc_info=True)
+            return []
+
+    batches = [
+        uris[i : i + REFS_READ_BATCH_SIZE]
+        for i in range(0, len(uris), REFS_READ_BATCH_SIZE)
+    ]
+    if len(batches) > 1:
+        with ContextAwareThreadPoolExecutor(
+            max_workers=min(REFS_READ_CONCURRENCY, len(batches))
+        ) as executor:
+            results = list(executor.map(read_batch, batches))
+    else:
+        results = [read_batch(batch) for batch in batches]
+
+    # Also read the files of the objects, which from_json will need.
+    by_project: dict[str, list[Any]] = {}
+    for batch, batch_vals in zip(batches, results):
+        for uri, val in zip(batch, batch_vals):
+            caches.ref_vals.put(uri, val)
+            ref = refs[uri]
+            by_project.setdefault(f"{ref.entity}/{ref.project}", []).append(val)
+    for project_id, project_vals in by_project.items():
+        prefetch_files(project_id, server, project_vals)
+
+
 class MissingSelfInstanceError(ValueError):
     pass
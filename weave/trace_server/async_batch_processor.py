@@ -1,20 +1,55 @@
 import atexit
+import dataclasses
+import logging
 import time
-from queue import Queue
-from threading import Event, Lock, Thread
-from typing import Callable, Generic, List, TypeVar
+from collections import deque
+from threading import Condition, Thread
+from typing import Callable, Deque, Generic, List, Optional, Tuple, TypeVar
 
 T = TypeVar("T")
 
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class AsyncBatchProcessorStats:
+    """Counters describing the work done by an AsyncBatchProcessor."""
+
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    in_flight_batches: int = 0
+    batches_processed: int = 0
+    items_processed: int = 0
+    processing_errors: int = 0
+    last_flush_latency: float = 0.0
+    total_flush_latency: float = 0.0
+
+    @property
+    def mean_flush_latency(self) -> float:
+        if self.batches_processed == 0:
+            return 0.0
+        return self.total_flush_latency / self.batches_processed
+
 
 class AsyncBatchProcessor(Generic[T]):
-    """A class that asynchronously processes batches of items using a provided processor function."""
+    """A class that asynchronously processes batches of items using a provided processor function.
+
+    A batch is flushed as soon as it reaches `max_batch_size` items or
+    `max_batch_bytes` bytes (as measured by `size_fn`), or once its oldest item
+    has waited `max_batch_age` seconds. Up to `num_workers` batches are
+    processed concurrently, so `processor_fn` must be thread-safe and must not
+    rely on batches being processed in order when `num_workers > 1`.
+    """
 
     def __init__(
         self,
         processor_fn: Callable[[List[T]], None],
         max_batch_size: int = 100,
-        min_batch_interval: float = 1.0,
+        max_batch_age: float = 1.0,
+        *,
+        max_batch_bytes: Optional[int] = None,
+        size_fn: Optional[Callable[[T], int]] = None,
+        num_workers: int = 1,
     ) -> None:
         """
         Initializes an instance of AsyncBatchProcessor.
@@ -22,19 +57,38 @@ class AsyncBatchProcessor(Generic[T]):
         Args:
             processor_fn (Callable[[List[T]], None]): The function to process the batches of items.
             max_batch_size (int, optional): The maximum size of each batch. Defaults to 100.
-            min_batch_interval (float, optional): The minimum interval between processing batches. Defaults to 1.0.
+            max_batch_age (float, optional): The maximum time in seconds an item waits before its batch is flushed. Defaults to 1.0.
+            max_batch_bytes (int, optional): The maximum size of each batch in bytes, as measured by `size_fn`. Defaults to no limit.
+            size_fn (Callable[[T], int], optional): Returns the size of an item in bytes. Required if `max_batch_bytes` is set.
+            num_workers (int, optional): The number of batches that may be processed concurrently. Defaults to 1.
         """
+        if max_batch_bytes is not None and size_fn is None:
+            raise ValueError("size_fn is required when max_batch_bytes is set")
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1")
         self.processor_fn = processor_fn
         self.max_batch_size = max_batch_size
-        self.min_batch_interval = min_batch_interval
-        self.queue: Queue[T] = Queue()
-        self.lock = Lock()
-        self.stop_event = Event()  # Use an event to signal stopping
-        self.processing_thread = Thread(target=self._process_batches)
-        self.processing_thread.daemon = True
-        self.processing_thread.start()
+        self.max_batch_age = max_batch_age
+        self.max_batch_bytes = max_batch_bytes
+        self.size_fn = size_fn
+        # Items are stored with their size and enqueue time.
+        self.queue: Deque[Tuple[T, int, float]] = deque()
+        self.queue_bytes = 0
+        self.cond = Condition()
+        self.stopping = False
+        self.stats = AsyncBatchProcessorStats()
+        self.processing_threads = [
+            Thread(target=self._process_batches, daemon=True)
+            for _ in range(num_workers)
+        ]
+        for thread in self.processing_threads:
+            thread.start()
         atexit.register(self.wait_until_all_processed)  # Register cleanup function
 
+    @property
+    def queue_depth(self) -> int:
+        return self.stats.queue_depth
+
     def enqueue(self, items: List[T]) -> None:
         """
         Enqueues a list of items to be processed.
@@ -42,28 +96,96 @@ class AsyncBatchProcessor(Generic[T]):
         Args:
             items (List[T]): The items to be processed.
         """
-        with self.lock:
-            for item in items:
-                self.queue.put(item)
+        now = time.monotonic()
+        sized_items = [
+            (item, self.size_fn(item) if self.size_fn else 0, now) for item in items
+        ]
+        with self.cond:
+            was_empty = not self.queue
+            for sized_item in sized_items:
+                self.queue.append(sized_item)
+                self.queue_bytes += sized_item[1]
+            self.stats.queue_depth = len(self.queue)
+            self.stats.max_queue_depth = max(
+                self.stats.max_queue_depth, self.stats.queue_depth
+            )
+            # Idle workers wait without a timeout on an empty queue, so wake
+            # one to start the max age timer of the new batch.
+            if was_empty or self._batch_ready(now):
+                self.cond.notify()
 
-    def _process_batches(self) -> None:
-        """Internal method that continuously processes batches of items from the queue."""
-        while True:
-            current_batch: List[T] = []
-            while not self.queue.empty() and len(current_batch) < self.max_batch_size:
-                current_batch.append(self.queue.get())
-
-            if current_batch:
-                self.processor_fn(current_batch)
+    def _batch_ready(self, now: float) -> bool:
+        """Whether a batch should be flushed now. Must hold `self.cond`."""
+        if not self.queue:
+            return False
+        if self.stopping or len(self.queue) >= self.max_batch_size:
+            return True
+        if (
+            self.max_batch_bytes is not None
+            and self.queue_bytes >= self.max_batch_bytes
+        ):
+            return True
+        return now - self.queue[0][2] >= self.max_batch_age
 
-            if self.stop_event.is_set() and self.queue.empty():
+    def _take_batch(self) -> List[T]:
+        """Pops the next batch off the queue. Must hold `self.cond`."""
+        batch: List[T] = []
+        batch_bytes = 0
+        while self.queue and len(batch) < self.max_batch_size:
+            item, size, _ = self.queue[0]
+            if (
+                batch
+                and self.max_batch_bytes is not None
+                and batch_bytes + size > self.max_batch_bytes
+            ):
                 break
+            self.queue.popleft()
+            self.queue_bytes -= size
+            batch.append(item)
+            batch_bytes += size
+        self.stats.queue_depth = len(self.queue)
+        return batch
+
+    def _process_batches(self) -> None:
+        """Internal method that waits for batches to become ready and processes them."""
+        while True:
+            with self.cond:
+                while not self._batch_ready(time.monotonic()):
+                    if self.stopping:
+                        return
+                    timeout = None
+                    if self.queue:
+                        age = time.monotonic() - self.queue[0][2]
+                        timeout = max(0.0, self.max_batch_age - age)
+                    self.cond.wait(timeout)
+                batch = self._take_batch()
+                self.stats.in_flight_batches += 1
+                # Another batch may already be ready for an idle worker.
+                if self._batch_ready(time.monotonic()):
+                    self.cond.notify()
 
-            # Unless we are stopping, sleep for a the min_batch_interval
-            if not self.stop_event.is_set():
-                time.sleep(self.min_batch_interval)
+            start = time.monotonic()
+            failed = False
+            try:
+                self.processor_fn(batch)
+            except Exception:
+                # Keep the worker alive so later batches are still processed.
+                failed = True
+                logger.exception("Error processing batch")
+            finally:
+                latency = time.monotonic() - start
+                with self.cond:
+                    self.stats.in_flight_batches -= 1
+                    self.stats.batches_processed += 1
+                    self.stats.items_processed += len(batch)
+                    self.stats.processing_errors += int(failed)
+                    self.stats.last_flush_latency = latency
+                    self.stats.total_flush_latency += latency
 
     def wait_until_all_processed(self) -> None:
         """Waits until all enqueued items have been processed."""
-        self.stop_event.set()
-        self.processing_thread.join()
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        for thread in self.processing_threads:
+            thread.join()
@@ -218,6 +218,10 @@ class CallsQuery(BaseModel):
     limit: typing.Optional[int] = None
     offset: typing.Optional[int] = None
     include_costs: bool = False
+    # Keyset pagination: only calls sorting after `seek_values` in the order of
+    # `seek_fields` are returned.
+    seek_fields: list[OrderField] = Field(default_factory=list)
+    seek_values: list[typing.Any] = Field(default_factory=list)
 
     def add_field(self, field: str) -> "CallsQuery":
         self.select_fields.append(get_field_by_name(field))
@@ -264,6 +268,26 @@ class CallsQuery(BaseModel):
         self.offset = offset
         return self
 
+    def set_seek(self, values: list[typing.Any]) -> "CallsQuery":
+        """Only return calls that sort strictly after the call whose order
+        field values are `values`. The order must end with a unique field
+        (eg. `id`) for this to paginate correctly.
+        """
+        if self.seek_fields:
+            raise ValueError("Seek can only be set once")
+        if self.offset:
+            raise ValueError("Seek cannot be combined with offset")
+        if len(values) != len(self.order_fields):
+            raise ValueError("Seek requires one value per order field")
+        for order_field in self.order_fields:
+            if isinstance(order_field.field, CallsMergedDynamicField):
+                raise ValueError(
+                    f"Seek does not support ordering by {order_field.field.field}"
+                )
+        self.seek_fields = self.order_fields.copy()
+        self.seek_values = values
+        return self
+
     def clone(self) -> "CallsQuery":
         return CallsQuery(
             project_id=self.project_id,
@@ -273,6 +297,8 @@ class CallsQuery(BaseModel):
             hardcoded_filter=self.hardcoded_filter,
             limit=self.limit,
             offset=self.offset,
+            seek_fields=self.seek_fields.copy(),
+            seek_values=self.seek_values.copy(),
         )
 
     def set_include_costs(self, include_costs: bool) -> "CallsQuery":
@@ -383,8 +409,11 @@ class CallsQuery(BaseModel):
             and not has_heavy_order
         )
 
+        # Seek fields are never heavy
+        has_seek = bool(self.seek_fields)
+
         predicate_pushdown_possible = (
-            has_light_filter or has_light_query or has_light_order_filter
+            has_light_filter or has_light_query or has_light_order_filter or has_seek
         )
 
         # Determine if we should optimize!
@@ -421,6 +450,10 @@ class CallsQuery(BaseModel):
         # Hardcoded Filter - always light
         filter_query.hardcoded_filter = self.hardcoded_filter
 
+        # Seek - always light
+        filter_query.seek_fields = self.seek_fields
+        filter_query.seek_values = self.seek_values
+
         # Order Fields:
         if has_light_order_filter:
             filter_query.order_fields = self.order_fields
@@ -468,6 +501,8 @@ class CallsQuery(BaseModel):
             )
         if self.hardcoded_filter is not None:
             having_conditions_sql.append(self.hardcoded_filter.as_sql(pb, table_alias))
+        if self.seek_fields:
+            having_conditions_sql.append(self._seek_sql(pb, table_alias))
 
         if len(having_conditions_sql) > 0:
             having_filter_sql = "HAVING " + combine_conditions(
@@ -518,6 +553,34 @@ class CallsQuery(BaseModel):
 
         return _safely_format_sql(raw_sql)
 
+    def _seek_sql(self, pb: ParamBuilder, table_alias: str) -> str:
+        """Returns the keyset condition selecting rows after `seek_values`:
+
+        (f1 > v1) OR (f1 = v1 AND f2 > v2) OR ...
+
+        with `<` in place of `>` for descending fields.
+        """
+        field_sqls = []
+        for order_field, value in zip(self.seek_fields, self.seek_values):
+            param_type = "String"
+            if order_field.field.field in ("started_at", "ended_at"):
+                param_type = "DateTime64(3)"
+            value_sql = _param_slot(pb.add_param(value), param_type)
+            field_sqls.append(
+                (
+                    order_field.field.as_sql(pb, table_alias),
+                    order_field.direction,
+                    value_sql,
+                )
+            )
+        or_conditions = []
+        for i, (field_sql, direction, value_sql) in enumerate(field_sqls):
+            and_conditions = [f"({f} = {v})" for f, _, v in field_sqls[:i]]
+            op = ">" if direction == "ASC" else "<"
+            and_conditions.append(f"({field_sql} {op} {value_sql})")
+            or_conditions.append(combine_conditions(and_conditions, "AND"))
+        return combine_conditions(or_conditions, "OR")
+
 
 ALLOWED_CALL_FIELDS = {
     "project_id": CallsMergedField(field="project_id"),
@@ -47,6 +47,7 @@ from weave.trace_server.calls_query_builder import (
 from weave.trace_server.ids import generate_id
 
 from . import clickhouse_trace_server_migrator as wf_migrator
+from . import digest_cache as wf_digest_cache
 from . import environment as wf_env
 from . import refs_internal
 from . import trace_server_interface as tsi
@@ -70,14 +71,28 @@ from .orm import ParamBuilder, Row
 from .trace_server_interface_util import (
     assert_non_null_wb_user_id,
     bytes_digest,
+    calls_cursor_sort_order,
+    chunk_table_row_digests,
+    decode_calls_cursor,
+    encode_calls_cursor,
     extract_refs_from_values,
     str_digest,
+    table_digest,
+    table_digest_hasher,
 )
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 MAX_FLUSH_COUNT = 10000
+# Maximum number of table row digests in one query
+TABLE_ROWS_READ_CHUNK_SIZE = 10000
+# Maximum number of table chunks in one query
+TABLE_CHUNKS_READ_CHUNK_SIZE = 100
+# Maximum number of object versions in one query
+OBJS_READ_CHUNK_SIZE = 1000
+# Maximum number of refs in one refs_read_batch request
+MAX_REFS_READ_BATCH_SIZE = 10000
 MAX_FLUSH_AGE = 15
 
 FILE_CHUNK_SIZE = 100000
@@ -135,7 +150,13 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
         password: str = "",
         database: str = "default",
         use_async_insert: bool = False,
+        digest_cache: typing.Optional[wf_digest_cache.DigestCache] = None,
     ):
+        """
+        Args:
+            digest_cache: Cache for data read by digest (objects, table rows
+                and files). Defaults to the process-wide cache.
+        """
         super().__init__()
         self._thread_local = threading.local()
         self._host = host
@@ -146,6 +167,7 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
         self._flush_immediately = True
         self._call_batch: typing.List[typing.List[typing.Any]] = []
         self._use_async_insert = use_async_insert
+        self._digest_cache = digest_cache or wf_digest_cache.get_default_digest_cache()
 
     @classmethod
     def from_env(cls, use_async_insert: bool = False) -> "ClickHouseTraceServer":
@@ -218,7 +240,12 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
 
     def calls_query(self, req: tsi.CallsQueryReq) -> tsi.CallsQueryRes:
         stream = self.calls_query_stream(req)
-        return tsi.CallsQueryRes(calls=list(stream))
+        calls = list(stream)
+        next_cursor = None
+        sort_order = calls_cursor_sort_order(req.sort_by)
+        if req.limit and len(calls) == req.limit and sort_order is not None:
+            next_cursor = encode_calls_cursor(sort_order, calls[-1])
+        return tsi.CallsQueryRes(calls=calls, next_cursor=next_cursor)
 
     def calls_query_stats(self, req: tsi.CallsQueryStatsReq) -> tsi.CallsQueryStatsRes:
         """Returns a stats object for the given query. This is useful for counts or other
@@ -274,16 +301,34 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
         if req.query is not None:
             cq.add_condition(req.query.expr_)
 
+        # Sorts usable with cursors get `id` as a tiebreaker, so that the
+        # order is stable across pages.
+        sort_order = calls_cursor_sort_order(req.sort_by)
+        if sort_order is not None:
+            for field, direction in sort_order:
+                cq.add_order(field, direction)
         # Sort with empty list results in no sorting
-        if req.sort_by is not None:
+        elif req.sort_by is not None:
             for sort_by in req.sort_by:
                 cq.add_order(sort_by.field, sort_by.direction)
-        else:
-            cq.add_order("started_at", "asc")
         if req.limit is not None:
             cq.set_limit(req.limit)
-        if req.offset is not None:
+        if req.offset is not None and req.cursor is None:
             cq.set_offset(req.offset)
+        if req.cursor is not None:
+            if sort_order is None:
+                raise InvalidRequest(
+                    "Cursor pagination only supports sorting by started_at, op_name, trace_id and id"
+                )
+            values = decode_calls_cursor(req.cursor, sort_order)
+            cq.set_seek(
+                [
+                    datetime.datetime.fromisoformat(value)
+                    if field == "started_at"
+                    else value
+                    for (field, _), value in zip(sort_order, values)
+                ]
+            )
 
         pb = ParamBuilder()
         raw_res = self._query_stream(
@@ -450,13 +495,35 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
             else:
                 conds.append("digest = {version_digest: String}")
                 parameters["version_digest"] = req.digest
+        # Versions are mutable (is_latest, version_count), so they are always
+        # queried, but the value is immutable and can come from the cache.
+        cached_val_dump = None
+        if "version_digest" in parameters:
+            cached_val_dump = self._digest_cache.get(
+                wf_digest_cache.OBJ_VAL,
+                req.project_id,
+                _obj_val_cache_key(req.object_id, req.digest),
+            )
         objs = self._select_objs_query(
-            req.project_id, conditions=conds, parameters=parameters
+            req.project_id,
+            conditions=conds,
+            parameters=parameters,
+            include_val_dump=cached_val_dump is None,
         )
         if len(objs) == 0:
             raise NotFoundError(f"Obj {req.object_id}:{req.digest} not found")
 
-        return tsi.ObjReadRes(obj=_ch_obj_to_obj_schema(objs[0]))
+        obj = objs[0]
+        if cached_val_dump is None:
+            self._digest_cache.set(
+                wf_digest_cache.OBJ_VAL,
+                req.project_id,
+                _obj_val_cache_key(obj.object_id, obj.digest),
+                obj.val_dump.encode(),
+            )
+        else:
+            obj = obj.model_copy(update={"val_dump": cached_val_dump.decode()})
+        return tsi.ObjReadRes(obj=_ch_obj_to_obj_schema(obj))
 
     def objs_query(self, req: tsi.ObjQueryReq) -> tsi.ObjQueryRes:
         conds: list[str] = []
@@ -487,7 +554,8 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
         return tsi.ObjQueryRes(objs=[_ch_obj_to_obj_schema(obj) for obj in objs])
 
     def table_create(self, req: tsi.TableCreateReq) -> tsi.TableCreateRes:
-        insert_rows = []
+        new_rows: typing.Dict[str, typing.Tuple[typing.List[str], str]] = {}
+        row_digests = []
         for r in req.table.rows:
             if not isinstance(r, dict):
                 raise ValueError(
@@ -495,214 +563,363 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
                 )
             row_json = json.dumps(r)
             row_digest = str_digest(row_json)
-            insert_rows.append(
-                (
-                    req.table.project_id,
-                    row_digest,
-                    extract_refs_from_values(r),
-                    row_json,
-                )
-            )
+            if row_digest not in new_rows:
+                new_rows[row_digest] = (extract_refs_from_values(r), row_json)
+            row_digests.append(row_digest)
 
-        self._insert(
-            "table_rows",
-            data=insert_rows,
-            column_names=["project_id", "digest", "refs", "val_dump"],
+        self._insert_table_rows(req.table.project_id, new_rows)
+        chunk_digests = self._insert_table_chunks(
+            req.table.project_id, chunk_table_row_digests(row_digests)
         )
-
-        row_digests = [r[1] for r in insert_rows]
-
-        table_hasher = hashlib.sha256()
-        for row_digest in row_digests:
-            table_hasher.update(row_digest.encode())
-        digest = table_hasher.hexdigest()
-
-        self._insert(
-            "tables",
-            data=[(req.table.project_id, digest, row_digests)],
-            column_names=["project_id", "digest", "row_digests"],
+        digest = self._insert_table(
+            req.table.project_id,
+            table_digest_hasher(row_digests),
+            chunk_digests,
+            row_digests,
         )
         return tsi.TableCreateRes(digest=digest)
 
     def table_update(self, req: tsi.TableUpdateReq) -> tsi.TableUpdateRes:
-        query = """
-            SELECT *
-            FROM (
-                    SELECT *,
-                        row_number() OVER (PARTITION BY project_id, digest) AS rn
-                    FROM tables
-                    WHERE project_id = {project_id:String} AND digest = {digest:String}
-                )
-            WHERE rn = 1
-            ORDER BY project_id, digest
-        """
-
-        row_digest_result_query = self.ch_client.query(
-            query,
-            parameters={
-                "project_id": req.project_id,
-                "digest": req.base_digest,
-            },
-        )
-
-        if len(row_digest_result_query.result_rows) == 0:
+        table = self._read_table(req.project_id, req.base_digest)
+        if table is None:
             raise NotFoundError(f"Table {req.project_id}:{req.base_digest} not found")
+        base_row_digests, base_chunk_digests = table
 
-        final_row_digests: list[str] = row_digest_result_query.result_rows[0][2]
-        new_rows_needed_to_insert = []
-        known_digests = set(final_row_digests)
+        new_rows: typing.Dict[str, typing.Tuple[typing.List[str], str]] = {}
 
-        def add_new_row_needed_to_insert(row_data: typing.Any) -> str:
+        def add_row(row_data: typing.Any) -> str:
             if not isinstance(row_data, dict):
                 raise ValueError("All rows must be dictionaries")
             row_json = json.dumps(row_data)
             row_digest = str_digest(row_json)
-            if row_digest not in known_digests:
-                new_rows_needed_to_insert.append(
-                    (
-                        req.project_id,
-                        row_digest,
-                        extract_refs_from_values(row_data),
-                        row_json,
-                    )
-                )
-                known_digests.add(row_digest)
+            if row_digest not in new_rows:
+                new_rows[row_digest] = (extract_refs_from_values(row_data), row_json)
             return row_digest
 
-        for update in req.updates:
-            if isinstance(update, tsi.TableAppendSpec):
-                new_digest = add_new_row_needed_to_insert(update.append.row)
-                final_row_digests.append(new_digest)
-            elif isinstance(update, tsi.TablePopSpec):
-                if update.pop.index >= len(final_row_digests) or update.pop.index < 0:
-                    raise ValueError("Index out of range")
-                final_row_digests.pop(update.pop.index)
-            elif isinstance(update, tsi.TableInsertSpec):
-                if (
-                    update.insert.index > len(final_row_digests)
-                    or update.insert.index < 0
-                ):
-                    raise ValueError("Index out of range")
-                new_digest = add_new_row_needed_to_insert(update.insert.row)
-                final_row_digests.insert(update.insert.index, new_digest)
-            else:
-                raise ValueError("Unrecognized update", update)
-
-        if new_rows_needed_to_insert:
-            self._insert(
-                "table_rows",
-                data=new_rows_needed_to_insert,
-                column_names=["project_id", "digest", "refs", "val_dump"],
+        final_row_digests: typing.Optional[typing.List[str]]
+        if base_chunk_digests and all(
+            isinstance(update, tsi.TableAppendSpec) for update in req.updates
+        ):
+            # Appending rows only changes the last chunk, so only it is
+            # rechunked; the other chunks are shared with the base table. The
+            # base table's digest is extended with the appended rows.
+            kept_chunk_digests = base_chunk_digests[:-1]
+            last_chunk_digest = base_chunk_digests[-1]
+            rechunk_row_digests = list(
+                self._table_chunks(req.project_id, [last_chunk_digest])[
+                    last_chunk_digest
+                ]
             )
+            appended_row_digests = [
+                add_row(typing.cast(tsi.TableAppendSpec, update).append.row)
+                for update in req.updates
+            ]
+            rechunk_row_digests.extend(appended_row_digests)
+            hasher = table_digest_hasher(
+                appended_row_digests,
+                self._table_hasher(req.project_id, req.base_digest),
+            )
+            # Not cached, since it would copy all of the base table's rows
+            final_row_digests = None
+        else:
+            kept_chunk_digests = []
+            if base_chunk_digests:
+                final_row_digests = self._concat_table_chunks(
+                    req.project_id, base_chunk_digests
+                )
+            else:
+                final_row_digests = list(base_row_digests)
+            for update in req.updates:
+                if isinstance(update, tsi.TableAppendSpec):
+                    final_row_digests.append(add_row(update.append.row))
+                elif isinstance(update, tsi.TablePopSpec):
+                    if (
+                        update.pop.index >= len(final_row_digests)
+                        or update.pop.index < 0
+                    ):
+                        raise ValueError("Index out of range")
+                    final_row_digests.pop(update.pop.index)
+                elif isinstance(update, tsi.TableInsertSpec):
+                    if (
+                        update.insert.index > len(final_row_digests)
+                        or update.insert.index < 0
+                    ):
+                        raise ValueError("Index out of range")
+                    final_row_digests.insert(
+                        update.insert.index, add_row(update.insert.row)
+                    )
+                else:
+                    raise ValueError("Unrecognized update", update)
+            rechunk_row_digests = final_row_digests
+            hasher = table_digest_hasher(final_row_digests)
 
-        table_hasher = hashlib.sha256()
-        for row_digest in final_row_digests:
-            table_hasher.update(row_digest.encode())
-        digest = table_hasher.hexdigest()
-
-        self._insert(
-            "tables",
-            data=[(req.project_id, digest, final_row_digests)],
-            column_names=["project_id", "digest", "row_digests"],
+        self._insert_table_rows(req.project_id, new_rows)
+        chunk_digests = kept_chunk_digests + self._insert_table_chunks(
+            req.project_id,
+            chunk_table_row_digests(rechunk_row_digests),
+            known_chunk_digests=set(base_chunk_digests),
         )
-        return tsi.TableCreateRes(digest=digest)
+        digest = self._insert_table(
+            req.project_id, hasher, chunk_digests, final_row_digests
+        )
+        return tsi.TableUpdateRes(digest=digest)
 
     def table_query(self, req: tsi.TableQueryReq) -> tsi.TableQueryRes:
-        conds = []
-        parameters = {}
-        if req.filter:
-            if req.filter.row_digests:
-                conds.append("tr.digest IN {row_digets: Array(String)}")
-                parameters["row_digests"] = req.filter.row_digests
-        else:
-            conds.append("1 = 1")
-        rows = self._table_query(
-            req.project_id,
-            req.digest,
-            conditions=conds,
-            limit=req.limit,
-            offset=req.offset,
+        row_digests = self._table_row_digests(req.project_id, req.digest)
+        if req.filter and req.filter.row_digests:
+            wanted_digests = set(req.filter.row_digests)
+            row_digests = [d for d in row_digests if d in wanted_digests]
+        start = req.offset or 0
+        stop = start + req.limit if req.limit else None
+        row_digests = row_digests[start:stop]
+        row_vals = self._table_row_vals(req.project_id, row_digests)
+        return tsi.TableQueryRes(
+            rows=[
+                tsi.TableRowSchema(digest=d, val=row_vals[d])
+                for d in row_digests
+                if d in row_vals
+            ]
         )
-        return tsi.TableQueryRes(rows=rows)
-
-    def _table_query(
-        self,
-        project_id: str,
-        digest: str,
-        conditions: typing.Optional[typing.List[str]] = None,
-        limit: typing.Optional[int] = None,
-        offset: typing.Optional[int] = None,
-        parameters: typing.Optional[typing.Dict[str, typing.Any]] = None,
-    ) -> typing.List[tsi.TableRowSchema]:
-        conds = ["project_id = {project_id: String}"]
-        if conditions:
-            conds.extend(conditions)
-
-        predicate = combine_conditions(conds, "AND")
-        # The subqueries are for deduplication of table rows and tables by digest.
-        # It might be more efficient to do deduplication of table rows
-        # in the outer query instead of the right side of the JOIN clause here,
-        # that hasn't been tested yet.
-        query = f"""
-                SELECT tr.digest, tr.val_dump
-                FROM (
-                    SELECT project_id, row_digest
-                    FROM (
-                        SELECT *
-                        FROM (
-                                SELECT *,
-                                    row_number() OVER (PARTITION BY project_id, digest) AS rn
-                                FROM tables
-                                WHERE project_id = {{project_id:String}} AND digest = {{digest:String}}
-                            )
-                        WHERE rn = 1
-                        ORDER BY project_id, digest
-                    )
-                    ARRAY JOIN row_digests AS row_digest
-                    WHERE digest = {{digest:String}}
-                ) AS t
-                JOIN (
-                    SELECT project_id, digest, val_dump
-                    FROM (
-                            SELECT *,
-                                row_number() OVER (PARTITION BY project_id, digest) AS rn
-                            FROM table_rows
-                            WHERE project_id = {{project_id:String}}
-                        )
-                    WHERE rn = 1
-                    ORDER BY project_id, digest
-                ) tr ON t.project_id = tr.project_id AND t.row_digest = tr.digest
-                WHERE {predicate}
-            """
-        if parameters is None:
-            parameters = {}
-        if limit:
-            query += " LIMIT {limit: UInt64}"
-            parameters["limit"] = limit
-        if offset:
-            query += " OFFSET {offset: UInt64}"
-            parameters["offset"] = offset
 
+    def _table_row_digests(self, project_id: str, digest: str) -> typing.Sequence[str]:
+        """Returns the digests of the rows of a table, in order."""
+        cached = self._digest_cache.get_row_digests(project_id, digest)
+        if cached is not None:
+            return cached
+        table = self._read_table(project_id, digest)
+        if table is None:
+            return []
+        row_digests, chunk_digests = table
+        if chunk_digests:
+            row_digests = self._concat_table_chunks(project_id, chunk_digests)
+        return self._digest_cache.set_row_digests(project_id, digest, row_digests)
+
+    def _table_hasher(self, project_id: str, digest: str) -> "hashlib._Hash":
+        """Returns the hasher of a table's digest, to extend with appended
+        rows. If it is not held in this process, eg. the table was written by
+        another server, it is rebuilt from all of the table's rows.
+        """
+        hasher = self._digest_cache.get_table_hasher(project_id, digest)
+        if hasher is None:
+            hasher = table_digest_hasher(self._table_row_digests(project_id, digest))
+        return hasher
+
+    def _read_table(
+        self, project_id: str, digest: str
+    ) -> typing.Optional[typing.Tuple[typing.List[str], typing.List[str]]]:
+        """Returns the row digests and chunk digests of a table, or None if it
+        does not exist. Tables created before chunking have no chunks and
+        store their row digests directly; chunked tables store no row digests.
+        """
+        # Tables are deduplicated by digest, and a digest determines the rows,
+        # so any matching row will do.
         query_result = self.ch_client.query(
-            query,
-            parameters={
-                "project_id": project_id,
-                "digest": digest,
-                **parameters,
-            },
+            """
+            SELECT row_digests, chunk_digests
+            FROM tables
+            WHERE project_id = {project_id:String} AND digest = {digest:String}
+            LIMIT 1
+            """,
+            parameters={"project_id": project_id, "digest": digest},
         )
-
+        if not query_result.result_rows:
+            return None
+        row_digests, chunk_digests = query_result.result_rows[0]
+        return list(row_digests), list(chunk_digests)
+
+    def _concat_table_chunks(
+        self, project_id: str, chunk_digests: typing.List[str]
+    ) -> typing.List[str]:
+        chunks = self._table_chunks(project_id, chunk_digests)
         return [
-            tsi.TableRowSchema(digest=r[0], val=json.loads(r[1]))
-            for r in query_result.result_rows
+            row_digest
+            for chunk_digest in chunk_digests
+            for row_digest in chunks[chunk_digest]
         ]
 
+    def _table_chunks(
+        self, project_id: str, chunk_digests: typing.Iterable[str]
+    ) -> typing.Dict[str, typing.List[str]]:
+        """Returns the row digests of the table chunks with the given digests,
+        by digest, reading those that are not cached in batches.
+        """
+        chunks: typing.Dict[str, typing.List[str]] = {}
+        missing = []
+        for chunk_digest in dict.fromkeys(chunk_digests):
+            cached = self._digest_cache.get(
+                wf_digest_cache.TABLE_CHUNK, project_id, chunk_digest
+            )
+            if cached is None:
+                missing.append(chunk_digest)
+            else:
+                chunks[chunk_digest] = json.loads(cached)
+        for i in range(0, len(missing), TABLE_CHUNKS_READ_CHUNK_SIZE):
+            query_result = self.ch_client.query(
+                """
+                SELECT digest, any(row_digests)
+                FROM table_chunks
+                WHERE project_id = {project_id:String}
+                    AND digest IN {digests:Array(String)}
+                GROUP BY digest
+                """,
+                parameters={
+                    "project_id": project_id,
+                    "digests": missing[i : i + TABLE_CHUNKS_READ_CHUNK_SIZE],
+                },
+            )
+            for chunk_digest, row_digests in query_result.result_rows:
+                chunks[chunk_digest] = list(row_digests)
+                self._digest_cache.set(
+                    wf_digest_cache.TABLE_CHUNK,
+                    project_id,
+                    chunk_digest,
+                    json.dumps(chunks[chunk_digest]).encode(),
+                )
+        not_found = [d for d in missing if d not in chunks]
+        if not_found:
+            raise NotFoundError(f"Table chunks {project_id}:{not_found[:10]} not found")
+        return chunks
+
+    def _insert_table_rows(
+        self,
+        project_id: str,
+        rows: typing.Dict[str, typing.Tuple[typing.List[str], str]],
+    ) -> None:
+        """Inserts table rows, given as (refs, val_dump) by digest, skipping
+        those already stored in the project.
+        """
+        row_digests = list(rows)
+        stored: typing.Set[str] = set()
+        for i in range(0, len(row_digests), TABLE_ROWS_READ_CHUNK_SIZE):
+            query_result = self.ch_client.query(
+                """
+                SELECT DISTINCT digest
+                FROM table_rows
+                WHERE project_id = {project_id:String}
+                    AND digest IN {digests:Array(String)}
+                """,
+                parameters={
+                    "project_id": project_id,
+                    "digests": row_digests[i : i + TABLE_ROWS_READ_CHUNK_SIZE],
+                },
+            )
+            stored.update(r[0] for r in query_result.result_rows)
+        insert_rows = [
+            (project_id, row_digest, refs, val_dump)
+            for row_digest, (refs, val_dump) in rows.items()
+            if row_digest not in stored
+        ]
+        if insert_rows:
+            self._insert(
+                "table_rows",
+                data=insert_rows,
+                column_names=["project_id", "digest", "refs", "val_dump"],
+            )
+
+    def _insert_table_chunks(
+        self,
+        project_id: str,
+        chunks: typing.List[typing.List[str]],
+        known_chunk_digests: typing.Optional[typing.Set[str]] = None,
+    ) -> typing.List[str]:
+        """Inserts table chunks, skipping those in `known_chunk_digests`, and
+        returns their digests.
+        """
+        chunk_digests = [table_digest(chunk) for chunk in chunks]
+        insert_chunks = {
+            chunk_digest: chunk
+            for chunk_digest, chunk in zip(chunk_digests, chunks)
+            if not known_chunk_digests or chunk_digest not in known_chunk_digests
+        }
+        if insert_chunks:
+            self._insert(
+                "table_chunks",
+                data=[
+                    (project_id, chunk_digest, chunk)
+                    for chunk_digest, chunk in insert_chunks.items()
+                ],
+                column_names=["project_id", "digest", "row_digests"],
+            )
+        if chunks:
+            # The next append to this table reads its last chunk.
+            self._digest_cache.set(
+                wf_digest_cache.TABLE_CHUNK,
+                project_id,
+                chunk_digests[-1],
+                json.dumps(chunks[-1]).encode(),
+            )
+        return chunk_digests
+
+    def _insert_table(
+        self,
+        project_id: str,
+        hasher: "hashlib._Hash",
+        chunk_digests: typing.List[str],
+        row_digests: typing.Optional[typing.Sequence[str]] = None,
+    ) -> str:
+        """Inserts a table stored as `chunk_digests` and returns its digest,
+        from `hasher`, which has been updated with all of its row digests.
+        """
+        digest = hasher.hexdigest()
+        self._insert(
+            "tables",
+            data=[(project_id, digest, [], chunk_digests)],
+            column_names=["project_id", "digest", "row_digests", "chunk_digests"],
+        )
+        # The next update of this table extends its digest, and the next
+        # query reads its row digests.
+        self._digest_cache.set_table_hasher(project_id, digest, hasher)
+        if row_digests is not None:
+            self._digest_cache.set_row_digests(project_id, digest, row_digests)
+        return digest
+
+    def _table_row_vals(
+        self, project_id: str, row_digests: typing.Iterable[str]
+    ) -> typing.Dict[str, typing.Any]:
+        """Returns the values of the table rows with the given digests, by
+        digest, reading those that are not cached in chunks.
+        """
+        row_vals: typing.Dict[str, typing.Any] = {}
+        missing = []
+        for row_digest in dict.fromkeys(row_digests):
+            cached = self._digest_cache.get(
+                wf_digest_cache.TABLE_ROW_VAL, project_id, row_digest
+            )
+            if cached is None:
+                missing.append(row_digest)
+            else:
+                row_vals[row_digest] = json.loads(cached)
+        for i in range(0, len(missing), TABLE_ROWS_READ_CHUNK_SIZE):
+            # Table rows are deduplicated by digest, and a digest determines
+            # the value, so any matching row will do.
+            query_result = self.ch_client.query(
+                """
+                SELECT digest, any(val_dump)
+                FROM table_rows
+                WHERE project_id = {project_id:String}
+                    AND digest IN {digests:Array(String)}
+                GROUP BY digest
+                """,
+                parameters={
+                    "project_id": project_id,
+                    "digests": missing[i : i + TABLE_ROWS_READ_CHUNK_SIZE],
+                },
+            )
+            for row_digest, val_dump in query_result.result_rows:
+                self._digest_cache.set(
+                    wf_digest_cache.TABLE_ROW_VAL,
+                    project_id,
+                    row_digest,
+                    val_dump.encode(),
+                )
+                row_vals[row_digest] = json.loads(val_dump)
+        return row_vals
+
     def refs_read_batch(self, req: tsi.RefsReadBatchReq) -> tsi.RefsReadBatchRes:
-        # TODO: This reads one ref at a time, it should read them in batches
-        # where it can. Like it should group by object that we need to read.
-        # And it should also batch into table refs (like when we are reading a bunch
-        # of rows from a single Dataset)
-        if len(req.refs) > 1000:
+        # Refs are grouped by project, and within a project all root objects
+        # are read with one query, and all rows of a table with another (per
+        # level of nesting), chunked to bound the size of each query.
+        if len(req.refs) > MAX_REFS_READ_BATCH_SIZE:
             raise ValueError("Too many refs")
 
         # First, parse the refs
@@ -713,9 +930,9 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
             raise ValueError("Table refs not supported")
         parsed_refs = typing.cast(ObjRefListType, parsed_raw_refs)
 
-        # Next, group the refs by project_id
+        # Next, group the unique refs by project_id
         refs_by_project_id: dict[str, ObjRefListType] = defaultdict(list)
-        for ref in parsed_refs:
+        for ref in {ref.uri(): ref for ref in parsed_refs}.values():
             refs_by_project_id[ref.project_id].append(ref)
 
         # Lookup data for each project, scoped to each project
@@ -744,24 +961,12 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
         def make_root_ref_cache_key(ref: refs_internal.InternalObjectRef) -> str:
             return f"{ref.project_id}/{ref.name}/{ref.version}"
 
-        def make_obj_cache_key(obj: SelectableCHObjSchema) -> str:
-            return f"{obj.project_id}/{obj.object_id}/{obj.digest}"
-
         def get_object_refs_root_val(
             refs: list[refs_internal.InternalObjectRef],
         ) -> typing.Any:
-            conds = []
-            parameters = {}
-
-            for ref_index, ref in enumerate(refs):
+            for ref in refs:
                 if ref.version == "latest":
                     raise ValueError("Reading refs with `latest` is not supported")
-
-                cache_key = make_root_ref_cache_key(ref)
-
-                if cache_key in root_val_cache:
-                    continue
-
                 if ref.project_id != project_id_scope:
                     # At some point in the future, we may allow cross-project references.
                     # However, until then, we disallow this feature. Practically, we
@@ -770,23 +975,14 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
                     # Hitting this would be a programming error, not a user error.
                     raise ValueError("Will not resolve cross-project refs.")
 
-                object_id_param_key = "object_id_" + str(ref_index)
-                version_param_key = "version_" + str(ref_index)
-                conds.append(
-                    f"object_id = {{{object_id_param_key}: String}} AND digest = {{{version_param_key}: String}}"
-                )
-                parameters[object_id_param_key] = ref.name
-                parameters[version_param_key] = ref.version
-
-            if len(conds) > 0:
-                conditions = [combine_conditions(conds, "OR")]
-                objs = self._select_objs_query(
-                    project_id=project_id_scope,
-                    conditions=conditions,
-                    parameters=parameters,
-                )
-                for obj in objs:
-                    root_val_cache[make_obj_cache_key(obj)] = json.loads(obj.val_dump)
+            needed_versions = {
+                (ref.name, ref.version)
+                for ref in refs
+                if make_root_ref_cache_key(ref) not in root_val_cache
+            }
+            obj_vals = self._obj_vals(project_id_scope, needed_versions)
+            for (object_id, digest), val in obj_vals.items():
+                root_val_cache[f"{project_id_scope}/{object_id}/{digest}"] = val
 
             return [
                 root_val_cache.get(make_root_ref_cache_key(ref), None) for ref in refs
@@ -921,9 +1117,10 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
                     table_queries.setdefault(
                         (table_ref.project_id, table_ref.digest), []
                     ).append((i, row_digest))
-            # Make the queries
+            # Make the queries: one per table for its row digests (usually
+            # cached), then one for the rows of all tables
+            table_row_digests: list[str] = []
             for (project_id, digest), index_digests in table_queries.items():
-                row_digests = [d for i, d in index_digests]
                 if project_id != project_id_scope:
                     # At some point in the future, we may allow cross-project references.
                     # However, until then, we disallow this feature. Practically, we
@@ -931,14 +1128,16 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
                     # handles this check. However, out of caution, we add this check here.
                     # Hitting this would be a programming error, not a user error.
                     raise ValueError("Will not resolve cross-project refs.")
-                rows = self._table_query(
-                    project_id=project_id_scope,
-                    digest=digest,
-                    conditions=["digest IN {digests: Array(String)}"],
-                    parameters={"digests": row_digests},
+                # Only resolve rows that are actually in the table
+                digests_in_table = set(
+                    self._table_row_digests(project_id_scope, digest)
+                )
+                table_row_digests.extend(
+                    d for _, d in index_digests if d in digests_in_table
                 )
-                # Unpack the results into the target rows
-                row_digest_vals = {r.digest: r.val for r in rows}
+            row_digest_vals = self._table_row_vals(project_id_scope, table_row_digests)
+            # Unpack the results into the target rows
+            for index_digests in table_queries.values():
                 for index, row_digest in index_digests:
                     extra_results[index] = PartialRefResult(
                         remaining_extra=extra_results[index].remaining_extra[2:],
@@ -956,25 +1155,88 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
 
         return [r.val for r in extra_results]
 
+    def _obj_vals(
+        self,
+        project_id: str,
+        versions: typing.Iterable[typing.Tuple[str, str]],
+    ) -> typing.Dict[typing.Tuple[str, str], typing.Any]:
+        """Returns the values of the given (object_id, digest) object versions
+        that exist, reading those that are not cached in chunks.
+        """
+        obj_vals: typing.Dict[typing.Tuple[str, str], typing.Any] = {}
+        missing = []
+        for object_id, digest in versions:
+            cached = self._digest_cache.get(
+                wf_digest_cache.OBJ_VAL,
+                project_id,
+                _obj_val_cache_key(object_id, digest),
+            )
+            if cached is None:
+                missing.append((object_id, digest))
+            else:
+                obj_vals[(object_id, digest)] = json.loads(cached)
+        for i in range(0, len(missing), OBJS_READ_CHUNK_SIZE):
+            chunk = missing[i : i + OBJS_READ_CHUNK_SIZE]
+            # Object versions are deduplicated by digest, and a digest
+            # determines the value, so any matching row will do. Unlike
+            # _select_objs_query, this does not need to number versions.
+            query_result = self.ch_client.query(
+                """
+                SELECT object_id, digest, any(val_dump)
+                FROM object_versions
+                WHERE project_id = {project_id:String}
+                    AND object_id IN {object_ids:Array(String)}
+                    AND digest IN {digests:Array(String)}
+                GROUP BY object_id, digest
+                """,
+                parameters={
+                    "project_id": project_id,
+                    "object_ids": list({object_id for object_id, _ in chunk}),
+                    "digests": list({digest for _, digest in chunk}),
+                },
+            )
+            wanted = set(chunk)
+            for object_id, digest, val_dump in query_result.result_rows:
+                # The IN filters can match object_id/digest combinations
+                # that were not asked for.
+                if (object_id, digest) not in wanted:
+                    continue
+                self._digest_cache.set(
+                    wf_digest_cache.OBJ_VAL,
+                    project_id,
+                    _obj_val_cache_key(object_id, digest),
+                    val_dump.encode(),
+                )
+                obj_vals[(object_id, digest)] = json.loads(val_dump)
+        return obj_vals
+
     def file_create(self, req: tsi.FileCreateReq) -> tsi.FileCreateRes:
-        digest = bytes_digest(req.content)
-        chunks = [
-            req.content[i : i + FILE_CHUNK_SIZE]
-            for i in range(0, len(req.content), FILE_CHUNK_SIZE)
-        ]
+        res = self.files_create(
+            tsi.FilesCreateReq(
+                project_id=req.project_id,
+                files=[tsi.FilesCreateItem(name=req.name, content=req.content)],
+            )
+        )
+        return tsi.FileCreateRes(digest=res.digests[0])
+
+    def files_create(self, req: tsi.FilesCreateReq) -> tsi.FilesCreateRes:
+        digests: typing.List[str] = []
+        rows: typing.List[typing.Tuple[typing.Any, ...]] = []
+        for f in req.files:
+            digest = bytes_digest(f.content)
+            digests.append(digest)
+            chunks = [
+                f.content[i : i + FILE_CHUNK_SIZE]
+                for i in range(0, len(f.content), FILE_CHUNK_SIZE)
+            ]
+            rows.extend(
+                (req.project_id, digest, i, len(chunks), f.name, chunk)
+                for i, chunk in enumerate(chunks)
+            )
+        # All chunks of all files go in as a single insert
         self._insert(
             "files",
-            data=[
-                (
-                    req.project_id,
-                    digest,
-                    i,
-                    len(chunks),
-                    req.name,
-                    chunk,
-                )
-                for i, chunk in enumerate(chunks)
-            ],
+            data=rows,
             column_names=[
                 "project_id",
                 "digest",
@@ -984,9 +1246,14 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
                 "val_bytes",
             ],
         )
-        return tsi.FileCreateRes(digest=digest)
+        return tsi.FilesCreateRes(digests=digests)
 
     def file_content_read(self, req: tsi.FileContentReadReq) -> tsi.FileContentReadRes:
+        cached = self._digest_cache.get(
+            wf_digest_cache.FILE_CONTENT, req.project_id, req.digest
+        )
+        if cached is not None:
+            return tsi.FileContentReadRes(content=cached)
         # The subquery is responsible for deduplication of file chunks by digest
         query_result = self.ch_client.query(
             """
@@ -1010,7 +1277,11 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
         chunks = [r[1] for r in query_result.result_rows]
         if len(chunks) != n_chunks:
             raise ValueError("Missing chunks")
-        return tsi.FileContentReadRes(content=b"".join(chunks))
+        content = b"".join(chunks)
+        self._digest_cache.set(
+            wf_digest_cache.FILE_CONTENT, req.project_id, req.digest, content
+        )
+        return tsi.FileContentReadRes(content=content)
 
     def feedback_create(self, req: tsi.FeedbackCreateReq) -> tsi.FeedbackCreateRes:
         assert_non_null_wb_user_id(req)
@@ -1125,10 +1396,16 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
         conditions: typing.Optional[typing.List[str]] = None,
         limit: typing.Optional[int] = None,
         parameters: typing.Optional[typing.Dict[str, typing.Any]] = None,
+        include_val_dump: bool = True,
     ) -> typing.List[SelectableCHObjSchema]:
+        """Selects object versions. If `include_val_dump` is False, the
+        (potentially large) values are not read and `val_dump` is empty.
+        """
         if not conditions:
             conditions = ["1 = 1"]
 
+        val_dump_part = "val_dump" if include_val_dump else "'' AS val_dump"
+
         conditions_part = combine_conditions(conditions, "AND")
 
         limit_part = ""
@@ -1147,7 +1424,7 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
                 kind,
                 base_object_class,
                 refs,
-                val_dump,
+                {val_dump_part},
                 digest,
                 is_op,
                 _version_index_plus_1,
@@ -1416,6 +1693,12 @@ def _ch_call_dict_to_call_schema_dict(ch_call_dict: typing.Dict) -> typing.Dict:
     )
 
 
+def _obj_val_cache_key(object_id: str, digest: str) -> str:
+    # Objects with the same value share a digest, so the cache key includes the
+    # object id: a hit must also mean the object version exists.
+    return f"{object_id}:{digest}"
+
+
 def _ch_obj_to_obj_schema(ch_obj: SelectableCHObjSchema) -> tsi.ObjSchema:
     return tsi.ObjSchema(
         project_id=ch_obj.project_id,
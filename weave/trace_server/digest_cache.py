@@ -0,0 +1,225 @@
+"""Process-wide cache for content-addressed trace server data.
+
+Object values, table row values, a table's list of row digests (and the
+chunks it is stored in) and file contents are all addressed by the digest of
+their content, so once read they never change. `DigestCache` caches their serialized form keyed by
+(kind, project_id, digest), so that servers can skip the database for
+repeated reads of the same dataset rows and objects.
+
+Values are stored as bytes in a `DigestCacheBackend`. The default backend is
+an in-process, byte-bounded LRU; a backend shared between server processes
+(eg. memcached or redis) can be plugged in by implementing the protocol.
+
+Row digest lists are also kept decoded in process, since a paged table query
+reads the same (possibly very long) list once per page. So is the sha256 state
+each table's digest was computed from, which can't be serialized, so that
+appending to a table only hashes the appended rows.
+"""
+
+import dataclasses
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Protocol, Sequence, Tuple
+
+from . import environment as wf_env
+
+# Kinds of cached data
+OBJ_VAL = "obj_val"  # Keyed by "object_id:digest" rather than digest alone
+TABLE_ROW_DIGESTS = "table_row_digests"
+TABLE_HASHER = "table_hasher"  # Only held in process
+TABLE_CHUNK = "table_chunk"
+TABLE_ROW_VAL = "table_row_val"
+FILE_CONTENT = "file_content"
+
+# Total number of row digests kept decoded, across all tables.
+DECODED_ROW_DIGESTS_MAX_COUNT = 1_000_000
+
+# Number of tables whose digest hasher is kept.
+TABLE_HASHERS_MAX_COUNT = 10_000
+
+
+class DigestCacheBackend(Protocol):
+    def get(self, key: str) -> Optional[bytes]: ...
+    def set(self, key: str, val: bytes) -> None: ...
+
+
+class LRUDigestCacheBackend:
+    """In-process LRU backend bounded by the total size of its values."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._vals: OrderedDict[str, bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            val = self._vals.get(key)
+            if val is not None:
+                self._vals.move_to_end(key)
+            return val
+
+    def set(self, key: str, val: bytes) -> None:
+        # Values larger than the whole cache would only evict everything else.
+        if len(val) > self.max_bytes:
+            return
+        with self._lock:
+            if (old := self._vals.pop(key, None)) is not None:
+                self._size -= len(old)
+            self._vals[key] = val
+            self._size += len(val)
+            while self._size > self.max_bytes:
+                _, evicted = self._vals.popitem(last=False)
+                self._size -= len(evicted)
+
+
+@dataclasses.dataclass
+class DigestCacheStats:
+    """Hit and miss counts by kind of data."""
+
+    hits: Dict[str, int] = dataclasses.field(default_factory=dict)
+    misses: Dict[str, int] = dataclasses.field(default_factory=dict)
+
+    def hit_rate(self, kind: str) -> float:
+        hits = self.hits.get(kind, 0)
+        total = hits + self.misses.get(kind, 0)
+        return hits / total if total else 0.0
+
+
+class DigestCache:
+    def __init__(self, backend: Optional[DigestCacheBackend]) -> None:
+        """
+        Args:
+            backend: Where values are stored. If None, nothing is cached but
+                misses are still counted.
+        """
+        self.backend = backend
+        self.stats = DigestCacheStats()
+        self._stats_lock = threading.Lock()
+        self._decoded_row_digests: OrderedDict[str, Tuple[str, ...]] = OrderedDict()
+        self._decoded_row_digests_count = 0
+        self._table_hashers: OrderedDict[str, "hashlib._Hash"] = OrderedDict()
+        self._decoded_lock = threading.Lock()
+
+    def get(self, kind: str, project_id: str, digest: str) -> Optional[bytes]:
+        val = None
+        if self.backend is not None:
+            val = self.backend.get(_make_key(kind, project_id, digest))
+        counts = self.stats.misses if val is None else self.stats.hits
+        with self._stats_lock:
+            counts[kind] = counts.get(kind, 0) + 1
+        return val
+
+    def set(self, kind: str, project_id: str, digest: str, val: bytes) -> None:
+        if self.backend is not None:
+            self.backend.set(_make_key(kind, project_id, digest), val)
+
+    def get_row_digests(
+        self, project_id: str, digest: str
+    ) -> Optional[Tuple[str, ...]]:
+        """Returns the row digests of a table, decoding them from the backend
+        only if they are not already held decoded.
+        """
+        key = _make_key(TABLE_ROW_DIGESTS, project_id, digest)
+        with self._decoded_lock:
+            row_digests = self._decoded_row_digests.get(key)
+            if row_digests is not None:
+                self._decoded_row_digests.move_to_end(key)
+        if row_digests is not None:
+            with self._stats_lock:
+                hits = self.stats.hits
+                hits[TABLE_ROW_DIGESTS] = hits.get(TABLE_ROW_DIGESTS, 0) + 1
+            return row_digests
+        val = self.get(TABLE_ROW_DIGESTS, project_id, digest)
+        if val is None:
+            return None
+        row_digests = tuple(json.loads(val))
+        self._set_decoded_row_digests(key, row_digests)
+        return row_digests
+
+    def set_row_digests(
+        self, project_id: str, digest: str, row_digests: Sequence[str]
+    ) -> Tuple[str, ...]:
+        """Caches the row digests of a table and returns them as a tuple."""
+        row_digests = tuple(row_digests)
+        if self.backend is not None:
+            self.set(
+                TABLE_ROW_DIGESTS,
+                project_id,
+                digest,
+                json.dumps(row_digests).encode(),
+            )
+            self._set_decoded_row_digests(
+                _make_key(TABLE_ROW_DIGESTS, project_id, digest), row_digests
+            )
+        return row_digests
+
+    def _set_decoded_row_digests(self, key: str, row_digests: Tuple[str, ...]) -> None:
+        if len(row_digests) > DECODED_ROW_DIGESTS_MAX_COUNT:
+            return
+        with self._decoded_lock:
+            if (old := self._decoded_row_digests.pop(key, None)) is not None:
+                self._decoded_row_digests_count -= len(old)
+            self._decoded_row_digests[key] = row_digests
+            self._decoded_row_digests_count += len(row_digests)
+            while self._decoded_row_digests_count > DECODED_ROW_DIGESTS_MAX_COUNT:
+                _, evicted = self._decoded_row_digests.popitem(last=False)
+                self._decoded_row_digests_count -= len(evicted)
+
+    def get_table_hasher(
+        self, project_id: str, digest: str
+    ) -> Optional["hashlib._Hash"]:
+        """Returns a copy of the hasher a table's digest was computed from, to
+        be updated with appended rows, or None if it is not held.
+        """
+        key = _make_key(TABLE_HASHER, project_id, digest)
+        with self._decoded_lock:
+            hasher = self._table_hashers.get(key)
+            if hasher is not None:
+                self._table_hashers.move_to_end(key)
+                hasher = hasher.copy()
+        counts = self.stats.misses if hasher is None else self.stats.hits
+        with self._stats_lock:
+            counts[TABLE_HASHER] = counts.get(TABLE_HASHER, 0) + 1
+        return hasher
+
+    def set_table_hasher(
+        self, project_id: str, digest: str, hasher: "hashlib._Hash"
+    ) -> None:
+        """Holds the hasher a table's digest was computed from. The caller
+        must not update it afterwards."""
+        if self.backend is None:
+            return
+        key = _make_key(TABLE_HASHER, project_id, digest)
+        with self._decoded_lock:
+            self._table_hashers[key] = hasher
+            self._table_hashers.move_to_end(key)
+            while len(self._table_hashers) > TABLE_HASHERS_MAX_COUNT:
+                self._table_hashers.popitem(last=False)
+
+
+def _make_key(kind: str, project_id: str, digest: str) -> str:
+    return f"{kind}/{project_id}/{digest}"
+
+
+_default_digest_cache: Optional[DigestCache] = None
+_default_digest_cache_lock = threading.Lock()
+
+
+def get_default_digest_cache() -> DigestCache:
+    """Returns the cache shared by all servers in this process, sized by
+    `WF_TRACE_SERVER_DIGEST_CACHE_BYTES`.
+    """
+    global _default_digest_cache
+    with _default_digest_cache_lock:
+        if _default_digest_cache is None:
+            max_bytes = wf_env.wf_trace_server_digest_cache_bytes()
+            backend = LRUDigestCacheBackend(max_bytes) if max_bytes > 0 else None
+            _default_digest_cache = DigestCache(backend)
+        return _default_digest_cache
@@ -24,3 +24,10 @@ def wf_clickhouse_pass() -> str:
 def wf_clickhouse_database() -> str:
     """The name of the clickhouse database."""
     return os.environ.get("WF_CLICKHOUSE_DATABASE", "default")
+
+
+def wf_trace_server_digest_cache_bytes() -> int:
+    """The size of the process-wide cache of objects, table rows and files
+    read by digest. 0 disables the cache.
+    """
+    return int(os.environ.get("WF_TRACE_SERVER_DIGEST_CACHE_BYTES", 256 * 1024 * 1024))
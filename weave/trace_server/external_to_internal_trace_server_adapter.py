@@ -277,6 +277,11 @@ class ExternalTraceServer(tsi.TraceServerInterface):
         # Special case where refs can never be part of the request
         return self._internal_trace_server.file_create(req)
 
+    def files_create(self, req: tsi.FilesCreateReq) -> tsi.FilesCreateRes:
+        req.project_id = self._idc.ext_to_int_project_id(req.project_id)
+        # Special case where refs can never be part of the request
+        return self._internal_trace_server.files_create(req)
+
     def file_content_read(self, req: tsi.FileContentReadReq) -> tsi.FileContentReadRes:
         req.project_id = self._idc.ext_to_int_project_id(req.project_id)
         # Special case where refs can never be part of the request
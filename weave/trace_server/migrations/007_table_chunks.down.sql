@@ -0,0 +1,56 @@
+/*
+    Backfill row_digests of chunked tables from their chunks
+    Remove chunk_digests column from tables
+    Remove table_chunks
+
+    Tables written after the up migration store their rows only in chunks, so
+    their row_digests are rebuilt, in chunk order, before the chunks are
+    dropped. The backfilled rows replace the chunked ones. If any table has a
+    missing chunk, the migration stops before dropping anything.
+*/
+
+INSERT INTO tables (project_id, digest, row_digests, chunk_digests)
+SELECT
+    t.project_id,
+    t.digest,
+    arrayFlatten(
+        arrayMap(
+            x -> x.2,
+            arraySort(x -> x.1, groupArray((t.chunk_index, c.row_digests)))
+        )
+    ),
+    []
+FROM (
+    SELECT project_id, digest, chunk_digest, chunk_index, n_chunks
+    FROM (
+        SELECT DISTINCT
+            project_id, digest, chunk_digests, length(chunk_digests) AS n_chunks
+        FROM tables
+        WHERE notEmpty(chunk_digests)
+    )
+    ARRAY JOIN
+        chunk_digests AS chunk_digest,
+        arrayEnumerate(chunk_digests) AS chunk_index
+) AS t
+INNER JOIN (
+    SELECT project_id, digest, any(row_digests) AS row_digests
+    FROM table_chunks
+    GROUP BY project_id, digest
+) AS c ON t.project_id = c.project_id AND t.chunk_digest = c.digest
+GROUP BY t.project_id, t.digest
+HAVING count() = any(t.n_chunks);
+
+ALTER TABLE tables DELETE
+WHERE notEmpty(chunk_digests)
+    AND (project_id, digest) IN (
+        SELECT project_id, digest FROM tables WHERE empty(chunk_digests)
+    )
+SETTINGS mutations_sync = 1;
+
+SELECT throwIf(count() > 0, 'Some tables have missing chunks and cannot be backfilled')
+FROM tables
+WHERE notEmpty(chunk_digests);
+
+ALTER TABLE tables DROP COLUMN chunk_digests;
+
+DROP TABLE table_chunks;
@@ -0,0 +1,19 @@
+/*
+    Add table_chunks, holding contiguous runs of a table's row digests
+    Add chunk_digests column to tables
+
+    Tables written with chunk_digests leave row_digests empty; their rows are
+    the concatenation of their chunks. Versions of a table share chunks, so
+    appending rows only writes the chunks that changed.
+*/
+
+CREATE TABLE table_chunks (
+    project_id String,
+    digest String,
+    row_digests Array(String),
+    created_at DateTime64(3) DEFAULT now64(3)
+) ENGINE = ReplacingMergeTree()
+ORDER BY (project_id, digest);
+
+ALTER TABLE tables
+    ADD COLUMN chunk_digests Array(String) DEFAULT [];
@@ -2,11 +2,17 @@ import io
 import json
 import logging
 import typing as t
+from concurrent.futures import ThreadPoolExecutor
 
 import tenacity
 from pydantic import BaseModel, ValidationError
 
-from weave.environment import weave_trace_server_url
+from weave.environment import (
+    weave_trace_server_batch_workers,
+    weave_trace_server_pool_size,
+    weave_trace_server_request_compression,
+    weave_trace_server_url,
+)
 from weave.legacy.wandb_interface import project_creator
 
 from . import requests
@@ -38,6 +44,19 @@ REMOTE_REQUEST_BYTES_LIMIT = (
     (32 - 1) * 1024 * 1024
 )  # 32 MiB (real limit) - 1 MiB (buffer)
 
+# Connections kept alive per host. Batch senders, background loggers and user
+# threads all share the pool.
+REMOTE_REQUEST_POOL_MAXSIZE = 32
+
+# Bodies smaller than this are not worth compressing.
+REMOTE_REQUEST_COMPRESSION_MIN_BYTES = 1024
+
+REMOTE_BATCH_MAX_ITEMS = 1000
+REMOTE_BATCH_MAX_AGE = 1.0  # seconds
+
+# Files uploaded in parallel by `files_create`.
+REMOTE_FILE_UPLOAD_CONCURRENCY = 8
+
 REMOTE_REQUEST_RETRY_DURATION = 60 * 60 * 36  # 36 hours
 REMOTE_REQUEST_RETRY_MAX_INTERVAL = 60 * 5  # 5 minutes
 
@@ -99,14 +118,34 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
         should_batch: bool = False,
         *,
         remote_request_bytes_limit: int = REMOTE_REQUEST_BYTES_LIMIT,
+        pool_maxsize: int = REMOTE_REQUEST_POOL_MAXSIZE,
+        request_compression: t.Optional[str] = None,
     ):
         super().__init__()
         self.trace_server_url = trace_server_url
         self.should_batch = should_batch
-        if self.should_batch:
-            self.call_processor = AsyncBatchProcessor(self._flush_calls)
         self._auth: t.Optional[t.Tuple[str, str]] = None
         self.remote_request_bytes_limit = remote_request_bytes_limit
+        self._session_pool = requests.SessionPool(pool_maxsize)
+        if (
+            request_compression is not None
+            and request_compression not in requests.REQUEST_ENCODINGS
+        ):
+            raise ValueError(
+                f"Unsupported request compression: {request_compression}, expected one of {requests.REQUEST_ENCODINGS}"
+            )
+        self.request_compression = request_compression
+        if self.should_batch:
+            # Items are queued already encoded, so batches can be cut to the
+            # request size limit without re-serializing them.
+            self.call_processor = AsyncBatchProcessor(
+                self._flush_calls,
+                max_batch_size=REMOTE_BATCH_MAX_ITEMS,
+                max_batch_age=REMOTE_BATCH_MAX_AGE,
+                max_batch_bytes=self.remote_request_bytes_limit,
+                size_fn=len,
+                num_workers=weave_trace_server_batch_workers(),
+            )
 
     def ensure_project_exists(
         self, entity: str, project: str
@@ -119,11 +158,40 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
 
     @classmethod
     def from_env(cls, should_batch: bool = False) -> "RemoteHTTPTraceServer":
-        return cls(weave_trace_server_url(), should_batch)
+        return cls(
+            weave_trace_server_url(),
+            should_batch,
+            pool_maxsize=weave_trace_server_pool_size(),
+            request_compression=weave_trace_server_request_compression(),
+        )
 
     def set_auth(self, auth: t.Tuple[str, str]) -> None:
         self._auth = auth
 
+    def _post(self, url: str, data: bytes, **kwargs: t.Any) -> requests.Response:
+        """POSTs `data` over a pooled connection, compressing large bodies.
+
+        If the server answers a compressed request with 415 Unsupported Media
+        Type, compression is turned off for this client and the request is
+        resent uncompressed.
+        """
+        session = self._session_pool.get()
+        encoding = self.request_compression
+        if encoding is not None and len(data) >= REMOTE_REQUEST_COMPRESSION_MIN_BYTES:
+            r = requests.post(
+                url,
+                data=requests.compress(data, encoding),
+                headers={"Content-Encoding": encoding},
+                auth=self._auth,
+                session=session,
+                **kwargs,
+            )
+            if r.status_code != 415:
+                return r
+            logger.info(f"Server does not accept {encoding} request bodies")
+            self.request_compression = None
+        return requests.post(url, data=data, auth=self._auth, session=session, **kwargs)
+
     @tenacity.retry(
         stop=tenacity.stop_after_delay(REMOTE_REQUEST_RETRY_DURATION),
         wait=tenacity.wait_exponential_jitter(
@@ -134,39 +202,16 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
         retry_error_callback=_log_failure,
         reraise=True,
     )
-    def _flush_calls(
-        self,
-        batch: t.List,
-        *,
-        _should_update_batch_size: bool = True,
-    ) -> None:
+    def _flush_calls(self, batch: t.List[bytes]) -> None:
+        """Sends a batch of JSON-encoded `StartBatchItem`/`EndBatchItem`s."""
         if len(batch) == 0:
             return
 
-        data = Batch(batch=batch).model_dump_json()
-        encoded_data = data.encode("utf-8")
-        encoded_bytes = len(encoded_data)
-
-        # Update target batch size (this allows us to have a dynamic batch size based on the size of the data being sent)
-        estimated_bytes_per_item = encoded_bytes / len(batch)
-        if _should_update_batch_size and estimated_bytes_per_item > 0:
-            target_batch_size = int(
-                self.remote_request_bytes_limit // estimated_bytes_per_item
-            )
-            self.call_processor.max_batch_size = max(1, target_batch_size)
-
-        # If the batch is too big, recursively split it in half
-        if encoded_bytes > self.remote_request_bytes_limit and len(batch) > 1:
-            split_idx = int(len(batch) // 2)
-            self._flush_calls(batch[:split_idx], _should_update_batch_size=False)
-            self._flush_calls(batch[split_idx:], _should_update_batch_size=False)
-            return
+        # Equivalent to `Batch(batch=items).model_dump_json()`, reusing the
+        # encoding done at enqueue time.
+        encoded_data = b'{"batch":[' + b",".join(batch) + b"]}"
 
-        r = requests.post(
-            self.trace_server_url + "/call/upsert_batch",
-            data=encoded_data,
-            auth=self._auth,
-        )
+        r = self._post(self.trace_server_url + "/call/upsert_batch", encoded_data)
         r.raise_for_status()
 
     @tenacity.retry(
@@ -185,14 +230,13 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
         req: BaseModel,
         stream: bool = False,
     ) -> requests.Response:
-        r = requests.post(
+        r = self._post(
             self.trace_server_url + url,
             # `by_alias` is required since we have Mongo-style properties in the
             # query models that are aliased to conform to start with `$`. Without
             # this, the model_dump will use the internal property names which are
             # not valid for the `model_validate` step.
-            data=req.model_dump_json(by_alias=True).encode("utf-8"),
-            auth=self._auth,
+            req.model_dump_json(by_alias=True).encode("utf-8"),
             stream=stream,
         )
         if r.status_code == 500:
@@ -231,9 +275,12 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
         if isinstance(req, dict):
             req = req_model.model_validate(req)
         r = self._generic_request_executor(url, req, stream=True)
-        for line in r.iter_lines():
+        # `chunk_size=None` yields each chunk as it arrives (decompressing it
+        # incrementally if the response is compressed) instead of waiting to
+        # fill fixed-size reads.
+        for line in r.iter_lines(chunk_size=None):
             if line:
-                yield res_model.model_validate(json.loads(line))
+                yield res_model.model_validate_json(line)
 
     @tenacity.retry(
         stop=tenacity.stop_after_delay(REMOTE_REQUEST_RETRY_DURATION),
@@ -246,7 +293,9 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
         reraise=True,
     )
     def server_info(self) -> ServerInfoRes:
-        r = requests.get(self.trace_server_url + "/server_info")
+        r = requests.get(
+            self.trace_server_url + "/server_info", session=self._session_pool.get()
+        )
         r.raise_for_status()
         return ServerInfoRes.model_validate(r.json())
 
@@ -264,7 +313,9 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
                 raise ValueError(
                     "CallStartReq must have id and trace_id when batching."
                 )
-            self.call_processor.enqueue([StartBatchItem(req=req_as_obj)])
+            self.call_processor.enqueue(
+                [StartBatchItem(req=req_as_obj).model_dump_json().encode("utf-8")]
+            )
             return tsi.CallStartRes(
                 id=req_as_obj.start.id, trace_id=req_as_obj.start.trace_id
             )
@@ -281,7 +332,9 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
                 req_as_obj = tsi.CallEndReq.model_validate(req)
             else:
                 req_as_obj = req
-            self.call_processor.enqueue([EndBatchItem(req=req_as_obj)])
+            self.call_processor.enqueue(
+                [EndBatchItem(req=req_as_obj).model_dump_json().encode("utf-8")]
+            )
             return tsi.CallEndRes()
         return self._generic_request("/call/end", req, tsi.CallEndReq, tsi.CallEndRes)
 
@@ -429,7 +482,7 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
             return tsi.TableUpdateRes(digest=second_half_res.digest)
         else:
             return self._generic_request(
-                "/table/update", req, tsi.TableCreateReq, tsi.TableCreateRes
+                "/table/update", req, tsi.TableUpdateReq, tsi.TableUpdateRes
             )
 
     def table_query(
@@ -462,10 +515,35 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
             auth=self._auth,
             data={"project_id": req.project_id},
             files={"file": (req.name, req.content)},
+            session=self._session_pool.get(),
         )
         r.raise_for_status()
         return tsi.FileCreateRes.model_validate(r.json())
 
+    def files_create(self, req: tsi.FilesCreateReq) -> tsi.FilesCreateRes:
+        """Uploads files with concurrent `file_create` requests.
+
+        The server has no batch upload endpoint, so each file is still its own
+        request, but they share the session pool instead of going one by one.
+        """
+        if len(req.files) <= 1:
+            return tsi.FilesCreateRes(
+                digests=[self._file_create_item(req.project_id, f) for f in req.files]
+            )
+        max_workers = min(len(req.files), REMOTE_FILE_UPLOAD_CONCURRENCY)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            digests = list(
+                executor.map(
+                    lambda f: self._file_create_item(req.project_id, f), req.files
+                )
+            )
+        return tsi.FilesCreateRes(digests=digests)
+
+    def _file_create_item(self, project_id: str, f: tsi.FilesCreateItem) -> str:
+        return self.file_create(
+            tsi.FileCreateReq(project_id=project_id, name=f.name, content=f.content)
+        ).digest
+
     @tenacity.retry(
         stop=tenacity.stop_after_delay(REMOTE_REQUEST_RETRY_DURATION),
         wait=tenacity.wait_exponential_jitter(
@@ -481,6 +559,7 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
             self.trace_server_url + "/files/content",
             json={"project_id": req.project_id, "digest": req.digest},
             auth=self._auth,
+            session=self._session_pool.get(),
         )
         r.raise_for_status()
         # TODO: Should stream to disk rather than to memory
@@ -1,9 +1,11 @@
 """Helpers for printing HTTP requests and responses."""
 
 import datetime
+import gzip
 import json
 import os
 import threading
+import types
 from time import time
 from typing import Any, Dict, Optional, Union
 
@@ -13,6 +15,14 @@ from requests.adapters import HTTPAdapter
 from rich.console import Console
 from rich.syntax import Syntax
 from rich.text import Text
+from urllib3.util import make_headers
+
+# Optional, only needed to compress requests with zstd.
+zstandard: Optional[types.ModuleType]
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 console = Console()
 
@@ -147,23 +157,81 @@ class LoggingHTTPAdapter(HTTPAdapter):
         return response
 
 
-session = Session()
-if os.environ.get("WEAVE_DEBUG_HTTP") == "1":
-    adapter = LoggingHTTPAdapter()
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
+# Advertise every response encoding urllib3 can decode here (eg. zstd when
+# zstandard is installed), rather than requests' default of gzip/deflate.
+ACCEPT_ENCODING = make_headers(accept_encoding=True)["accept-encoding"]
+
+DEFAULT_POOL_MAXSIZE = 10
+
+
+def make_adapter(pool_maxsize: int = DEFAULT_POOL_MAXSIZE) -> HTTPAdapter:
+    """Make an adapter holding up to `pool_maxsize` keep-alive connections per host."""
+    adapter_cls = HTTPAdapter
+    if os.environ.get("WEAVE_DEBUG_HTTP") == "1":
+        adapter_cls = LoggingHTTPAdapter
+    return adapter_cls(pool_maxsize=pool_maxsize)
+
+
+class SessionPool:
+    """Hands out a `Session` per thread, all sharing one connection pool.
+
+    `Session` objects are not guaranteed to be thread-safe, but the connection
+    pool inside an adapter is, so each thread gets its own session mounted on a
+    shared adapter.
+    """
+
+    def __init__(self, pool_maxsize: int = DEFAULT_POOL_MAXSIZE) -> None:
+        self.adapter = make_adapter(pool_maxsize)
+        self._local = threading.local()
+
+    def get(self) -> Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = Session()
+            session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+            session.mount("http://", self.adapter)
+            session.mount("https://", self.adapter)
+            self._local.session = session
+        return session
 
 
-def get(url: str, params: Optional[Dict[str, str]] = None, **kwargs: Any) -> Response:
+_default_session_pool = SessionPool()
+
+
+REQUEST_ENCODINGS = ("gzip", "zstd")
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress a request body with a `Content-Encoding` from REQUEST_ENCODINGS."""
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        return zstandard.ZstdCompressor().compress(data)
+    raise ValueError(f"Unsupported request encoding: {encoding}")
+
+
+def get(
+    url: str,
+    params: Optional[Dict[str, str]] = None,
+    *,
+    session: Optional[Session] = None,
+    **kwargs: Any,
+) -> Response:
     """Send a GET request with optional logging."""
+    session = session or _default_session_pool.get()
     return session.get(url, params=params, **kwargs)
 
 
 def post(
     url: str,
-    data: Optional[Union[Dict[str, Any], str]] = None,
+    data: Optional[Union[Dict[str, Any], str, bytes]] = None,
     json: Optional[Dict[str, Any]] = None,
+    *,
+    session: Optional[Session] = None,
     **kwargs: Any,
 ) -> Response:
     """Send a POST request with optional logging."""
+    session = session or _default_session_pool.get()
     return session.post(url, data=data, json=json, **kwargs)
@@ -1,12 +1,11 @@
 # Sqlite Trace Server
 
-import contextvars
 import datetime
-import hashlib
 import json
+import logging
 import sqlite3
 import threading
-from typing import Any, Iterator, Optional, cast
+from typing import Any, Callable, Iterator, Optional, cast
 from zoneinfo import ZoneInfo
 
 import emoji
@@ -18,7 +17,7 @@ from weave.trace_server.feedback import (
     validate_feedback_create_req,
     validate_feedback_purge_req,
 )
-from weave.trace_server.orm import Row, quote_json_path
+from weave.trace_server.orm import ParamBuilder, Row, quote_json_path
 from weave.trace_server.refs_internal import (
     DICT_KEY_EDGE_NAME,
     LIST_INDEX_EDGE_NAME,
@@ -39,43 +38,121 @@ from .interface import query as tsi_query
 from .trace_server_interface_util import (
     assert_non_null_wb_user_id,
     bytes_digest,
+    calls_cursor_sort_order,
+    decode_calls_cursor,
+    encode_calls_cursor,
     extract_refs_from_values,
     str_digest,
+    table_digest,
 )
 
+logger = logging.getLogger(__name__)
+
 MAX_FLUSH_COUNT = 10000
 MAX_FLUSH_AGE = 15
 
+# Columns of the calls table, and those of them holding JSON
+CALLS_COLUMNS = (
+    "project_id",
+    "id",
+    "trace_id",
+    "parent_id",
+    "op_name",
+    "started_at",
+    "ended_at",
+    "exception",
+    "attributes",
+    "inputs",
+    "input_refs",
+    "output",
+    "output_refs",
+    "summary",
+    "wb_user_id",
+    "wb_run_id",
+    "deleted_at",
+    "display_name",
+)
+CALLS_JSON_COLUMNS = ("attributes", "summary", "inputs", "output")
+# Calls queries name their parameters with a fixed prefix, so that queries of
+# the same shape have the same text and hit the statement cache.
+CALLS_QUERY_PARAM_PREFIX = "p"
+CALLS_QUERY_STREAM_BATCH_SIZE = 1000
+
+CALL_REFS_INSERT_SQL = "INSERT OR IGNORE INTO call_refs (project_id, call_id, kind, ref) VALUES (?, ?, ?, ?)"
+
 
 class NotFoundError(Exception):
     pass
 
 
-_conn_cursor: contextvars.ContextVar[
-    Optional[tuple[sqlite3.Connection, sqlite3.Cursor]]
-] = contextvars.ContextVar("conn_cursor", default=None)
+# How long to wait for another connection's write lock before failing, in seconds
+SQLITE_BUSY_TIMEOUT = 30.0
+# Number of prepared statements each connection keeps compiled
+SQLITE_CACHED_STATEMENTS = 256
+SQLITE_ANALYSIS_LIMIT = 1000
+# Planner statistics are refreshed once this many calls have been written,
+# and again each time the number written since the server started doubles.
+ANALYZE_MIN_CALLS_WRITTEN = 1000
+
+_thread_local = threading.local()
 
 
 def get_conn_cursor(db_path: str) -> tuple[sqlite3.Connection, sqlite3.Cursor]:
-    # conn_cursor = _conn_cursor.get()
-    conn_cursor = None
-    if conn_cursor is None:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        conn_cursor = (conn, cursor)
-        _conn_cursor.set(conn_cursor)
-    return conn_cursor
+    """Returns this thread's connection to `db_path` and a new cursor on it.
+
+    sqlite connections can not be shared between threads, so each thread
+    opens its own on first use and keeps it for the life of the thread.
+    """
+    conns: Optional[dict[str, sqlite3.Connection]] = getattr(
+        _thread_local, "conns", None
+    )
+    if conns is None:
+        conns = _thread_local.conns = {}
+    conn = conns.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(
+            db_path,
+            timeout=SQLITE_BUSY_TIMEOUT,
+            cached_statements=SQLITE_CACHED_STATEMENTS,
+        )
+        # WAL lets reads proceed during writes, and with synchronous=NORMAL
+        # a commit does not wait for the disk. This is a no-op for in-memory
+        # databases.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Sample indexes when gathering query planner statistics, so that
+        # ANALYZE stays fast on large databases.
+        conn.execute(f"PRAGMA analysis_limit={SQLITE_ANALYSIS_LIMIT}")
+        conns[db_path] = conn
+    elif conn.in_transaction:
+        # A write on this thread failed before committing; don't let its
+        # changes (and the write lock) leak into this operation.
+        conn.rollback()
+    return conn, conn.cursor()
+
+
+class _GroupCommitWrite:
+    def __init__(self, fn: Callable[[sqlite3.Cursor], None]) -> None:
+        self.fn = fn
+        self.done = False
+        self.error: Optional[BaseException] = None
 
 
 class SqliteTraceServer(tsi.TraceServerInterface):
     def __init__(self, db_path: str):
         self.lock = threading.Lock()
         self.db_path = db_path
+        self._group_commit_cond = threading.Condition()
+        self._group_commit_pending: list[_GroupCommitWrite] = []
+        self._group_commit_leader_active = False
+        self._calls_written = 0
+        self._next_analyze_at = ANALYZE_MIN_CALLS_WRITTEN
 
     def drop_tables(self) -> None:
         conn, cursor = get_conn_cursor(self.db_path)
         cursor.execute(TABLE_FEEDBACK.drop_sql())
         cursor.execute("DROP TABLE IF EXISTS calls")
+        cursor.execute("DROP TABLE IF EXISTS call_refs")
         cursor.execute("DROP TABLE IF EXISTS objects")
         cursor.execute("DROP TABLE IF EXISTS tables")
         cursor.execute("DROP TABLE IF EXISTS table_rows")
@@ -106,6 +183,35 @@ class SqliteTraceServer(tsi.TraceServerInterface):
             )
         """
         )
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'call_refs'"
+        )
+        backfill_call_refs = cursor.fetchone() is None
+        # The refs in each call's inputs and outputs, so that calls can be
+        # filtered by ref with an index rather than by scanning their refs.
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS call_refs (
+                project_id TEXT,
+                call_id TEXT,
+                kind TEXT,
+                ref TEXT,
+                primary key (project_id, kind, ref, call_id)
+            )
+        """
+        )
+        if backfill_call_refs:
+            cursor.execute(
+                """
+                INSERT OR IGNORE INTO call_refs (project_id, call_id, kind, ref)
+                SELECT calls.project_id, calls.id, 'input', refs.value
+                FROM calls, json_each(calls.input_refs) AS refs
+                UNION ALL
+                SELECT calls.project_id, calls.id, 'output', refs.value
+                FROM calls, json_each(calls.output_refs) AS refs
+            """
+            )
+            conn.commit()
         cursor.execute(
             """
             CREATE TABLE IF NOT EXISTS objects (
@@ -153,19 +259,119 @@ class SqliteTraceServer(tsi.TraceServerInterface):
             """
         )
         cursor.execute(TABLE_FEEDBACK.create_sql())
+        for index_sql in [
+            "CREATE INDEX IF NOT EXISTS calls_trace_id_idx ON calls (project_id, trace_id)",
+            "CREATE INDEX IF NOT EXISTS calls_parent_id_idx ON calls (project_id, parent_id)",
+            "CREATE INDEX IF NOT EXISTS calls_op_name_idx ON calls (project_id, op_name)",
+            "CREATE INDEX IF NOT EXISTS calls_started_at_idx ON calls (project_id, started_at)",
+            "CREATE INDEX IF NOT EXISTS objects_latest_idx ON objects (project_id, object_id, is_latest)",
+        ]:
+            cursor.execute(index_sql)
+        cursor.execute("ANALYZE")
+
+    def _group_commit(self, fn: Callable[[sqlite3.Cursor], None]) -> None:
+        """Runs `fn` in a write transaction shared with writes from other threads.
+
+        While one thread (the leader) commits, writes from other threads
+        queue up; the next of them to run commits all queued writes at once.
+        Each write runs in its own savepoint, so one that raises is rolled
+        back and the error re-raised to its caller without affecting the
+        others. Returns once `fn`'s changes are committed.
+        """
+        write = _GroupCommitWrite(fn)
+        with self._group_commit_cond:
+            self._group_commit_pending.append(write)
+            while self._group_commit_leader_active and not write.done:
+                self._group_commit_cond.wait()
+            if not write.done:
+                self._group_commit_leader_active = True
+                writes = self._group_commit_pending
+                self._group_commit_pending = []
+        if not write.done:
+            try:
+                self._run_writes(writes)
+            finally:
+                with self._group_commit_cond:
+                    for w in writes:
+                        w.done = True
+                    self._group_commit_leader_active = False
+                    self._group_commit_cond.notify_all()
+        if write.error is not None:
+            raise write.error
+
+    def _run_writes(self, writes: list[_GroupCommitWrite]) -> None:
+        conn, cursor = get_conn_cursor(self.db_path)
+        with self.lock:
+            try:
+                cursor.execute("BEGIN")
+                for w in writes:
+                    cursor.execute("SAVEPOINT group_commit_write")
+                    try:
+                        w.fn(cursor)
+                    except Exception as e:
+                        w.error = e
+                        cursor.execute("ROLLBACK TO group_commit_write")
+                    cursor.execute("RELEASE group_commit_write")
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                for w in writes:
+                    w.error = w.error or e
+
+    def _maybe_analyze(self, n_calls_written: int) -> None:
+        """Refreshes the query planner's statistics as the calls table grows.
+
+        Without them, sqlite can not tell that eg. filtering by call id or ref
+        is more selective than filtering by project, and scans the project.
+        """
+        with self.lock:
+            self._calls_written += n_calls_written
+            if self._calls_written < self._next_analyze_at:
+                return
+            self._next_analyze_at = 2 * self._calls_written
+            conn, cursor = get_conn_cursor(self.db_path)
+            cursor.execute("ANALYZE")
 
     # Creates a new call
     def call_start(self, req: tsi.CallStartReq) -> tsi.CallStartRes:
-        conn, cursor = get_conn_cursor(self.db_path)
-        if req.start.trace_id is None:
-            raise ValueError("trace_id is required")
-        if req.start.id is None:
-            raise ValueError("id is required")
-        with self.lock:
-            # Converts the user-provided call details into a clickhouse schema.
-            # This does validation and conversion of the input data as well
-            # as enforcing business rules and defaults
-            cursor.execute(
+        return self.call_start_batch([req])[0]
+
+    def call_start_batch(self, reqs: list[tsi.CallStartReq]) -> list[tsi.CallStartRes]:
+        """Creates calls in a single write."""
+        rows = []
+        ref_rows: list[tuple[str, str, str, str]] = []
+        results = []
+        for req in reqs:
+            if req.start.trace_id is None:
+                raise ValueError("trace_id is required")
+            if req.start.id is None:
+                raise ValueError("id is required")
+            results.append(
+                tsi.CallStartRes(id=req.start.id, trace_id=req.start.trace_id)
+            )
+            input_refs = extract_refs_from_values(list(req.start.inputs.values()))
+            rows.append(
+                (
+                    req.start.project_id,
+                    req.start.id,
+                    req.start.trace_id,
+                    req.start.parent_id,
+                    req.start.op_name,
+                    req.start.display_name,
+                    req.start.started_at.isoformat(),
+                    json.dumps(req.start.attributes),
+                    json.dumps(req.start.inputs),
+                    json.dumps(input_refs),
+                    req.start.wb_user_id,
+                    req.start.wb_run_id,
+                )
+            )
+            ref_rows.extend(
+                (req.start.project_id, req.start.id, "input", ref) for ref in input_refs
+            )
+
+        def insert_calls(cursor: sqlite3.Cursor) -> None:
+            cursor.executemany(
                 """INSERT INTO calls (
                     project_id,
                     id,
@@ -180,39 +386,45 @@ class SqliteTraceServer(tsi.TraceServerInterface):
                     wb_user_id,
                     wb_run_id
                 ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    req.start.project_id,
-                    req.start.id,
-                    req.start.trace_id,
-                    req.start.parent_id,
-                    req.start.op_name,
-                    req.start.display_name,
-                    req.start.started_at.isoformat(),
-                    json.dumps(req.start.attributes),
-                    json.dumps(req.start.inputs),
-                    json.dumps(
-                        extract_refs_from_values(list(req.start.inputs.values()))
-                    ),
-                    req.start.wb_user_id,
-                    req.start.wb_run_id,
-                ),
+                rows,
             )
-            conn.commit()
+            cursor.executemany(CALL_REFS_INSERT_SQL, ref_rows)
 
-        # Returns the id of the newly created call
-        return tsi.CallStartRes(
-            id=req.start.id,
-            trace_id=req.start.trace_id,
-        )
+        self._group_commit(insert_calls)
+        self._maybe_analyze(len(rows))
+
+        # Returns the ids of the newly created calls
+        return results
 
     def call_end(self, req: tsi.CallEndReq) -> tsi.CallEndRes:
-        conn, cursor = get_conn_cursor(self.db_path)
-        parsable_output = req.end.output
-        if not isinstance(parsable_output, dict):
-            parsable_output = {"output": parsable_output}
-        parsable_output = cast(dict, parsable_output)
-        with self.lock:
-            cursor.execute(
+        return self.call_end_batch([req])[0]
+
+    def call_end_batch(self, reqs: list[tsi.CallEndReq]) -> list[tsi.CallEndRes]:
+        """Ends calls in a single write."""
+        rows = []
+        ref_rows: list[tuple[str, str, str, str]] = []
+        for req in reqs:
+            parsable_output = req.end.output
+            if not isinstance(parsable_output, dict):
+                parsable_output = {"output": parsable_output}
+            parsable_output = cast(dict, parsable_output)
+            output_refs = extract_refs_from_values(list(parsable_output.values()))
+            rows.append(
+                (
+                    req.end.ended_at.isoformat(),
+                    req.end.exception,
+                    json.dumps(req.end.output),
+                    json.dumps(output_refs),
+                    json.dumps(req.end.summary),
+                    req.end.id,
+                )
+            )
+            ref_rows.extend(
+                (req.end.project_id, req.end.id, "output", ref) for ref in output_refs
+            )
+
+        def update_calls(cursor: sqlite3.Cursor) -> None:
+            cursor.executemany(
                 """UPDATE calls SET
                     ended_at = ?,
                     exception = ?,
@@ -220,19 +432,12 @@ class SqliteTraceServer(tsi.TraceServerInterface):
                     output_refs = ?,
                     summary = ?
                 WHERE id = ?""",
-                (
-                    req.end.ended_at.isoformat(),
-                    req.end.exception,
-                    json.dumps(req.end.output),
-                    json.dumps(
-                        extract_refs_from_values(list(parsable_output.values()))
-                    ),
-                    json.dumps(req.end.summary),
-                    req.end.id,
-                ),
+                rows,
             )
-            conn.commit()
-        return tsi.CallEndRes()
+            cursor.executemany(CALL_REFS_INSERT_SQL, ref_rows)
+
+        self._group_commit(update_calls)
+        return [tsi.CallEndRes() for _ in reqs]
 
     def call_read(self, req: tsi.CallReadReq) -> tsi.CallReadRes:
         calls = self.calls_query(
@@ -245,245 +450,41 @@ class SqliteTraceServer(tsi.TraceServerInterface):
         return tsi.CallReadRes(call=calls[0] if calls else None)
 
     def calls_query(self, req: tsi.CallsQueryReq) -> tsi.CallsQueryRes:
-        print("REQ", req)
-        conn, cursor = get_conn_cursor(self.db_path)
-        conds = []
-        filter = req.filter
-        if filter:
-            if filter.op_names:
-                or_conditions: list[str] = []
-
-                non_wildcarded_names: list[str] = []
-                wildcarded_names: list[str] = []
-                for name in filter.op_names:
-                    if name.endswith(WILDCARD_ARTIFACT_VERSION_AND_PATH):
-                        wildcarded_names.append(name)
-                    else:
-                        non_wildcarded_names.append(name)
-
-                if non_wildcarded_names:
-                    in_expr = ", ".join((f"'{x}'" for x in non_wildcarded_names))
-                    or_conditions += [f"op_name IN ({', '.join({in_expr})})"]
-
-                for name_ndx, name in enumerate(wildcarded_names):
-                    like_name = name[: -len(WILDCARD_ARTIFACT_VERSION_AND_PATH)] + "%"
-                    or_conditions.append(f"op_name LIKE '{like_name}'")
-
-                if or_conditions:
-                    conds.append("(" + " OR ".join(or_conditions) + ")")
-
-            if filter.input_refs:
-                or_conditions = []
-                for ref in filter.input_refs:
-                    or_conditions.append(f"input_refs LIKE '%{ref}%'")
-                conds.append("(" + " OR ".join(or_conditions) + ")")
-            if filter.output_refs:
-                or_conditions = []
-                for ref in filter.output_refs:
-                    or_conditions.append(f"output_refs LIKE '%{ref}%'")
-                conds.append("(" + " OR ".join(or_conditions) + ")")
-            if filter.parent_ids:
-                in_expr = ", ".join((f"'{x}'" for x in filter.parent_ids))
-                conds += [f"parent_id IN ({in_expr})"]
-            if filter.trace_ids:
-                in_expr = ", ".join((f"'{x}'" for x in filter.trace_ids))
-                conds += [f"trace_id IN ({in_expr})"]
-            if filter.call_ids:
-                in_expr = ", ".join((f"'{x}'" for x in filter.call_ids))
-                conds += [f"id IN ({in_expr})"]
-            if filter.trace_roots_only:
-                conds.append("parent_id IS NULL")
-            if filter.wb_run_ids:
-                in_expr = ", ".join((f"'{x}'" for x in filter.wb_run_ids))
-                conds += [f"wb_run_id IN ({in_expr})"]
-
-        if req.query:
-            # This is the mongo-style query
-            def process_operation(operation: tsi_query.Operation) -> str:
-                cond = None
-
-                if isinstance(operation, tsi_query.AndOperation):
-                    lhs_part = process_operand(operation.and_[0])
-                    rhs_part = process_operand(operation.and_[1])
-                    cond = f"({lhs_part} AND {rhs_part})"
-                elif isinstance(operation, tsi_query.OrOperation):
-                    lhs_part = process_operand(operation.or_[0])
-                    rhs_part = process_operand(operation.or_[1])
-                    cond = f"({lhs_part} OR {rhs_part})"
-                elif isinstance(operation, tsi_query.NotOperation):
-                    operand_part = process_operand(operation.not_[0])
-                    cond = f"(NOT ({operand_part}))"
-                elif isinstance(operation, tsi_query.EqOperation):
-                    lhs_part = process_operand(operation.eq_[0])
-                    rhs_part = process_operand(operation.eq_[1])
-                    cond = f"({lhs_part} = {rhs_part})"
-                elif isinstance(operation, tsi_query.GtOperation):
-                    lhs_part = process_operand(operation.gt_[0])
-                    rhs_part = process_operand(operation.gt_[1])
-                    cond = f"({lhs_part} > {rhs_part})"
-                elif isinstance(operation, tsi_query.GteOperation):
-                    lhs_part = process_operand(operation.gte_[0])
-                    rhs_part = process_operand(operation.gte_[1])
-                    cond = f"({lhs_part} >= {rhs_part})"
-                elif isinstance(operation, tsi_query.InOperation):
-                    lhs_part = process_operand(operation.in_[0])
-                    rhs_part = ",".join(process_operand(op) for op in operation.in_[1])
-                    cond = f"({lhs_part} IN ({rhs_part}))"
-                elif isinstance(operation, tsi_query.ContainsOperation):
-                    lhs_part = process_operand(operation.contains_.input)
-                    rhs_part = process_operand(operation.contains_.substr)
-                    if operation.contains_.case_insensitive:
-                        lhs_part = f"LOWER({lhs_part})"
-                        rhs_part = f"LOWER({rhs_part})"
-                    cond = f"instr({lhs_part}, {rhs_part})"
-                else:
-                    raise ValueError(f"Unknown operation type: {operation}")
-
-                return cond
-
-            def process_operand(operand: tsi_query.Operand) -> str:
-                if isinstance(operand, tsi_query.LiteralOperation):
-                    return json.dumps(operand.literal_)
-                elif isinstance(operand, tsi_query.GetFieldOperator):
-                    field = _transform_external_calls_field_to_internal_calls_field(
-                        operand.get_field_, None
-                    )
-                    return field
-                elif isinstance(operand, tsi_query.ConvertOperation):
-                    field = process_operand(operand.convert_.input)
-                    convert_to = operand.convert_.to
-                    if convert_to == "int":
-                        sql_type = "INT"
-                    elif convert_to == "double":
-                        sql_type = "FLOAT"
-                    elif convert_to == "bool":
-                        sql_type = "BOOL"
-                    elif convert_to == "string":
-                        sql_type = "TEXT"
-                    else:
-                        raise ValueError(f"Unknown cast: {convert_to}")
-                    return f"CAST({field} AS {sql_type})"
-                elif isinstance(
-                    operand,
-                    (
-                        tsi_query.AndOperation,
-                        tsi_query.OrOperation,
-                        tsi_query.NotOperation,
-                        tsi_query.EqOperation,
-                        tsi_query.GtOperation,
-                        tsi_query.GteOperation,
-                        tsi_query.InOperation,
-                        tsi_query.ContainsOperation,
-                    ),
-                ):
-                    return process_operation(operand)
-                else:
-                    raise ValueError(f"Unknown operand type: {operand}")
-
-            filter_cond = process_operation(req.query.expr_)
-
-            conds.append(filter_cond)
-
-        required_columns = ["id", "trace_id", "project_id", "op_name", "started_at"]
-        select_columns = list(tsi.CallSchema.model_fields.keys())
-        if req.columns:
-            # TODO(gst): allow json fields to be selected
-            simple_columns = [x.split(".")[0] for x in req.columns]
-            select_columns = [x for x in simple_columns if x in select_columns]
-            # add required columns, preserving requested column order
-            select_columns += [
-                rcol for rcol in required_columns if rcol not in select_columns
-            ]
-        query = f"SELECT {', '.join(select_columns)} FROM calls WHERE deleted_at IS NULL AND project_id = '{req.project_id}'"
-
-        conditions_part = " AND ".join(conds)
-
-        if conditions_part:
-            query += f" AND {conditions_part}"
-
-        order_by = (
-            None if not req.sort_by else [(s.field, s.direction) for s in req.sort_by]
-        )
-        if order_by is not None:
-            order_parts = []
-            for field, direction in order_by:
-                json_path: Optional[str] = None
-                if field.startswith("inputs"):
-                    field = "inputs" + field[len("inputs") :]
-                    if field.startswith("inputs."):
-                        json_path = field[len("inputs.") :]
-                        field = "inputs"
-                elif field.startswith("output"):
-                    field = "output" + field[len("output") :]
-                    if field.startswith("output."):
-                        json_path = field[len("output.") :]
-                        field = "output"
-                elif field.startswith("attributes"):
-                    field = "attributes_dump" + field[len("attributes") :]
-                elif field.startswith("summary"):
-                    field = "summary_dump" + field[len("summary") :]
-
-                assert direction in [
-                    "ASC",
-                    "DESC",
-                    "asc",
-                    "desc",
-                ], f"Invalid order_by direction: {direction}"
-                if json_path:
-                    field = f"json_extract({field}, '{quote_json_path(json_path)}')"
-                order_parts.append(f"{field} {direction}")
-
-            order_by_part = ", ".join(order_parts)
-            query += f" ORDER BY {order_by_part}"
-
-        limit = req.limit or -1
-        if limit:
-            query += f" LIMIT {limit}"
-        if req.offset:
-            query += f" OFFSET {req.offset}"
-        print("QUERY", query)
-
-        cursor.execute(query)
-
-        query_result = cursor.fetchall()
-        calls = []
-        for row in query_result:
-            call_dict = {k: v for k, v in zip(select_columns, row)}
-            # convert json dump fields into json
-            for json_field in ["attributes", "summary", "inputs", "output"]:
-                if call_dict.get(json_field):
-                    call_dict[json_field] = json.loads(call_dict[json_field])
-            # convert empty string display_names to None
-            if "display_name" in call_dict and call_dict["display_name"] == "":
-                call_dict["display_name"] = None
-            # fill in missing required fields with defaults
-            for col, mfield in tsi.CallSchema.model_fields.items():
-                if mfield.is_required() and col not in call_dict:
-                    if isinstance(mfield.annotation, str):
-                        call_dict[col] = ""
-                    elif isinstance(
-                        mfield.annotation, (datetime.datetime, datetime.date)
-                    ):
-                        raise ValueError(f"Field '{col}' is required for selection")
-                    else:
-                        call_dict[col] = {}
-            calls.append(tsi.CallSchema(**call_dict))
-        return tsi.CallsQueryRes(calls=calls)
+        calls = list(self.calls_query_stream(req))
+        next_cursor = None
+        sort_order = calls_cursor_sort_order(req.sort_by)
+        if req.limit and len(calls) == req.limit and sort_order is not None:
+            next_cursor = encode_calls_cursor(sort_order, calls[-1])
+        return tsi.CallsQueryRes(calls=calls, next_cursor=next_cursor)
 
     def calls_query_stream(self, req: tsi.CallsQueryReq) -> Iterator[tsi.CallSchema]:
-        return iter(self.calls_query(req).calls)
+        """Returns the matching calls, read from the database in batches as
+        they are consumed.
+        """
+        select_columns = _calls_select_columns(req.columns)
+        pb = ParamBuilder(CALLS_QUERY_PARAM_PREFIX, "sqlite")
+        query = f"SELECT {', '.join(select_columns)} FROM calls"
+        query += f" WHERE {_calls_query_where(req, pb)}"
+        query += _calls_query_order_by_limit(req, pb)
+        logger.debug("calls query: %s", query)
+
+        conn, cursor = get_conn_cursor(self.db_path)
+        cursor.execute(query, pb.get_params())
+        return _stream_calls(cursor, select_columns)
 
     def calls_query_stats(self, req: tsi.CallsQueryStatsReq) -> tsi.CallsQueryStatsRes:
-        calls = self.calls_query(
+        pb = ParamBuilder(CALLS_QUERY_PARAM_PREFIX, "sqlite")
+        where = _calls_query_where(
             tsi.CallsQueryReq(
                 project_id=req.project_id,
                 filter=req.filter,
                 query=req.query,
-            )
-        ).calls
-        return tsi.CallsQueryStatsRes(
-            count=len(calls),
+            ),
+            pb,
         )
+        conn, cursor = get_conn_cursor(self.db_path)
+        cursor.execute(f"SELECT COUNT(*) FROM calls WHERE {where}", pb.get_params())
+        return tsi.CallsQueryStatsRes(count=cursor.fetchone()[0])
 
     def calls_delete(self, req: tsi.CallsDeleteReq) -> tsi.CallsDeleteRes:
         assert_non_null_wb_user_id(req)
@@ -519,7 +520,7 @@ class SqliteTraceServer(tsi.TraceServerInterface):
                 WHERE deleted_at is NULL AND
                     id IN ({})
             """.format(", ".join("?" * len(all_ids)))
-            print("MUTATION", delete_query)
+            logger.debug("calls delete: %s", delete_query)
             cursor.execute(delete_query, all_ids)
             conn.commit()
 
@@ -648,11 +649,7 @@ class SqliteTraceServer(tsi.TraceServerInterface):
             )
 
             row_digests = [r[1] for r in insert_rows]
-
-            table_hasher = hashlib.sha256()
-            for row_digest in row_digests:
-                table_hasher.update(row_digest.encode())
-            digest = table_hasher.hexdigest()
+            digest = table_digest(row_digests)
 
             cursor.execute(
                 "INSERT OR IGNORE INTO tables (project_id, digest, row_digests) VALUES (?, ?, ?)",
@@ -719,10 +716,7 @@ class SqliteTraceServer(tsi.TraceServerInterface):
                 new_rows_needed_to_insert,
             )
 
-            table_hasher = hashlib.sha256()
-            for row_digest in final_row_digests:
-                table_hasher.update(row_digest.encode())
-            digest = table_hasher.hexdigest()
+            digest = table_digest(final_row_digests)
 
             cursor.execute(
                 "INSERT OR IGNORE INTO tables (project_id, digest, row_digests) VALUES (?, ?, ?)",
@@ -891,6 +885,20 @@ class SqliteTraceServer(tsi.TraceServerInterface):
             conn.commit()
         return tsi.FileCreateRes(digest=digest)
 
+    def files_create(self, req: tsi.FilesCreateReq) -> tsi.FilesCreateRes:
+        conn, cursor = get_conn_cursor(self.db_path)
+        digests = [bytes_digest(f.content) for f in req.files]
+        with self.lock:
+            cursor.executemany(
+                "INSERT OR IGNORE INTO files (project_id, digest, val) VALUES (?, ?, ?)",
+                [
+                    (req.project_id, digest, f.content)
+                    for digest, f in zip(digests, req.files)
+                ],
+            )
+            conn.commit()
+        return tsi.FilesCreateRes(digests=digests)
+
     def file_content_read(self, req: tsi.FileContentReadReq) -> tsi.FileContentReadRes:
         conn, cursor = get_conn_cursor(self.db_path)
         cursor.execute(
@@ -1031,57 +1039,263 @@ def get_base_object_class(val: Any) -> Optional[str]:
     return None
 
 
+def _calls_select_columns(columns: Optional[list[str]]) -> list[str]:
+    select_columns = list(tsi.CallSchema.model_fields.keys())
+    if columns:
+        required_columns = ["id", "trace_id", "project_id", "op_name", "started_at"]
+        # TODO(gst): allow json fields to be selected
+        simple_columns = [x.split(".")[0] for x in columns]
+        select_columns = [x for x in simple_columns if x in select_columns]
+        # add required columns, preserving requested column order
+        select_columns += [
+            rcol for rcol in required_columns if rcol not in select_columns
+        ]
+    return select_columns
+
+
+def _json_each(values: list[str], pb: ParamBuilder) -> str:
+    # Binding a list as a single JSON array keeps the query text, and so the
+    # cached statement, the same whatever the number of values.
+    return f"(SELECT value FROM json_each({pb.add(json.dumps(values))}))"
+
+
+def _calls_query_where(req: tsi.CallsQueryReq, pb: ParamBuilder) -> str:
+    project_id = pb.add(req.project_id, "project_id")
+    conds = ["deleted_at IS NULL", f"project_id = {project_id}"]
+    filter = req.filter
+    if filter:
+        if filter.op_names:
+            or_conditions: list[str] = []
+
+            non_wildcarded_names: list[str] = []
+            wildcarded_names: list[str] = []
+            for name in filter.op_names:
+                if name.endswith(WILDCARD_ARTIFACT_VERSION_AND_PATH):
+                    wildcarded_names.append(name)
+                else:
+                    non_wildcarded_names.append(name)
+
+            if non_wildcarded_names:
+                or_conditions.append(
+                    f"op_name IN {_json_each(non_wildcarded_names, pb)}"
+                )
+
+            for name in wildcarded_names:
+                like_name = name[: -len(WILDCARD_ARTIFACT_VERSION_AND_PATH)] + "%"
+                or_conditions.append(f"op_name LIKE {pb.add(like_name)}")
+
+            if or_conditions:
+                conds.append("(" + " OR ".join(or_conditions) + ")")
+
+        for kind, refs in [
+            ("input", filter.input_refs),
+            ("output", filter.output_refs),
+        ]:
+            if refs:
+                conds.append(
+                    f"""id IN (
+                        SELECT call_id FROM call_refs
+                        WHERE project_id = {project_id} AND
+                            kind = '{kind}' AND
+                            ref IN {_json_each(refs, pb)}
+                    )"""
+                )
+        if filter.parent_ids:
+            conds.append(f"parent_id IN {_json_each(filter.parent_ids, pb)}")
+        if filter.trace_ids:
+            conds.append(f"trace_id IN {_json_each(filter.trace_ids, pb)}")
+        if filter.call_ids:
+            conds.append(f"id IN {_json_each(filter.call_ids, pb)}")
+        if filter.trace_roots_only:
+            conds.append("parent_id IS NULL")
+        if filter.wb_run_ids:
+            conds.append(f"wb_run_id IN {_json_each(filter.wb_run_ids, pb)}")
+
+    if req.query:
+        # This is the mongo-style query
+        conds.append(_query_operation_to_sql(req.query.expr_, pb))
+
+    if req.cursor is not None:
+        # Sorts usable with cursors get `id` as a tiebreaker, so that the
+        # order is stable across pages.
+        sort_order = calls_cursor_sort_order(req.sort_by)
+        if sort_order is None:
+            raise InvalidRequest(
+                "Cursor pagination only supports sorting by started_at, op_name, trace_id and id"
+            )
+        values = decode_calls_cursor(req.cursor, sort_order)
+        value_params = [pb.add(value) for value in values]
+        # (f1 > v1) OR (f1 = v1 AND f2 > v2) OR ...
+        or_conditions = []
+        for i, (field, direction) in enumerate(sort_order):
+            and_conditions = [
+                f"{f} = {value_params[j]}" for j, (f, _) in enumerate(sort_order[:i])
+            ]
+            op = ">" if direction == "asc" else "<"
+            and_conditions.append(f"{field} {op} {value_params[i]}")
+            or_conditions.append("(" + " AND ".join(and_conditions) + ")")
+        conds.append("(" + " OR ".join(or_conditions) + ")")
+
+    return " AND ".join(conds)
+
+
+def _calls_query_order_by_limit(req: tsi.CallsQueryReq, pb: ParamBuilder) -> str:
+    sql = ""
+    order_by = calls_cursor_sort_order(req.sort_by)
+    if order_by is None and req.sort_by:
+        order_by = [(s.field, s.direction) for s in req.sort_by]
+    if order_by is not None:
+        order_parts = []
+        for field, direction in order_by:
+            assert direction in [
+                "ASC",
+                "DESC",
+                "asc",
+                "desc",
+            ], f"Invalid order_by direction: {direction}"
+            order_parts.append(f"{_calls_order_by_field(field, pb)} {direction}")
+        sql += " ORDER BY " + ", ".join(order_parts)
+
+    sql += f" LIMIT {pb.add(req.limit or -1, 'limit')}"
+    # The cursor already skips the earlier pages
+    if req.offset and req.cursor is None:
+        sql += f" OFFSET {pb.add(req.offset, 'offset')}"
+    return sql
+
+
+def _calls_order_by_field(field: str, pb: ParamBuilder) -> str:
+    for json_column in CALLS_JSON_COLUMNS:
+        if field.startswith(json_column + "."):
+            json_path = quote_json_path(field[len(json_column + ".") :])
+            return f"json_extract({json_column}, {pb.add(json_path)})"
+    if field not in CALLS_COLUMNS:
+        raise ValueError(f"Unknown sort field: {field}")
+    return field
+
+
+def _query_operation_to_sql(operation: tsi_query.Operation, pb: ParamBuilder) -> str:
+    if isinstance(operation, tsi_query.AndOperation):
+        if len(operation.and_) == 0:
+            raise ValueError("Empty AND operation")
+        parts = [_query_operand_to_sql(op, pb) for op in operation.and_]
+        return f"({' AND '.join(parts)})"
+    elif isinstance(operation, tsi_query.OrOperation):
+        if len(operation.or_) == 0:
+            raise ValueError("Empty OR operation")
+        parts = [_query_operand_to_sql(op, pb) for op in operation.or_]
+        return f"({' OR '.join(parts)})"
+    elif isinstance(operation, tsi_query.NotOperation):
+        operand_part = _query_operand_to_sql(operation.not_[0], pb)
+        return f"(NOT ({operand_part}))"
+    elif isinstance(operation, tsi_query.EqOperation):
+        lhs_part = _query_operand_to_sql(operation.eq_[0], pb)
+        rhs_part = _query_operand_to_sql(operation.eq_[1], pb)
+        return f"({lhs_part} = {rhs_part})"
+    elif isinstance(operation, tsi_query.GtOperation):
+        lhs_part = _query_operand_to_sql(operation.gt_[0], pb)
+        rhs_part = _query_operand_to_sql(operation.gt_[1], pb)
+        return f"({lhs_part} > {rhs_part})"
+    elif isinstance(operation, tsi_query.GteOperation):
+        lhs_part = _query_operand_to_sql(operation.gte_[0], pb)
+        rhs_part = _query_operand_to_sql(operation.gte_[1], pb)
+        return f"({lhs_part} >= {rhs_part})"
+    elif isinstance(operation, tsi_query.InOperation):
+        lhs_part = _query_operand_to_sql(operation.in_[0], pb)
+        rhs_part = ",".join(_query_operand_to_sql(op, pb) for op in operation.in_[1])
+        return f"({lhs_part} IN ({rhs_part}))"
+    elif isinstance(operation, tsi_query.ContainsOperation):
+        lhs_part = _query_operand_to_sql(operation.contains_.input, pb)
+        rhs_part = _query_operand_to_sql(operation.contains_.substr, pb)
+        if operation.contains_.case_insensitive:
+            lhs_part = f"LOWER({lhs_part})"
+            rhs_part = f"LOWER({rhs_part})"
+        return f"instr({lhs_part}, {rhs_part})"
+    else:
+        raise ValueError(f"Unknown operation type: {operation}")
+
+
+def _query_operand_to_sql(operand: tsi_query.Operand, pb: ParamBuilder) -> str:
+    if isinstance(operand, tsi_query.LiteralOperation):
+        return pb.add(operand.literal_)
+    elif isinstance(operand, tsi_query.GetFieldOperator):
+        return _transform_external_calls_field_to_internal_calls_field(
+            operand.get_field_, pb
+        )
+    elif isinstance(operand, tsi_query.ConvertOperation):
+        field = _query_operand_to_sql(operand.convert_.input, pb)
+        convert_to = operand.convert_.to
+        if convert_to == "int":
+            sql_type = "INT"
+        elif convert_to == "double":
+            sql_type = "FLOAT"
+        elif convert_to == "bool":
+            sql_type = "BOOL"
+        elif convert_to == "string":
+            sql_type = "TEXT"
+        else:
+            raise ValueError(f"Unknown cast: {convert_to}")
+        return f"CAST({field} AS {sql_type})"
+    elif isinstance(
+        operand,
+        (
+            tsi_query.AndOperation,
+            tsi_query.OrOperation,
+            tsi_query.NotOperation,
+            tsi_query.EqOperation,
+            tsi_query.GtOperation,
+            tsi_query.GteOperation,
+            tsi_query.InOperation,
+            tsi_query.ContainsOperation,
+        ),
+    ):
+        return _query_operation_to_sql(operand, pb)
+    else:
+        raise ValueError(f"Unknown operand type: {operand}")
+
+
+def _stream_calls(
+    cursor: sqlite3.Cursor, select_columns: list[str]
+) -> Iterator[tsi.CallSchema]:
+    try:
+        while rows := cursor.fetchmany(CALLS_QUERY_STREAM_BATCH_SIZE):
+            for row in rows:
+                yield _row_to_call(select_columns, row)
+    finally:
+        cursor.close()
+
+
+def _row_to_call(select_columns: list[str], row: tuple) -> tsi.CallSchema:
+    call_dict = {k: v for k, v in zip(select_columns, row)}
+    # convert json dump fields into json
+    for json_field in CALLS_JSON_COLUMNS:
+        if call_dict.get(json_field):
+            call_dict[json_field] = json.loads(call_dict[json_field])
+    # convert empty string display_names to None
+    if "display_name" in call_dict and call_dict["display_name"] == "":
+        call_dict["display_name"] = None
+    # fill in missing required fields with defaults
+    for col, mfield in tsi.CallSchema.model_fields.items():
+        if mfield.is_required() and col not in call_dict:
+            if isinstance(mfield.annotation, str):
+                call_dict[col] = ""
+            elif isinstance(mfield.annotation, (datetime.datetime, datetime.date)):
+                raise ValueError(f"Field '{col}' is required for selection")
+            else:
+                call_dict[col] = {}
+    return tsi.CallSchema(**call_dict)
+
+
 def _transform_external_calls_field_to_internal_calls_field(
-    field: str,
-    cast: Optional[str] = None,
+    field: str, pb: ParamBuilder
 ) -> str:
-    json_path = None
-    if field == "inputs" or field.startswith("inputs."):
-        if field == "inputs":
+    for json_column in CALLS_JSON_COLUMNS:
+        if field == json_column:
             json_path = "$"
+        elif field.startswith(json_column + "."):
+            json_path = quote_json_path(field[len(json_column + ".") :])
         else:
-            json_path = quote_json_path(field[len("inputs.") :])
-        field = "inputs"
-    elif field == "output" or field.startswith("output."):
-        if field == "output":
-            json_path = "$"
-        else:
-            json_path = quote_json_path(field[len("output.") :])
-        field = "output"
-    elif field == "attributes" or field.startswith("attributes."):
-        if field == "attributes":
-            json_path = "$"
-        else:
-            json_path = quote_json_path(field[len("attributes.") :])
-        field = "attributes"
-    elif field == "summary" or field.startswith("summary."):
-        if field == "summary":
-            json_path = "$"
-        else:
-            json_path = quote_json_path(field[len("summary.") :])
-        field = "summary"
-
-    if json_path is not None:
-        sql_type = "TEXT"
-        if cast is not None:
-            if cast == "int":
-                sql_type = "INT"
-            elif cast == "float":
-                sql_type = "FLOAT"
-            elif cast == "bool":
-                sql_type = "BOOL"
-            elif cast == "str":
-                sql_type = "TEXT"
-            else:
-                raise ValueError(f"Unknown cast: {cast}")
-        field = (
-            "CAST(json_extract("
-            + json.dumps(field)
-            + ", '"
-            + json_path
-            + "') AS "
-            + sql_type
-            + ")"
-        )
-
+            continue
+        return f"CAST(json_extract({json_column}, {pb.add(json_path)}) AS TEXT)"
+    if field not in CALLS_COLUMNS:
+        raise ValueError(f"Unknown field: {field}")
     return field
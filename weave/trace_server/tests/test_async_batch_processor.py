@@ -0,0 +1,84 @@
+import threading
+import time
+
+from weave.trace_server.async_batch_processor import AsyncBatchProcessor
+
+
+def test_flushes_when_batch_is_full():
+    batches = []
+    processor = AsyncBatchProcessor(batches.append, max_batch_size=3, max_batch_age=60)
+    processor.enqueue([1, 2, 3, 4])
+    deadline = time.monotonic() + 5
+    while not batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert batches == [[1, 2, 3]]
+
+    processor.wait_until_all_processed()
+    assert batches == [[1, 2, 3], [4]]
+
+
+def test_flushes_when_batch_is_too_old():
+    batches = []
+    processor = AsyncBatchProcessor(batches.append, max_batch_age=0.05)
+    start = time.monotonic()
+    processor.enqueue([1])
+    while not batches and time.monotonic() - start < 5:
+        time.sleep(0.01)
+    assert batches == [[1]]
+    assert time.monotonic() - start < 1
+    processor.wait_until_all_processed()
+
+
+def test_batches_are_cut_by_bytes():
+    batches = []
+    processor = AsyncBatchProcessor(
+        batches.append,
+        max_batch_age=60,
+        max_batch_bytes=10,
+        size_fn=len,
+    )
+    processor.enqueue([b"aaaa", b"bbbb", b"cccc", b"d" * 20])
+    processor.wait_until_all_processed()
+    assert batches == [[b"aaaa", b"bbbb"], [b"cccc"], [b"d" * 20]]
+
+
+def test_concurrent_batches():
+    release = threading.Event()
+    lock = threading.Lock()
+    max_in_flight = 0
+
+    def process(batch):
+        nonlocal max_in_flight
+        with lock:
+            max_in_flight = max(max_in_flight, processor.stats.in_flight_batches)
+        release.wait(5)
+
+    processor = AsyncBatchProcessor(
+        process, max_batch_size=1, max_batch_age=60, num_workers=3
+    )
+    processor.enqueue([1, 2, 3])
+    deadline = time.monotonic() + 5
+    while processor.stats.in_flight_batches < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    processor.wait_until_all_processed()
+
+    assert max_in_flight == 3
+    assert processor.stats.batches_processed == 3
+    assert processor.stats.items_processed == 3
+    assert processor.queue_depth == 0
+
+
+def test_processing_errors_do_not_stop_worker():
+    batches = []
+
+    def process(batch):
+        if batch == [1]:
+            raise ValueError("boom")
+        batches.append(batch)
+
+    processor = AsyncBatchProcessor(process, max_batch_size=1, max_batch_age=60)
+    processor.enqueue([1, 2])
+    processor.wait_until_all_processed()
+    assert batches == [[2]]
+    assert processor.stats.processing_errors == 1
@@ -413,3 +413,32 @@ def test_query_light_column_with_costs() -> None:
             "pb_4": 1,
         },
     )
+
+
+def test_query_light_column_with_seek() -> None:
+    cq = CallsQuery(project_id="project")
+    cq.add_field("id")
+    cq.add_order("started_at", "desc")
+    cq.add_order("id", "asc")
+    cq.set_seek(["2024-01-01T00:00:00", "abc"])
+    assert_sql(
+        cq,
+        """
+        SELECT calls_merged.id AS id
+        FROM calls_merged
+        WHERE project_id = {pb_2:String}
+        GROUP BY (project_id,id)
+        HAVING (
+            ((any(calls_merged.deleted_at) IS NULL))
+            AND ((
+                ((any(calls_merged.started_at) < {pb_0:DateTime64(3)}))
+                OR ((
+                    ((any(calls_merged.started_at) = {pb_0:DateTime64(3)}))
+                    AND ((calls_merged.id > {pb_1:String}))
+                ))
+            ))
+        )
+        ORDER BY any(calls_merged.started_at) DESC, calls_merged.id ASC
+        """,
+        {"pb_0": "2024-01-01T00:00:00", "pb_1": "abc", "pb_2": "project"},
+    )
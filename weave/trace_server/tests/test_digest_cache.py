@@ -0,0 +1,84 @@
+import hashlib
+
+from weave.trace_server import digest_cache
+from weave.trace_server.digest_cache import (
+    OBJ_VAL,
+    TABLE_ROW_DIGESTS,
+    TABLE_ROW_VAL,
+    DigestCache,
+    LRUDigestCacheBackend,
+)
+
+
+def test_lru_backend_evicts_by_bytes():
+    backend = LRUDigestCacheBackend(max_bytes=10)
+    backend.set("a", b"1234")
+    backend.set("b", b"1234")
+    # Touch "a" so that "b" is the least recently used
+    assert backend.get("a") == b"1234"
+    backend.set("c", b"1234")
+    assert backend.get("b") is None
+    assert backend.get("a") == b"1234"
+    assert backend.get("c") == b"1234"
+    assert backend.size == 8
+
+    # Values larger than the cache are not stored
+    backend.set("d", b"x" * 11)
+    assert backend.get("d") is None
+    assert backend.size == 8
+
+
+def test_digest_cache_keys_and_stats():
+    cache = DigestCache(LRUDigestCacheBackend(max_bytes=1000))
+    assert cache.get(OBJ_VAL, "project", "digest") is None
+    cache.set(OBJ_VAL, "project", "digest", b"val")
+    assert cache.get(OBJ_VAL, "project", "digest") == b"val"
+    assert cache.get(OBJ_VAL, "other_project", "digest") is None
+    assert cache.get(TABLE_ROW_VAL, "project", "digest") is None
+
+    assert cache.stats.hits == {OBJ_VAL: 1}
+    assert cache.stats.misses == {OBJ_VAL: 2, TABLE_ROW_VAL: 1}
+    assert cache.stats.hit_rate(OBJ_VAL) == 1 / 3
+
+
+def test_digest_cache_without_backend():
+    cache = DigestCache(None)
+    cache.set(OBJ_VAL, "project", "digest", b"val")
+    assert cache.get(OBJ_VAL, "project", "digest") is None
+    assert cache.stats.misses == {OBJ_VAL: 1}
+
+
+def test_digest_cache_keeps_row_digests_decoded(monkeypatch):
+    monkeypatch.setattr(digest_cache, "DECODED_ROW_DIGESTS_MAX_COUNT", 3)
+    cache = DigestCache(LRUDigestCacheBackend(max_bytes=1000))
+    assert cache.set_row_digests("project", "t1", ["a", "b"]) == ("a", "b")
+    # Later reads return the same decoded tuple rather than re-parsing it.
+    row_digests = cache.get_row_digests("project", "t1")
+    assert row_digests == ("a", "b")
+    assert cache.get_row_digests("project", "t1") is row_digests
+    assert cache.get(TABLE_ROW_DIGESTS, "project", "t1") == b'["a", "b"]'
+
+    # Evicted from the decoded layer, but still decoded from the backend.
+    cache.set_row_digests("project", "t2", ["c", "d"])
+    assert cache.get_row_digests("project", "t1") == ("a", "b")
+    assert cache.get_row_digests("other_project", "t1") is None
+
+
+def test_digest_cache_keeps_table_hashers(monkeypatch):
+    monkeypatch.setattr(digest_cache, "TABLE_HASHERS_MAX_COUNT", 1)
+    cache = DigestCache(LRUDigestCacheBackend(max_bytes=1000))
+    hasher = hashlib.sha256(b"ab")
+    cache.set_table_hasher("project", "t1", hasher)
+    # Updating the returned hasher doesn't change the one that is held
+    extended = cache.get_table_hasher("project", "t1")
+    assert extended is not None
+    extended.update(b"c")
+    assert extended.hexdigest() == hashlib.sha256(b"abc").hexdigest()
+    held = cache.get_table_hasher("project", "t1")
+    assert held is not None
+    assert held.hexdigest() == hasher.hexdigest()
+    assert cache.get_table_hasher("other_project", "t1") is None
+
+    cache.set_table_hasher("project", "t2", hashlib.sha256())
+    assert cache.get_table_hasher("project", "t1") is None
+    assert DigestCache(None).get_table_hasher("project", "t1") is None
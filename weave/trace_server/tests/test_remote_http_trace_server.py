@@ -1,13 +1,16 @@
 import datetime
+import gzip
+import threading
 import unittest
 from unittest.mock import patch
 
 import requests
 from pydantic import ValidationError
 
+from weave.trace_server import requests as trace_server_requests
 from weave.trace_server import trace_server_interface as tsi
 from weave.trace_server.ids import generate_id
-from weave.trace_server.remote_http_trace_server import RemoteHTTPTraceServer
+from weave.trace_server.remote_http_trace_server import Batch, RemoteHTTPTraceServer
 
 
 def generate_start(id) -> tsi.StartedCallSchemaForInsert:
@@ -115,6 +118,113 @@ class TestRemoteHTTPTraceServer(unittest.TestCase):
         start = generate_start(call_id)
         self.server.call_start(tsi.CallStartReq(start=start))
 
+    @patch("weave.trace_server.requests.post")
+    def test_batched_calls(self, mock_post):
+        mock_post.return_value = requests.Response()
+        mock_post.return_value.status_code = 200
+        server = RemoteHTTPTraceServer(self.trace_server_url, should_batch=True)
+        call_id = generate_id()
+        server.call_start(tsi.CallStartReq(start=generate_start(call_id)))
+        server.call_end(
+            tsi.CallEndReq(
+                end=tsi.EndedCallSchemaForInsert(
+                    project_id="test",
+                    id=call_id,
+                    ended_at=datetime.datetime.now(tz=datetime.timezone.utc),
+                    summary={},
+                )
+            )
+        )
+        server.call_processor.wait_until_all_processed()
+
+        mock_post.assert_called_once()
+        batch = Batch.model_validate_json(mock_post.call_args.kwargs["data"])
+        assert [item.mode for item in batch.batch] == ["start", "end"]
+        assert batch.batch[0].req.start.id == call_id
+
+    @patch("weave.trace_server.requests.post")
+    def test_request_compression(self, mock_post):
+        ok = requests.Response()
+        ok.status_code = 200
+        ok.json = lambda: {"digest": "abc"}
+        mock_post.return_value = ok
+        server = RemoteHTTPTraceServer(
+            self.trace_server_url, request_compression="gzip"
+        )
+        req = tsi.ObjCreateReq(
+            obj=tsi.ObjSchemaForInsert(
+                project_id="test", object_id="obj", val={"a": "x" * 10000}
+            )
+        )
+        server.obj_create(req)
+
+        kwargs = mock_post.call_args.kwargs
+        assert kwargs["headers"] == {"Content-Encoding": "gzip"}
+        assert gzip.decompress(kwargs["data"]) == req.model_dump_json(
+            by_alias=True
+        ).encode("utf-8")
+        assert len(kwargs["data"]) < 1000
+
+    @patch("weave.trace_server.requests.post")
+    def test_request_compression_unsupported(self, mock_post):
+        unsupported = requests.Response()
+        unsupported.status_code = 415
+        ok = requests.Response()
+        ok.status_code = 200
+        ok.json = lambda: {"digest": "abc"}
+        mock_post.side_effect = [unsupported, ok, ok]
+        server = RemoteHTTPTraceServer(
+            self.trace_server_url, request_compression="gzip"
+        )
+        req = tsi.ObjCreateReq(
+            obj=tsi.ObjSchemaForInsert(
+                project_id="test", object_id="obj", val={"a": "x" * 10000}
+            )
+        )
+        server.obj_create(req)
+        server.obj_create(req)
+
+        assert server.request_compression is None
+        assert mock_post.call_count == 3
+        for call in mock_post.call_args_list[1:]:
+            assert "headers" not in call.kwargs
+            assert call.kwargs["data"] == req.model_dump_json(by_alias=True).encode(
+                "utf-8"
+            )
+
+    @patch("weave.trace_server.requests.post")
+    def test_files_create_uploads_each_file(self, mock_post):
+        ok = requests.Response()
+        ok.status_code = 200
+        ok.json = lambda: {"digest": "d"}
+        mock_post.return_value = ok
+        files = [tsi.FilesCreateItem(name=str(i), content=b"x") for i in range(3)]
+
+        res = self.server.files_create(
+            tsi.FilesCreateReq(project_id="test", files=files)
+        )
+
+        assert res.digests == ["d", "d", "d"]
+        assert [c.args[0] for c in mock_post.call_args_list] == [
+            "http://example.com/files/create"
+        ] * 3
+        assert sorted(
+            c.kwargs["files"]["file"][0] for c in mock_post.call_args_list
+        ) == ["0", "1", "2"]
+
+
+def test_session_pool_shares_adapter_across_threads():
+    pool = trace_server_requests.SessionPool(pool_maxsize=4)
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.append(pool.get()))
+    thread.start()
+    thread.join()
+
+    assert pool.get() is pool.get()
+    assert sessions[0] is not pool.get()
+    assert sessions[0].get_adapter("https://x") is pool.adapter
+    assert pool.get().get_adapter("https://x") is pool.adapter
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,154 @@
+import datetime
+import sqlite3
+import threading
+from typing import Any, Optional
+
+import pytest
+
+from weave.trace_server import sqlite_trace_server
+from weave.trace_server import trace_server_interface as tsi
+from weave.trace_server.interface.query import Query
+from weave.trace_server.sqlite_trace_server import SqliteTraceServer
+
+
+@pytest.fixture()
+def server(tmp_path):
+    server = SqliteTraceServer(str(tmp_path / "trace.db"))
+    server.setup_tables()
+    return server
+
+
+def make_start_req(
+    call_id: str, op_name: str = "op", inputs: Optional[dict] = None
+) -> tsi.CallStartReq:
+    return tsi.CallStartReq(
+        start=tsi.StartedCallSchemaForInsert(
+            project_id="project",
+            id=call_id,
+            trace_id="trace",
+            op_name=op_name,
+            started_at=datetime.datetime.now(tz=datetime.timezone.utc),
+            attributes={},
+            inputs={"x": 1} if inputs is None else inputs,
+        )
+    )
+
+
+def make_end_req(call_id: str, output: Any = 2) -> tsi.CallEndReq:
+    return tsi.CallEndReq(
+        end=tsi.EndedCallSchemaForInsert(
+            project_id="project",
+            id=call_id,
+            ended_at=datetime.datetime.now(tz=datetime.timezone.utc),
+            output=output,
+            summary={},
+        )
+    )
+
+
+def query_calls(server: SqliteTraceServer) -> list[tsi.CallSchema]:
+    return server.calls_query(tsi.CallsQueryReq(project_id="project")).calls
+
+
+def test_call_batches(server):
+    call_ids = [f"call-{i}" for i in range(10)]
+    server.call_start_batch([make_start_req(call_id) for call_id in call_ids])
+    server.call_end_batch([make_end_req(call_id) for call_id in call_ids])
+
+    calls = query_calls(server)
+    assert sorted(call.id for call in calls) == call_ids
+    assert all(call.output == 2 for call in calls)
+
+
+def test_concurrent_calls_are_group_committed(server):
+    n_threads = 8
+    n_calls = 50
+    errors = []
+
+    def log_calls(thread_ndx: int) -> None:
+        try:
+            for i in range(n_calls):
+                call_id = f"call-{thread_ndx}-{i}"
+                server.call_start(make_start_req(call_id))
+                server.call_end(make_end_req(call_id))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=log_calls, args=(i,)) for i in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    calls = query_calls(server)
+    assert len(calls) == n_threads * n_calls
+    assert all(call.ended_at is not None for call in calls)
+
+
+def test_failed_write_does_not_affect_others(server):
+    server.call_start(make_start_req("call-0"))
+    with pytest.raises(sqlite3.IntegrityError):
+        server.call_start(make_start_req("call-0"))
+    server.call_start(make_start_req("call-1"))
+
+    assert sorted(call.id for call in query_calls(server)) == ["call-0", "call-1"]
+
+
+def test_calls_query_binds_values(server):
+    server.call_start(make_start_req("call-0", op_name="op'name", inputs={"a": "x'y"}))
+    server.call_start(make_start_req("call-1", inputs={"a": "z"}))
+
+    calls = server.calls_query(
+        tsi.CallsQueryReq(
+            project_id="project", filter=tsi.CallsFilter(op_names=["op'name"])
+        )
+    ).calls
+    assert [call.id for call in calls] == ["call-0"]
+
+    query = Query.model_validate(
+        {"$expr": {"$eq": [{"$getField": "inputs.a"}, {"$literal": "x'y"}]}}
+    )
+    calls = server.calls_query(
+        tsi.CallsQueryReq(project_id="project", query=query)
+    ).calls
+    assert [call.id for call in calls] == ["call-0"]
+    count = server.calls_query_stats(
+        tsi.CallsQueryStatsReq(project_id="project", query=query)
+    ).count
+    assert count == 1
+
+
+def test_calls_query_ref_filters(server):
+    ref = "weave:///project/object/obj:digest"
+    server.call_start(make_start_req("call-0", inputs={"obj": ref}))
+    server.call_start(make_start_req("call-1", inputs={"obj": ref + "x"}))
+    server.call_end(make_end_req("call-0", output=None))
+    server.call_end(make_end_req("call-1", output={"obj": ref}))
+
+    def query_ids(filter: tsi.CallsFilter) -> list[str]:
+        calls = server.calls_query(
+            tsi.CallsQueryReq(project_id="project", filter=filter)
+        ).calls
+        return sorted(call.id for call in calls)
+
+    assert query_ids(tsi.CallsFilter(input_refs=[ref])) == ["call-0"]
+    assert query_ids(tsi.CallsFilter(input_refs=[ref, ref + "x"])) == [
+        "call-0",
+        "call-1",
+    ]
+    assert query_ids(tsi.CallsFilter(output_refs=[ref])) == ["call-1"]
+
+
+def test_calls_query_stream(server, monkeypatch):
+    monkeypatch.setattr(sqlite_trace_server, "CALLS_QUERY_STREAM_BATCH_SIZE", 2)
+    call_ids = [f"call-{i}" for i in range(5)]
+    server.call_start_batch([make_start_req(call_id) for call_id in call_ids])
+
+    stream = server.calls_query_stream(
+        tsi.CallsQueryReq(
+            project_id="project", sort_by=[tsi.SortBy(field="id", direction="asc")]
+        )
+    )
+    assert next(stream).id == "call-0"
+    assert [call.id for call in stream] == call_ids[1:]
@@ -252,9 +252,21 @@ class CallsQueryReq(BaseModel):
     # SortBy and thus GetFieldOperator.get_field_ (without direction)
     columns: Optional[List[str]] = None
 
+    # Opaque token from `CallsQueryRes.next_cursor`. Returns the calls after
+    # the last call of the previous page, which unlike `offset` does not
+    # require the server to scan the skipped calls. The query must use the
+    # same filter and sort as the one that returned the cursor, and may only
+    # sort by `started_at`, `op_name`, `trace_id` and `id`. `offset` is ignored
+    # when a cursor is given, so clients can send both and still page
+    # correctly against servers that don't know about cursors.
+    cursor: Optional[str] = None
+
 
 class CallsQueryRes(BaseModel):
     calls: List[CallSchema]
+    # Set when `limit` calls were returned and the sort supports cursors.
+    # Pass as `cursor` to fetch the next page.
+    next_cursor: Optional[str] = None
 
 
 class CallsQueryStatsReq(BaseModel):
@@ -551,6 +563,21 @@ class FileCreateRes(BaseModel):
     digest: str
 
 
+class FilesCreateItem(BaseModel):
+    name: str
+    content: bytes
+
+
+class FilesCreateReq(BaseModel):
+    project_id: str
+    files: List[FilesCreateItem]
+
+
+class FilesCreateRes(BaseModel):
+    # One digest per file, in request order
+    digests: List[str]
+
+
 class FileContentReadReq(BaseModel):
     project_id: str
     digest: str
@@ -594,6 +621,7 @@ class TraceServerInterface(Protocol):
     def table_query(self, req: TableQueryReq) -> TableQueryRes: ...
     def refs_read_batch(self, req: RefsReadBatchReq) -> RefsReadBatchRes: ...
     def file_create(self, req: FileCreateReq) -> FileCreateRes: ...
+    def files_create(self, req: FilesCreateReq) -> FilesCreateRes: ...
     def file_content_read(self, req: FileContentReadReq) -> FileContentReadRes: ...
     def feedback_create(self, req: FeedbackCreateReq) -> FeedbackCreateRes: ...
     def feedback_query(self, req: FeedbackQueryReq) -> FeedbackQueryRes: ...
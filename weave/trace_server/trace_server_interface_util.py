@@ -1,8 +1,12 @@
 import base64
+import datetime
 import hashlib
+import json
 import typing
+import zlib
 
 from . import refs_internal
+from .errors import InvalidRequest
 
 TRACE_REF_SCHEME = "weave"
 ARTIFACT_REF_SCHEME = "wandb-artifact"
@@ -21,6 +25,59 @@ def str_digest(json_val: str) -> str:
     return bytes_digest(json_val.encode())
 
 
+# Tables are split into chunks of row digests at content-defined boundaries: a
+# chunk ends after a row whose digest hashes to 0 mod the target size, or once
+# it reaches the max size. Boundaries only depend on the rows since the
+# previous boundary, so appending rows only changes the last chunk and
+# versions of a table share all of their other chunks.
+TABLE_CHUNK_TARGET_SIZE = 1024
+TABLE_CHUNK_MAX_SIZE = 8192
+
+
+def chunk_table_row_digests(
+    row_digests: typing.Sequence[str],
+) -> typing.List[typing.List[str]]:
+    chunks: typing.List[typing.List[str]] = []
+    chunk: typing.List[str] = []
+    for row_digest in row_digests:
+        chunk.append(row_digest)
+        if (
+            len(chunk) >= TABLE_CHUNK_MAX_SIZE
+            or zlib.crc32(row_digest.encode()) % TABLE_CHUNK_TARGET_SIZE == 0
+        ):
+            chunks.append(chunk)
+            chunk = []
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def table_digest(row_digests: typing.Iterable[str]) -> str:
+    """Returns the digest of a table: the sha256 of its row digests, in order.
+
+    Chunks are only how a table is stored, so they do not affect its digest.
+    A chunk's digest is computed the same way from the rows in the chunk.
+    """
+    return table_digest_hasher(row_digests).hexdigest()
+
+
+def table_digest_hasher(
+    row_digests: typing.Iterable[str],
+    hasher: typing.Optional["hashlib._Hash"] = None,
+) -> "hashlib._Hash":
+    """Returns the sha256 hasher that `table_digest` gets its digest from.
+
+    If `hasher` is the hasher of a table, it is updated in place with the
+    appended `row_digests`, so the digest of the longer table is computed
+    without hashing the table's rows again.
+    """
+    if hasher is None:
+        hasher = hashlib.sha256()
+    for row_digest in row_digests:
+        hasher.update(row_digest.encode())
+    return hasher
+
+
 def _order_dict(dictionary: typing.Dict) -> typing.Dict:
     return {
         k: _order_dict(v) if isinstance(v, dict) else v
@@ -48,6 +105,70 @@ def decode_b64_to_bytes(contents: typing.Dict[str, str]) -> typing.Dict[str, byt
     return res
 
 
+# Call fields that can be used to sort calls when paginating with a cursor.
+# These are never null, so comparisons against them are well defined.
+CURSOR_SORT_FIELDS = ("started_at", "op_name", "trace_id", "id")
+
+CallsSortOrder = typing.List[typing.Tuple[str, str]]
+
+
+def calls_cursor_sort_order(
+    sort_by: typing.Optional[typing.List[typing.Any]],
+) -> typing.Optional[CallsSortOrder]:
+    """Returns the (field, direction) pairs calls are sorted by, with `id` as
+    a final tiebreaker so that the order is total, or None if the sort is not
+    usable for cursor pagination.
+
+    `sort_by` is a list of `SortBy`. It defaults to ascending `started_at`.
+    """
+    if sort_by is None:
+        order = [("started_at", "asc")]
+    else:
+        order = [(s.field, s.direction.lower()) for s in sort_by]
+    if not order or any(field not in CURSOR_SORT_FIELDS for field, _ in order):
+        return None
+    if not any(field == "id" for field, _ in order):
+        order.append(("id", "asc"))
+    return order
+
+
+def _cursor_value(val: typing.Any) -> typing.Any:
+    if isinstance(val, datetime.datetime):
+        return val.isoformat()
+    return val
+
+
+def encode_calls_cursor(sort_order: CallsSortOrder, call: typing.Any) -> str:
+    """Encodes an opaque cursor pointing just past `call` (a `CallSchema`)
+    in `sort_order`.
+    """
+    payload = {
+        "sort": sort_order,
+        "values": [_cursor_value(getattr(call, field)) for field, _ in sort_order],
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode("ascii")
+
+
+def decode_calls_cursor(
+    cursor: str, sort_order: CallsSortOrder
+) -> typing.List[typing.Any]:
+    """Returns the sort values encoded in `cursor`, one per `sort_order`
+    entry. Datetimes are returned as ISO 8601 strings.
+
+    Raises:
+        InvalidRequest: If the cursor is malformed or was made for another sort.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        sort = [tuple(s) for s in payload["sort"]]
+        values = payload["values"]
+    except Exception as e:
+        raise InvalidRequest(f"Invalid cursor: {cursor}") from e
+    if sort != [tuple(s) for s in sort_order] or len(values) != len(sort_order):
+        raise InvalidRequest("Cursor does not match the sort order of the query")
+    return values
+
+
 valid_schemes = [
     TRACE_REF_SCHEME,
     ARTIFACT_REF_SCHEME,
@@ -2,8 +2,11 @@ import dataclasses
 import datetime
 import platform
 import sys
+import threading
 import typing
-from functools import lru_cache
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
 from typing import Any, Dict, Iterator, Optional, Sequence, Union
 
 import pydantic
@@ -14,6 +17,7 @@ from weave.client_context import weave_client as weave_client_context
 from weave.exception import exception_to_json_str
 from weave.feedback import FeedbackQuery, RefFeedbackQuery
 from weave.table import Table
+from weave.trace import env, settings
 from weave.trace.object_record import (
     ObjectRecord,
     dataclass_object_record,
@@ -22,9 +26,17 @@ from weave.trace.object_record import (
 from weave.trace.op import Op, maybe_unbind_method
 from weave.trace.op import op as op_deco
 from weave.trace.refs import CallRef, ObjectRef, OpRef, Ref, TableRef
-from weave.trace.serialize import from_json, isinstance_namedtuple, to_json
+from weave.trace.send_pipeline import SendPipeline
+from weave.trace.serialize import (
+    from_json,
+    isinstance_namedtuple,
+    prefetch_files,
+    to_json,
+    to_json_deferred_upload,
+)
 from weave.trace.serializer import get_serializer_for_obj
-from weave.trace.vals import WeaveObject, WeaveTable, make_trace_obj
+from weave.trace.util import ContextAwareThreadPoolExecutor
+from weave.trace.vals import WeaveObject, WeaveTable, make_trace_obj, prefetch_refs
 from weave.trace_server.ids import generate_id
 from weave.trace_server.trace_server_interface import (
     CallEndReq,
@@ -32,6 +44,7 @@ from weave.trace_server.trace_server_interface import (
     CallsDeleteReq,
     CallsFilter,
     CallsQueryReq,
+    CallsQueryStatsReq,
     CallStartReq,
     CallUpdateReq,
     EndedCallSchemaForInsert,
@@ -44,10 +57,17 @@ from weave.trace_server.trace_server_interface import (
     Query,
     RefsReadBatchReq,
     StartedCallSchemaForInsert,
+    TableAppendSpec,
+    TableAppendSpecPayload,
     TableCreateReq,
     TableSchemaForInsert,
+    TableUpdateReq,
     TraceServerInterface,
 )
+from weave.trace_server.trace_server_interface_util import (
+    calls_cursor_sort_order,
+    encode_calls_cursor,
+)
 
 if typing.TYPE_CHECKING:
     from . import ref_base
@@ -146,8 +166,16 @@ class Call:
     summary: Optional[dict] = None
     display_name: Optional[str] = None
     attributes: Optional[dict] = None
-    # These are the live children during logging
-    _children: list["Call"] = dataclasses.field(default_factory=list)
+    # While logging, the sum of the summaries of the call's finished children,
+    # or None if it has no children. Children are folded in as they finish
+    # rather than kept, so a call's memory doesn't grow with its children.
+    _children_summary: Optional[dict] = dataclasses.field(
+        default=None, repr=False, compare=False
+    )
+    # The live parent during logging
+    _parent: Optional["Call"] = dataclasses.field(
+        default=None, repr=False, compare=False
+    )
 
     _feedback: Optional[RefFeedbackQuery] = None
 
@@ -204,7 +232,22 @@ class Call:
         self.set_display_name(None)
 
 
+# Number of calls CallsIter fetches per request.
+CALLS_ITER_PAGE_SIZE = 1000
+# Number of pages CallsIter keeps in memory, including one being prefetched.
+CALLS_ITER_MAX_CACHED_PAGES = 4
+
+
 class CallsIter:
+    """Lazily iterates over the calls matching a filter.
+
+    Calls are streamed from the server a page at a time. While iterating, the
+    next page is fetched in the background, starting from a cursor past the
+    last call of the previous page rather than at an offset, and only the most
+    recently used `max_cached_pages` pages are kept in memory, so iterating
+    over a large project uses constant memory.
+    """
+
     server: TraceServerInterface
     filter: CallsFilter
     include_costs: bool
@@ -215,28 +258,97 @@ class CallsIter:
         project_id: str,
         filter: CallsFilter,
         include_costs: bool = False,
+        *,
+        page_size: int = CALLS_ITER_PAGE_SIZE,
+        max_cached_pages: int = CALLS_ITER_MAX_CACHED_PAGES,
+        prefetch: bool = True,
     ) -> None:
         self.server = server
         self.project_id = project_id
         self.filter = filter
-        self._page_size = 1000
+        self._page_size = page_size
         self.include_costs = include_costs
-
-    # seems like this caching should be on the server, but it's here for now...
-    @lru_cache
-    def _fetch_page(self, index: int) -> list[CallSchema]:
-        # caching in here means that any other CallsIter objects would also
-        # benefit from the cache
-        response = self.server.calls_query(
-            CallsQueryReq(
-                project_id=self.project_id,
-                filter=self.filter,
-                offset=index * self._page_size,
-                limit=self._page_size,
-                include_costs=self.include_costs,
+        # The page being read and the one being prefetched must both fit.
+        self._max_cached_pages = max(2, max_cached_pages)
+        self._prefetch = prefetch
+        self._pages: OrderedDict[int, Future[list[CallSchema]]] = OrderedDict()
+        self._pages_lock = threading.Lock()
+        self._executor: Optional[ContextAwareThreadPoolExecutor] = None
+        self._len: Optional[int] = None
+
+    def _fetch_page(self, index: int, cursor: Optional[str]) -> list[CallSchema]:
+        return list(
+            self.server.calls_query_stream(
+                CallsQueryReq(
+                    project_id=self.project_id,
+                    filter=self.filter,
+                    # Servers that don't support cursors ignore them and use
+                    # the offset instead.
+                    offset=index * self._page_size,
+                    cursor=cursor,
+                    limit=self._page_size,
+                    include_costs=self.include_costs,
+                )
             )
         )
-        return response.calls
+
+    def _page_cursor(self, index: int) -> Optional[str]:
+        """Returns a cursor past the last call of page `index - 1`, if it is
+        cached, so that page `index` can be fetched without an offset scan.
+
+        Must be called with `_pages_lock` held.
+        """
+        prev = self._pages.get(index - 1)
+        if prev is None or not prev.done() or prev.exception() is not None:
+            return None
+        calls = prev.result()
+        if len(calls) < self._page_size:
+            return None
+        # Calls are returned in the default sort, which is usable with cursors.
+        sort_order = calls_cursor_sort_order(None)
+        assert sort_order is not None
+        return encode_calls_cursor(sort_order, calls[-1])
+
+    def _page_future(
+        self, index: int, background: bool = False
+    ) -> "Future[list[CallSchema]]":
+        with self._pages_lock:
+            if (future := self._pages.get(index)) is not None:
+                self._pages.move_to_end(index)
+                return future
+            cursor = self._page_cursor(index)
+            if background:
+                if self._executor is None:
+                    self._executor = ContextAwareThreadPoolExecutor(max_workers=1)
+                    # Stop the worker thread if the iterator is dropped
+                    # without being read to the end.
+                    weakref.finalize(self, self._executor.shutdown, wait=False)
+                future = self._executor.submit(self._fetch_page, index, cursor)
+            else:
+                future = Future()
+            self._pages[index] = future
+            while len(self._pages) > self._max_cached_pages:
+                self._pages.popitem(last=False)
+        if not background:
+            try:
+                future.set_result(self._fetch_page(index, cursor))
+            except Exception as e:
+                future.set_exception(e)
+        return future
+
+    def _get_page(self, index: int, prefetch_next: bool = False) -> list[CallSchema]:
+        future = self._page_future(index)
+        try:
+            page = future.result()
+        except Exception:
+            # Don't cache failures, so that the page is fetched again next time.
+            with self._pages_lock:
+                if self._pages.get(index) is future:
+                    del self._pages[index]
+            raise
+        if prefetch_next and self._prefetch and len(page) == self._page_size:
+            self._page_future(index + 1, background=True)
+        return page
 
     def _get_one(self, index: int) -> WeaveObject:
         if index < 0:
@@ -245,7 +357,7 @@ class CallsIter:
         page_index = index // self._page_size
         page_offset = index % self._page_size
 
-        calls = self._fetch_page(page_index)
+        calls = self._get_page(page_index)
         if page_offset >= len(calls):
             raise IndexError(f"Index {index} out of range")
 
@@ -261,14 +373,51 @@ class CallsIter:
         if (step := key.step or 1) < 0:
             raise ValueError("Negative step not supported")
 
+        try:
+            yield from self._iter_slice(start, stop, step)
+        finally:
+            self._shutdown_executor()
+
+    def _iter_slice(
+        self, start: int, stop: Optional[int], step: int
+    ) -> Iterator[WeaveObject]:
+        entity, project = self.project_id.split("/")
         i = start
+        prefetched_page = None
         while stop is None or i < stop:
-            try:
-                yield self._get_one(i)
-            except IndexError:
+            page_index = i // self._page_size
+            # Only prefetch the next page if the slice will reach it.
+            next_page_start = (page_index + 1) * self._page_size
+            calls = self._get_page(
+                page_index, prefetch_next=stop is None or next_page_start < stop
+            )
+            page_offset = i % self._page_size
+            if page_offset >= len(calls):
                 break
+            if page_index != prefetched_page:
+                # Read the refs and files of the calls this slice yields from
+                # the page in batches, rather than one at a time as each call
+                # is decoded.
+                page_stop = len(calls)
+                if stop is not None:
+                    page_stop = min(page_stop, stop - page_index * self._page_size)
+                self._prefetch_vals(calls[page_offset:page_stop:step])
+                prefetched_page = page_index
+            yield make_client_call(entity, project, calls[page_offset], self.server)
             i += step
 
+    def _shutdown_executor(self) -> None:
+        with self._pages_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            # A page being prefetched is still completed and cached.
+            executor.shutdown(wait=False)
+
+    def _prefetch_vals(self, calls: list[CallSchema]) -> None:
+        call_vals = [[call.inputs, call.output] for call in calls]
+        prefetch_refs(call_vals, self.server)
+        prefetch_files(self.project_id, self.server, call_vals)
+
     def __getitem__(
         self, key: Union[slice, int]
     ) -> Union[WeaveObject, list[WeaveObject]]:
@@ -279,6 +428,19 @@ class CallsIter:
     def __iter__(self) -> typing.Iterator[WeaveObject]:
         return self._get_slice(slice(0, None, 1))
 
+    def __len__(self) -> int:
+        # list() calls this as a size hint before iterating, so answer from the
+        # first page, which iteration needs anyway, when it holds every call.
+        if self._len is None:
+            first_page = self._get_page(0)
+            if len(first_page) < self._page_size:
+                self._len = len(first_page)
+            else:
+                self._len = self.server.calls_query_stats(
+                    CallsQueryStatsReq(project_id=self.project_id, filter=self.filter)
+                ).count
+        return self._len
+
 
 def make_client_call(
     entity: str, project: str, server_call: CallSchema, server: TraceServerInterface
@@ -380,7 +542,22 @@ class WeaveClient:
         self.project = project
         self.server = server
         self._anonymous_ops: dict[str, Op] = {}
+        # Guards Call._children_summary, which children finishing on other
+        # threads fold into
+        self._children_summary_lock = threading.Lock()
         self.ensure_project_exists = ensure_project_exists
+        self._send_pipeline: Optional[SendPipeline] = None
+        if settings.should_log_in_background():
+            self._send_pipeline = SendPipeline(
+                {
+                    "call_start": (CallStartReq, self.server.call_start),  # type: ignore
+                    "call_end": (CallEndReq, self.server.call_end),  # type: ignore
+                },
+                num_workers=env.get_weave_send_workers(),
+                max_queue_size=env.get_weave_send_queue_size(),
+                backpressure=env.get_weave_send_backpressure(),  # type: ignore
+                spill_dir=env.get_weave_send_spill_dir(),
+            )
 
         if ensure_project_exists:
             resp = self.server.ensure_project_exists(entity, project)
@@ -443,6 +620,21 @@ class WeaveClient:
 
         return make_trace_obj(val, ref, self.server, None)
 
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all call data queued for background sending has been sent.
+
+        This is a no-op unless background logging is enabled.
+
+        Args:
+            timeout: The maximum number of seconds to wait. Waits forever if None.
+
+        Returns:
+            False if the timeout elapsed before everything was sent, else True.
+        """
+        if self._send_pipeline is None:
+            return True
+        return self._send_pipeline.flush(timeout)
+
     ################ Query API ################
 
     @trace_sentry.global_trace_sentry.watch()
@@ -453,6 +645,7 @@ class WeaveClient:
     ) -> CallsIter:
         if filter is None:
             filter = CallsFilter()
+        self.flush()
 
         return CallsIter(
             self.server, self._project_id(), filter, include_costs or False
@@ -460,6 +653,7 @@ class WeaveClient:
 
     @trace_sentry.global_trace_sentry.watch()
     def call(self, call_id: str, include_costs: Optional[bool] = False) -> WeaveObject:
+        self.flush()
         response = self.server.calls_query(
             CallsQueryReq(
                 project_id=self._project_id(),
@@ -545,23 +739,35 @@ class WeaveClient:
             attributes=attributes,
         )
         if parent is not None:
-            parent._children.append(call)
+            call._parent = parent
+            if parent._children_summary is None:
+                parent._children_summary = {}
 
         current_wb_run_id = safe_current_wb_run_id()
         check_wandb_run_matches(current_wb_run_id, self.entity, self.project)
-        start = StartedCallSchemaForInsert(
-            project_id=self._project_id(),
-            id=call_id,
-            op_name=op_str,
-            display_name=display_name,
-            trace_id=trace_id,
-            started_at=datetime.datetime.now(tz=datetime.timezone.utc),
-            parent_id=parent_id,
-            inputs=to_json(inputs_with_refs, self._project_id(), self.server),
-            attributes=attributes,
-            wb_run_id=current_wb_run_id,
-        )
-        self.server.call_start(CallStartReq(start=start))
+        project_id = self._project_id()
+        started_at = datetime.datetime.now(tz=datetime.timezone.utc)
+
+        # Encode now, since the inputs may be changed once the call returns.
+        # Only uploading custom object files is deferred.
+        inputs_json = to_json_deferred_upload(inputs_with_refs, project_id, self.server)
+
+        def make_start_req() -> CallStartReq:
+            start = StartedCallSchemaForInsert(
+                project_id=project_id,
+                id=call_id,
+                op_name=op_str,
+                display_name=display_name,
+                trace_id=trace_id,
+                started_at=started_at,
+                parent_id=parent_id,
+                inputs=inputs_json(),
+                attributes=attributes,
+                wb_run_id=current_wb_run_id,
+            )
+            return CallStartReq(start=start)
+
+        self._send_call_req("call_start", trace_id, make_start_req)
 
         if use_stack:
             call_context.push_call(call)
@@ -579,8 +785,11 @@ class WeaveClient:
 
         # Summary handling
         summary = {}
-        if call._children:
-            summary = sum_dict_leaves([child.summary or {} for child in call._children])
+        with self._children_summary_lock:
+            children_summary = call._children_summary
+            call._children_summary = None
+        if children_summary is not None:
+            summary = children_summary
         elif (
             isinstance(original_output, dict)
             and "usage" in original_output
@@ -608,18 +817,24 @@ class WeaveClient:
             exception_str = exception_to_json_str(exception)
             call.exception = exception_str
 
-        self.server.call_end(
-            CallEndReq(
+        project_id = self._project_id()
+        ended_at = datetime.datetime.now(tz=datetime.timezone.utc)
+
+        output_json = to_json_deferred_upload(output, project_id, self.server)
+
+        def make_end_req() -> CallEndReq:
+            return CallEndReq(
                 end=EndedCallSchemaForInsert(
-                    project_id=self._project_id(),
+                    project_id=project_id,
                     id=call.id,  # type: ignore
-                    ended_at=datetime.datetime.now(tz=datetime.timezone.utc),
-                    output=to_json(output, self._project_id(), self.server),
+                    ended_at=ended_at,
+                    output=output_json(),
                     summary=summary,
                     exception=exception_str,
                 )
             )
-        )
+
+        self._send_call_req("call_end", call.trace_id, make_end_req)
 
         # Descendent error tracking disabled til we fix UI
         # Add this call's summary after logging the call, so that only
@@ -628,6 +843,14 @@ class WeaveClient:
         #     call.op_name, {"successes": 0, "errors": 0}
         # )["successes"] += 1
         call.summary = summary
+        if (parent := call._parent) is not None:
+            call._parent = None
+            # Children that finish after their parent are not counted
+            with self._children_summary_lock:
+                if parent._children_summary is not None:
+                    parent._children_summary = sum_dict_leaves(
+                        [parent._children_summary, summary]
+                    )
         call_context.pop_call(call.id)
 
     @trace_sentry.global_trace_sentry.watch()
@@ -727,6 +950,23 @@ class WeaveClient:
     def _project_id(self) -> str:
         return f"{self.entity}/{self.project}"
 
+    def _send_call_req(
+        self,
+        kind: typing.Literal["call_start", "call_end"],
+        trace_id: str,
+        make_req: typing.Callable[[], Union[CallStartReq, CallEndReq]],
+    ) -> None:
+        # Ops and nested objects referenced by the call have already been
+        # saved, so only encoding the values (which may upload files) and
+        # sending the call itself is deferred. Keying by trace id keeps the
+        # starts and ends within a trace in order.
+        if self._send_pipeline is not None:
+            self._send_pipeline.submit(kind, trace_id, make_req)
+        elif kind == "call_start":
+            self.server.call_start(make_req())  # type: ignore
+        else:
+            self.server.call_end(make_req())  # type: ignore
+
     # This is used by tests and op_execute still, but the save() interface
     # is nicer for clients I think?
     @trace_sentry.global_trace_sentry.watch()
@@ -839,6 +1079,37 @@ class WeaveClient:
             entity=self.entity, project=self.project, digest=response.digest
         )
 
+    @trace_sentry.global_trace_sentry.watch()
+    def _append_table_rows(
+        self, table_ref: Optional[TableRef], rows: list[dict]
+    ) -> TableRef:
+        """Appends rows to a saved table, creating it if `table_ref` is None.
+
+        Returns:
+            The ref to the new version of the table.
+        """
+        json_rows = to_json(rows, self._project_id(), self.server)
+        if table_ref is None:
+            digest = self.server.table_create(
+                TableCreateReq(
+                    table=TableSchemaForInsert(
+                        project_id=self._project_id(), rows=json_rows
+                    )
+                )
+            ).digest
+        else:
+            digest = self.server.table_update(
+                TableUpdateReq(
+                    project_id=self._project_id(),
+                    base_digest=table_ref.digest,
+                    updates=[
+                        TableAppendSpec(append=TableAppendSpecPayload(row=row))
+                        for row in json_rows
+                    ],
+                )
+            ).digest
+        return TableRef(entity=self.entity, project=self.project, digest=digest)
+
     @trace_sentry.global_trace_sentry.watch()
     def _op_calls(self, op: Op) -> CallsIter:
         op_ref = get_ref(op)
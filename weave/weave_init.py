@@ -167,6 +167,7 @@ def init_local() -> InitializedClient:
 def finish() -> None:
     global _current_inited_client
     if _current_inited_client is not None:
+        _current_inited_client.client.flush()
         _current_inited_client.reset()
         _current_inited_client = None
 